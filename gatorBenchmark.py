@@ -0,0 +1,319 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from gatorTicketMaster import GatorTicketMaster, LazyWaitlist, MinHeap, dispatch_table, parse_command, run_command
+
+#WorkloadSpec holds the knobs of a synthetic command stream. The mix values are relative weights of the commands issued after Initialize
+class WorkloadSpec:
+    def __init__(self, seats=10000, users=50000, commands=100000, seed=1,
+                 reserve=50, cancel=15, exit_waitlist=5, update_priority=10, add_seats=1,
+                 release_seats=1, available=5, print_reservations=0,
+                 max_priority=5, priority_skew=0.0, add_seats_size=50, release_width=100):
+        self.seats = seats #seats given to Initialize
+        self.users = users #size of the user id space, users / seats sets the waitlist pressure
+        self.commands = commands #number of commands after Initialize, Quit is added at the end
+        self.seed = seed
+        self.reserve = reserve
+        self.cancel = cancel
+        self.exit_waitlist = exit_waitlist
+        self.update_priority = update_priority
+        self.add_seats = add_seats
+        self.release_seats = release_seats
+        self.available = available
+        self.print_reservations = print_reservations
+        self.max_priority = max_priority #priorities are drawn from 1..max_priority
+        self.priority_skew = priority_skew #0 draws priorities uniformly, larger values favour low priorities (Zipf-like)
+        self.add_seats_size = add_seats_size #largest count passed to AddSeats
+        self.release_width = release_width #largest user id range passed to ReleaseSeats
+
+    #to_dict() returns the spec as plain data for the JSON report
+    def to_dict(self):
+        return dict(vars(self))
+
+#PRESETS are the named workloads used for regression tracking
+PRESETS = {
+    'smoke': dict(seats=500, users=2000, commands=5000),
+    'balanced': dict(),
+    'waitlist_pressure': dict(seats=2000, users=100000, reserve=70, cancel=10, update_priority=15, exit_waitlist=10),
+    'cancel_churn': dict(seats=50000, users=60000, reserve=40, cancel=40, exit_waitlist=5, update_priority=5),
+    'release_heavy': dict(seats=20000, users=40000, release_seats=10, release_width=2000),
+    'stadium': dict(seats=500000, users=600000, commands=200000),
+    'waitlist_churn': dict(seats=2000, users=200000, reserve=40, cancel=2, exit_waitlist=20, update_priority=38, add_seats=0,
+                           release_seats=0, available=0),
+}
+
+#WAITLISTS are the waitlist engines that --waitlist can pick for the presets
+WAITLISTS = {'heap': MinHeap, 'lazy': LazyWaitlist}
+
+#_priority() draws a priority from 1..max_priority
+def _priority(rng, spec):
+    if spec.priority_skew <= 0:
+        return rng.randint(1, spec.max_priority)
+    weights = [1 / (rank ** spec.priority_skew) for rank in range(1, spec.max_priority + 1)]
+    return rng.choices(range(1, spec.max_priority + 1), weights)[0]
+
+#generate_workload() returns a reproducible list of command lines for the spec.
+#It drives a GatorTicketMaster while generating, so Cancel, ExitWaitlist and UpdatePriority mostly target users that really hold a seat or wait
+def generate_workload(spec: WorkloadSpec):
+    rng = random.Random(spec.seed)
+    shadow = GatorTicketMaster()
+    tree = shadow.reserved_seats
+    lines = [f"Initialize({spec.seats})"]
+    shadow.initialize(spec.seats)
+    table = dispatch_table(shadow)
+
+    known = [] #users that were sent a Reserve, entries that left the system are dropped lazily
+    kinds = ['reserve', 'cancel', 'exit_waitlist', 'update_priority', 'add_seats', 'release_seats', 'available', 'print_reservations']
+    weights = [getattr(spec, kind) for kind in kinds]
+
+    for kind in rng.choices(kinds, weights, k=spec.commands):
+        if kind == 'reserve':
+            user_id = rng.randint(1, spec.users)
+            if tree.search(user_id) is not tree.NIL or user_id in shadow.waitlist:
+                line = "Available()"  #the engine assumes a user reserves only once at a time
+            else:
+                line = f"Reserve({user_id}, {_priority(rng, spec)})"
+                known.append(user_id)
+        elif kind in ('cancel', 'exit_waitlist', 'update_priority'):
+            user_id = rng.randint(1, spec.users)
+            if known:
+                index = rng.randrange(len(known))
+                user_id = known[index]
+                if tree.search(user_id) is tree.NIL and user_id not in shadow.waitlist:
+                    known[index] = known[-1]
+                    known.pop()
+            if kind == 'cancel':
+                node = tree.search(user_id)
+                seat_id = node.seat_id if node is not tree.NIL else rng.randint(1, spec.seats)
+                line = f"Cancel({seat_id}, {user_id})"
+            elif kind == 'exit_waitlist':
+                line = f"ExitWaitlist({user_id})"
+            else:
+                line = f"UpdatePriority({user_id}, {_priority(rng, spec)})"
+        elif kind == 'add_seats':
+            line = f"AddSeats({rng.randint(1, spec.add_seats_size)})"
+        elif kind == 'release_seats':
+            lo = rng.randint(1, spec.users)
+            line = f"ReleaseSeats({lo}, {lo + rng.randint(0, spec.release_width)})"
+        elif kind == 'available':
+            line = "Available()"
+        else:
+            line = "PrintReservations()"
+
+        if kind != 'print_reservations':  #the listing doesn't change any state, so the shadow engine can skip it
+            run_command(table, *parse_command(line))
+        lines.append(line)
+
+    lines.append("Quit()")
+    return lines
+
+#_percentile() returns the p-th percentile of an already sorted list
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+#run_workload() replays the lines through a fresh engine and returns per-command latency stats, ops per second and optionally peak traced memory
+def run_workload(lines, engine_factory=GatorTicketMaster, measure_memory=True):
+    parsed = [parse_command(line) for line in lines]
+    timings = {}
+    perf_counter_ns = time.perf_counter_ns
+
+    table = dispatch_table(engine_factory())
+    started = perf_counter_ns()
+    for command, args in parsed:
+        if command == 'Quit':
+            break
+        before = perf_counter_ns()
+        run_command(table, command, args)
+        timings.setdefault(command, []).append(perf_counter_ns() - before)
+    total_ns = perf_counter_ns() - started
+
+    operations = sum(len(samples) for samples in timings.values())
+    report = {
+        'operations': operations,
+        'seconds': total_ns / 1e9,
+        'ops_per_second': operations / (total_ns / 1e9) if total_ns else 0.0,
+        'commands': {},
+    }
+    for command, samples in sorted(timings.items()):
+        samples.sort()
+        report['commands'][command] = {
+            'count': len(samples),
+            'mean_us': sum(samples) / len(samples) / 1e3,
+            'p50_us': _percentile(samples, 50) / 1e3,
+            'p99_us': _percentile(samples, 99) / 1e3,
+            'max_us': samples[-1] / 1e3,
+        }
+
+    #memory is measured in a second pass because tracemalloc slows every allocation down
+    if measure_memory:
+        tracemalloc.start()
+        table = dispatch_table(engine_factory())
+        for command, args in parsed:
+            if command == 'Quit':
+                break
+            run_command(table, command, args)
+        report['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return report
+
+#run_benchmark() generates the workload for spec, runs it repeat times and keeps the fastest run
+def run_benchmark(spec: WorkloadSpec, repeat: int = 1, measure_memory=True, engine_factory=GatorTicketMaster):
+    lines = generate_workload(spec)
+    best = None
+    for attempt in range(repeat):
+        report = run_workload(lines, engine_factory, measure_memory and attempt == 0)
+        if best is None or report['ops_per_second'] > best['ops_per_second']:
+            memory = best.get('peak_memory_bytes') if best else None
+            best = report
+            if memory is not None:
+                best['peak_memory_bytes'] = memory
+    best['spec'] = spec.to_dict()
+    return best
+
+#compare_results() returns the (workload, command, old_p50, new_p50) rows where the new p50 latency is slower than the old one by more than tolerance
+def compare_results(old, new, tolerance=0.10):
+    regressions = []
+    for name, new_report in new['workloads'].items():
+        old_report = old['workloads'].get(name)
+        if old_report is None:
+            continue
+        for command, stats in new_report['commands'].items():
+            old_stats = old_report['commands'].get(command)
+            if old_stats and old_stats['p50_us'] > 0 and stats['p50_us'] > old_stats['p50_us'] * (1 + tolerance):
+                regressions.append((name, command, old_stats['p50_us'], stats['p50_us']))
+    return regressions
+
+#batch_comparison() times the same bookings sent one command at a time and through the *_many() batch methods.
+#Half of the users get a seat and half are waitlisted, then a quarter of each half is updated, exits the waitlist or cancels
+def batch_comparison(size: int, seed: int = 1):
+    rng = random.Random(seed)
+    requests = [(user_id, rng.randint(1, 5)) for user_id in rng.sample(range(1, size * 20), size * 2)]
+    waiting = [user_id for user_id, priority in requests[size:]]
+    updates = [(user_id, rng.randint(1, 5)) for user_id in waiting[:size // 4]]
+    exits = waiting[size // 4:size // 2]
+    cancels = [(seat_id, user_id) for seat_id, (user_id, priority) in enumerate(requests[:size // 4], 1)]
+
+    timings = {}
+    for mode in ('single', 'batch'):
+        ticket_master = GatorTicketMaster()
+        ticket_master.initialize(size)
+        started = time.perf_counter()
+        if mode == 'single':
+            for user_id, priority in requests:
+                ticket_master.reserve(user_id, priority)
+            for user_id, priority in updates:
+                ticket_master.update_priority(user_id, priority)
+            for user_id in exits:
+                ticket_master.exit_waitlist(user_id)
+            for seat_id, user_id in cancels:
+                ticket_master.cancel(seat_id, user_id)
+        else:
+            ticket_master.reserve_many(requests)
+            ticket_master.update_priority_many(updates)
+            ticket_master.exit_waitlist_many(exits)
+            ticket_master.cancel_many(cancels)
+        timings[mode] = time.perf_counter() - started
+    return timings
+
+#waitlist_comparison() times the same on-sale churn against MinHeap and LazyWaitlist. size users wait for a sold out venue, then
+#operations commands are sent: half of them change a waiting user's priority, a quarter take a user off the waitlist, and the rest are new users
+#joining, with an occasional single extra seat going to the head of the line. Both engines must answer every command the same way
+def waitlist_comparison(size: int, operations: int = None, seed: int = 1):
+    rng = random.Random(seed)
+    operations = operations or size * 2
+    waiting = rng.sample(range(1, size * 20), size)
+    joined = [(user_id, rng.randint(1, 5)) for user_id in waiting]
+    next_user = size * 20
+    commands = []
+    for _ in range(operations):
+        roll = rng.random()
+        if roll < 0.5 and waiting:
+            commands.append(('update_priority', (rng.choice(waiting), rng.randint(1, 5))))
+        elif roll < 0.75 and waiting:
+            index = rng.randrange(len(waiting))
+            waiting[index], waiting[-1] = waiting[-1], waiting[index]
+            commands.append(('exit_waitlist', (waiting.pop(),)))
+        elif roll < 0.99:
+            commands.append(('reserve', (next_user, rng.randint(1, 5))))
+            waiting.append(next_user)
+            next_user += 1
+        else:
+            commands.append(('add_seats', (1,)))  #the user who gets the seat stays in waiting, later commands for them just miss
+
+    timings, outputs = {}, {}
+    for waitlist_type in (MinHeap, LazyWaitlist):
+        ticket_master = GatorTicketMaster(waitlist_type=waitlist_type)
+        ticket_master.initialize(1)
+        ticket_master.reserve(0, 1)
+        ticket_master.reserve_many(joined)
+        methods = {name: getattr(ticket_master, name) for name in ('update_priority', 'exit_waitlist', 'reserve', 'add_seats')}
+        started = time.perf_counter()
+        outputs[waitlist_type] = [methods[name](*args) for name, args in commands]
+        timings[waitlist_type.__name__] = time.perf_counter() - started
+    if outputs[MinHeap] != outputs[LazyWaitlist]:
+        raise AssertionError("LazyWaitlist answered differently from MinHeap")
+    return timings
+
+# The main block runs the chosen presets (or one custom workload) and prints a table, --output saves the JSON report and --compare checks it against an older one
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark GatorTicketMaster on synthetic workloads.")
+    parser.add_argument('--preset', action='append', choices=sorted(PRESETS), help="workload to run, can be repeated (default: smoke and balanced)")
+    parser.add_argument('--seats', type=int)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--commands', type=int)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--priority-skew', type=float)
+    parser.add_argument('--repeat', type=int, default=3, help="runs per workload, the fastest is kept")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    parser.add_argument('--compare', help="JSON report of an older run to check for p50 regressions")
+    parser.add_argument('--batch', type=int, help="instead of the presets, compare single commands with the batch methods for this many seats")
+    parser.add_argument('--churn', type=int, help="instead of the presets, compare MinHeap and LazyWaitlist on waitlist churn with this many waiting users")
+    parser.add_argument('--waitlist', choices=sorted(WAITLISTS), default='heap', help="waitlist engine for the presets (default heap)")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="allowed p50 slowdown for --compare (default 0.10)")
+    options = parser.parse_args()
+
+    if options.batch:
+        timings = batch_comparison(options.batch)
+        print(f"single: {timings['single']:.3f}s  batch: {timings['batch']:.3f}s  ({timings['single'] / timings['batch']:.1f}x)")
+        sys.exit(0)
+
+    if options.churn:
+        timings = waitlist_comparison(options.churn)
+        print(f"MinHeap: {timings['MinHeap']:.3f}s  LazyWaitlist: {timings['LazyWaitlist']:.3f}s  ({timings['MinHeap'] / timings['LazyWaitlist']:.1f}x)")
+        sys.exit(0)
+
+    overrides = {key: value for key, value in (('seats', options.seats), ('users', options.users), ('commands', options.commands),
+                                               ('seed', options.seed), ('priority_skew', options.priority_skew)) if value is not None}
+    names = options.preset or (['custom'] if overrides else ['smoke', 'balanced'])
+
+    results = {'python': platform.python_version(), 'machine': platform.machine(), 'workloads': {}}
+    for name in names:
+        spec = WorkloadSpec(**{**PRESETS.get(name, {}), **overrides})
+        waitlist_type = WAITLISTS[options.waitlist]
+        report = run_benchmark(spec, options.repeat, not options.no_memory, lambda: GatorTicketMaster(waitlist_type=waitlist_type))
+        results['workloads'][name] = report
+        memory = report.get('peak_memory_bytes')
+        print(f"{name}: {report['operations']} ops in {report['seconds']:.2f}s, {report['ops_per_second']:.0f} ops/s"
+              + (f", peak {memory / 1e6:.1f} MB" if memory is not None else ""))
+        for command, stats in report['commands'].items():
+            print(f"  {command:<18} n={stats['count']:<8} p50={stats['p50_us']:8.2f}us  p99={stats['p99_us']:8.2f}us")
+
+    if options.output:
+        with open(options.output, 'w') as outfile:
+            json.dump(results, outfile, indent=2)
+
+    if options.compare:
+        with open(options.compare) as infile:
+            regressions = compare_results(json.load(infile), results, options.tolerance)
+        for name, command, old_p50, new_p50 in regressions:
+            print(f"REGRESSION {name}/{command}: p50 {old_p50:.2f}us -> {new_p50:.2f}us")
+        sys.exit(1 if regressions else 0)
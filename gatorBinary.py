@@ -0,0 +1,312 @@
+import argparse
+import re
+import struct
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  #numpy is optional, without it the decoders fall back to struct and return lists
+    np = None
+
+from gatorServer import PROTOCOL_OPCODES
+from gatorTicketMaster import QUIT_MESSAGE, GatorTicketMaster, dispatch_table, parse_command
+
+#BINARY_OPCODES are the network protocol opcodes, so a command has the same opcode on the wire and in a file
+BINARY_OPCODES = PROTOCOL_OPCODES
+OPCODE_NAMES = {opcode: command for command, opcode in BINARY_OPCODES.items()}
+QUIT_OPCODE = BINARY_OPCODES['Quit']
+UNKNOWN_OPCODE = 0 #a command name the engine doesn't know, kept by name so it is answered and converted back like in a text file
+MAX_ARGS = 3
+
+#A command file is COMMAND_MAGIC, COMMAND_HEADER (record count, name text length), one 32 byte record per command and the UTF-8 names of
+#the unknown commands, one per line. A record is the opcode, the argument count, the line of the name for UNKNOWN_OPCODE (0 otherwise)
+#and three int64 arguments, unused ones 0. The arguments are 8 byte aligned, so numpy reads all records in place as one structured array
+COMMAND_MAGIC = b'GTMCMD01'
+COMMAND_HEADER = struct.Struct('<qq')
+COMMAND_RECORD = struct.Struct('<HHIqqq')
+
+#A result file is RESULT_MAGIC, RESULT_HEADER (record count, text length), one 40 byte record per output line and the UTF-8 text of the lines
+#that have no template. A record is a template code, 6 padding bytes, the 0-based position of the command whose result the line belongs to and
+#the template's int fields, unused ones 0. Code 0 is raw text: its first two fields are the offset and length of the line in the text
+RESULT_MAGIC = b'GTMRES01'
+RESULT_HEADER = struct.Struct('<qq')
+RESULT_RECORD = struct.Struct('<H6xqqqq')
+RAW_TEXT = 0
+
+#RESULT_TEMPLATES are the result lines the engine writes, every {} is an int. A line's code is its position in this tuple plus one
+RESULT_TEMPLATES = (
+    "User {} reserved seat {}",
+    "User {} is added to the waiting list",
+    "Total Seats Available : {}, Waitlist : {}",
+    "Seat {}, User {}",
+    "User {} canceled their reservation",
+    "User {} has no reservation for seat {} to cancel",
+    "User {} priority has been updated to {}",
+    "User {} priority is not updated",
+    "User {} is not in the system",
+    "User {} is removed from the waiting list",
+    "User {} is not in waitlist",
+    "{} Seats are made available for reservation",
+    "Additional {} Seats are made available for reservation",
+    "Reservations of the Users in the range [{}, {}] are released",
+    "No reservations or waitlist entries found in the range [{}, {}]",
+    "User {} is at position {} of {} in the waiting list",
+    "Position {}, User {}, Priority {}",
+    "User {} reserved seats {}-{}",
+    "No block of {} seats together is available for User {}",
+    "User {} is holding seat {} for {} seconds",
+    "User {} confirmed seat {}",
+    "User {} has no seat on hold",
+    "User {} hold on seat {} expired",
+    "Invalid input. Please provide a valid number of seats.",
+    "Invalid input. Please provide a valid range of users.",
+    "Invalid input. Please provide a valid page.",
+    "Invalid input. Please provide a valid number of users.",
+    "Invalid input. Please provide a valid hold time.",
+    QUIT_MESSAGE,
+    "User {} already holds seat {}",
+)
+
+#_template_pattern() compiles every template into one alternation, so a line is matched in a single regex call.
+#The outer group of a template closes after its fields, so match.lastindex names the template and its fields are the groups right after it
+def _template_pattern():
+    alternatives = []
+    templates = {}
+    group = 1
+    for code, template in enumerate(RESULT_TEMPLATES, 1):
+        fields = template.count('{}')
+        alternatives.append('(' + re.escape(template).replace(r'\{\}', r'(-?\d+)') + ')')
+        templates[group] = (code, group + 1, group + 1 + fields)
+        group += 1 + fields
+    return re.compile('|'.join(alternatives)), templates
+
+TEMPLATE_PATTERN, TEMPLATE_GROUPS = _template_pattern()
+
+if np is not None:
+    COMMAND_DTYPE = np.dtype({'names': ['opcode', 'argc', 'name', 'args'], 'formats': ['<u2', '<u2', '<u4', ('<i8', (MAX_ARGS,))],
+                              'offsets': [0, 2, 4, 8], 'itemsize': COMMAND_RECORD.size})
+    RESULT_DTYPE = np.dtype({'names': ['code', 'command', 'fields'], 'formats': ['<u2', '<i8', ('<i8', (3,))],
+                             'offsets': [0, 8, 16], 'itemsize': RESULT_RECORD.size})
+
+#encode_commands() turns text command lines ("Reserve(6, 2)") into a binary command file. Empty lines are skipped. A line with more than
+#three arguments, or with an argument outside the int64 range, raises ValueError, like a line whose arguments are not ints
+def encode_commands(lines):
+    records = []
+    names = {} #unknown command name -> its line in the name text
+    pack = COMMAND_RECORD.pack
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        command, args = parse_command(line)
+        if len(args) > MAX_ARGS:
+            raise ValueError(f"Line {number} has more than {MAX_ARGS} arguments: {line}")
+        opcode = BINARY_OPCODES.get(command, UNKNOWN_OPCODE)
+        name = names.setdefault(command, len(names)) if opcode == UNKNOWN_OPCODE else 0
+        try:
+            records.append(pack(opcode, len(args), name, *args, *(0,) * (MAX_ARGS - len(args))))
+        except struct.error:
+            raise ValueError(f"Line {number} has an argument outside the int64 range: {line}") from None
+    name_text = "\n".join(names).encode()
+    return b''.join([COMMAND_MAGIC, COMMAND_HEADER.pack(len(records), len(name_text))] + records + [name_text])
+
+#decode_commands() turns a whole binary command file into columns in one pass: opcodes, argument counts, name lines, a 3 x n argument matrix
+#(args[0] holds the first argument of every command) and the list of unknown command names.
+#With numpy the columns are views into data, nothing is copied. Without numpy they are lists, and the matrix is a tuple of three lists
+def decode_commands(data):
+    if bytes(data[:len(COMMAND_MAGIC)]) != COMMAND_MAGIC:
+        raise ValueError("Not a binary command file")
+    count, name_length = COMMAND_HEADER.unpack_from(data, len(COMMAND_MAGIC))
+    start = len(COMMAND_MAGIC) + COMMAND_HEADER.size
+    end = start + count * COMMAND_RECORD.size
+    if len(data) != end + name_length:
+        raise ValueError("Binary command file has the wrong length")
+    names = bytes(data[end:]).decode().split("\n") #[""] when there are no unknown names, it is never looked up then
+    if np is not None:
+        records = np.frombuffer(data, dtype=COMMAND_DTYPE, count=count, offset=start)
+        return records['opcode'], records['argc'], records['name'], records['args'].T, names
+    rows = list(COMMAND_RECORD.iter_unpack(memoryview(data)[start:end]))
+    opcodes, argcs, name_lines, first, second, third = ([row[index] for row in rows] for index in range(6))
+    return opcodes, argcs, name_lines, (first, second, third), names
+
+#_command_name() returns the text name of a decoded command
+def _command_name(opcode: int, name: int, names):
+    if opcode == UNKNOWN_OPCODE:
+        return names[name]
+    return OPCODE_NAMES.get(opcode, f"Opcode{opcode}")
+
+#commands_to_text() turns a binary command file back into text lines in the input.txt format
+def commands_to_text(data):
+    *columns, names = decode_commands(data)
+    opcodes, argcs, name_lines, *args = _columns(columns)
+    return [f"{_command_name(opcode, name, names)}({', '.join(map(str, values[:argc]))})"
+            for opcode, argc, name, *values in zip(opcodes, argcs, name_lines, *args)]
+
+#_columns() hands decoded columns to Python code as plain lists, a matrix is spread into its rows. numpy's tolist() converts a whole column in C,
+#which is much cheaper than letting the engine hash and format numpy scalars one at a time, and the rows are zipped lazily by the callers
+#instead of building a list or tuple per command, which would also wake the garbage collector every few hundred commands
+def _columns(columns):
+    lists = []
+    for column in columns:
+        if isinstance(column, tuple) or (np is not None and column.ndim == 2):
+            lists.extend(_columns(column))
+        else:
+            lists.append(column.tolist() if np is not None else column)
+    return lists
+
+#run_binary() runs a binary command file through one GatorTicketMaster and returns the result text of every command in order, stopping after Quit.
+#Commands are looked up by opcode in a list built once, and are checked against their argument count like the text runner does
+def run_binary(data, ticket_master=None):
+    if ticket_master is None:
+        ticket_master = GatorTicketMaster()
+    table = dispatch_table(ticket_master)
+    methods = [None] * (max(OPCODE_NAMES) + 1)
+    for command, opcode in BINARY_OPCODES.items():
+        methods[opcode] = table.get(command)
+    *columns, names = decode_commands(data)
+    opcodes, argcs, name_lines, *args = _columns(columns)
+
+    results = []
+    for opcode, argc, name, first, second, third in zip(opcodes, argcs, name_lines, *args):
+        entry = methods[opcode] if opcode < len(methods) else None
+        if entry is None:
+            if opcode == QUIT_OPCODE:
+                results.append(QUIT_MESSAGE)
+                break
+            results.append(f"Unrecognized command: {_command_name(opcode, name, names)}")
+        elif entry[1] is not None and entry[1] != argc:
+            results.append(f"Unrecognized command: {OPCODE_NAMES[opcode]}")
+        else:
+            results.append(entry[0](*(first, second, third)[:argc]))
+    return results
+
+#encode_results() turns the result text of every command into a binary result file, one record per line. Empty results add no record,
+#just like they add no line to a text output file. Lines that match no template are kept as raw text, so the file always converts back exactly
+def encode_results(results):
+    records = []
+    text = []
+    text_length = 0
+    pack = RESULT_RECORD.pack
+    match = TEMPLATE_PATTERN.fullmatch
+    for position, result in enumerate(results):
+        if not result:
+            continue
+        for line in result.split("\n"):
+            found = match(line)
+            if found is not None:
+                code, first, last = TEMPLATE_GROUPS[found.lastindex]
+                fields = [int(found.group(index)) for index in range(first, last)]
+                try:
+                    records.append(pack(code, position, *fields, *(0,) * (3 - len(fields))))
+                    continue
+                except struct.error:  #an int that doesn't fit in int64 is kept as text
+                    pass
+            encoded = line.encode()
+            records.append(pack(RAW_TEXT, position, text_length, len(encoded), 0))
+            text.append(encoded)
+            text_length += len(encoded)
+    return b''.join([RESULT_MAGIC, RESULT_HEADER.pack(len(records), text_length)] + records + text)
+
+#decode_results() turns a binary result file into columns in one pass: template codes, command positions, a 3 x n field matrix
+#and the raw text. With numpy the columns are views into data, without it they are lists and the matrix is a tuple of three lists
+def decode_results(data):
+    if bytes(data[:len(RESULT_MAGIC)]) != RESULT_MAGIC:
+        raise ValueError("Not a binary result file")
+    count, text_length = RESULT_HEADER.unpack_from(data, len(RESULT_MAGIC))
+    start = len(RESULT_MAGIC) + RESULT_HEADER.size
+    end = start + count * RESULT_RECORD.size
+    if len(data) != end + text_length:
+        raise ValueError("Binary result file has the wrong length")
+    text = bytes(data[end:])
+    if np is not None:
+        records = np.frombuffer(data, dtype=RESULT_DTYPE, count=count, offset=start)
+        return records['code'], records['command'], records['fields'].T, text
+    rows = list(RESULT_RECORD.iter_unpack(memoryview(data)[start:end]))
+    codes, commands, first, second, third = ([row[index] for row in rows] for index in range(5))
+    return codes, commands, (first, second, third), text
+
+#results_to_text() turns a binary result file back into the lines of a text output file
+def results_to_text(data):
+    codes, commands, fields, text = decode_results(data)
+    codes, *fields = _columns((codes, fields))
+    lines = []
+    for code, *values in zip(codes, *fields):
+        if code == RAW_TEXT:
+            lines.append(text[values[0]:values[0] + values[1]].decode())
+        else:
+            lines.append(RESULT_TEMPLATES[code - 1].format(*values))
+    return lines
+
+#bench() times turning a text command file into commands against decoding the same commands from the binary file, then the whole run both ways
+def bench(lines):
+    lines = [line for line in lines if line.strip()]
+    data = encode_commands(lines)
+
+    started = time.perf_counter()
+    for line in lines:
+        parse_command(line.strip())
+    text_parse = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in zip(*_columns(decode_commands(data)[:-1])):
+        pass
+    binary_decode = time.perf_counter() - started
+    print(f"decode {len(lines)} commands: text {text_parse * 1e3:.1f} ms, binary {binary_decode * 1e3:.1f} ms "
+          f"({'numpy' if np is not None else 'struct'}, {text_parse / binary_decode:.1f}x)")
+
+    from gatorTicketMaster import run_command_stream
+    started = time.perf_counter()
+    output = []
+    run_command_stream(lines, output.append)
+    text_run = time.perf_counter() - started
+    started = time.perf_counter()
+    results = run_binary(data)
+    binary_run = time.perf_counter() - started
+    started = time.perf_counter()
+    encoded = encode_results(results)
+    encode_time = time.perf_counter() - started
+    print(f"run: text {text_run:.2f} s, binary {binary_run:.2f} s")
+    print(f"result records: {encode_time:.2f} s to encode, {len(encoded)} bytes against {sum(map(len, output))} bytes of text")
+
+# The main block converts between the text and binary formats and runs binary command files
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Binary command and result files for GatorTicketMaster.")
+    modes = parser.add_subparsers(dest='mode', required=True)
+    encode_parser = modes.add_parser('encode', help="text command file to binary command file")
+    encode_parser.add_argument('input')
+    encode_parser.add_argument('output')
+    decode_parser = modes.add_parser('decode', help="binary command file to text command lines")
+    decode_parser.add_argument('input')
+    decode_parser.add_argument('output', nargs='?', default='-', help="text file, or - for stdout (default)")
+    run_parser = modes.add_parser('run', help="run a binary command file and write a binary result file")
+    run_parser.add_argument('input')
+    run_parser.add_argument('output')
+    results_parser = modes.add_parser('results', help="binary result file to text output lines")
+    results_parser.add_argument('input')
+    results_parser.add_argument('output', nargs='?', default='-', help="text file, or - for stdout (default)")
+    bench_parser = modes.add_parser('bench', help="compare the text and binary paths on a text command file")
+    bench_parser.add_argument('input')
+
+    options = parser.parse_args()
+    if options.mode == 'encode':
+        with open(options.input) as infile:
+            data = encode_commands(infile)
+        with open(options.output, 'wb') as outfile:
+            outfile.write(data)
+    elif options.mode == 'bench':
+        with open(options.input) as infile:
+            bench(infile.readlines())
+    else:
+        with open(options.input, 'rb') as infile:
+            data = infile.read()
+        if options.mode == 'run':
+            with open(options.output, 'wb') as outfile:
+                outfile.write(encode_results(run_binary(data)))
+        else:
+            lines = commands_to_text(data) if options.mode == 'decode' else results_to_text(data)
+            outfile = sys.stdout if options.output == '-' else open(options.output, 'w')
+            try:
+                outfile.write("".join(line + "\n" for line in lines))
+            finally:
+                if outfile is not sys.stdout:
+                    outfile.close()
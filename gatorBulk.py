@@ -0,0 +1,155 @@
+import argparse
+import random
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  #numpy is optional, without it the same steps run on lists with sorted()
+    np = None
+
+from gatorTicketMaster import GatorTicketMaster, _gc_paused, run_command_stream
+
+#_check_seats() raises ValueError for a seat outside 1..seat_count or a seat given twice. seats must be sorted
+def _check_seats(seats, seat_count: int):
+    if len(seats) and (seats[0] < 1 or seats[-1] > seat_count):
+        seat = seats[0] if seats[0] < 1 else seats[-1]
+        raise ValueError(f"Seat {seat} is outside 1..{seat_count}")
+    if np is not None:
+        twice = np.flatnonzero(seats[1:] == seats[:-1])
+        if len(twice):
+            raise ValueError(f"Seat {seats[twice[0]]} is reserved twice")
+    else:
+        for previous, seat in zip(seats, seats[1:]):
+            if seat == previous:
+                raise ValueError(f"Seat {seat} is reserved twice")
+
+#free_runs() returns the free (start, end) runs of a venue of seat_count seats around the sorted reserved seats.
+#The run after every reserved seat starts at seat + 1 and ends right before the next reserved seat, the empty ones are dropped
+def free_runs(seats, seat_count: int):
+    if np is not None:
+        seats = np.asarray(seats, dtype=np.int64)
+        starts = np.concatenate(([1], seats + 1))
+        ends = np.concatenate((seats - 1, [seat_count]))
+        kept = starts <= ends
+        return list(zip(starts[kept].tolist(), ends[kept].tolist()))
+    starts = [1] + [seat + 1 for seat in seats]
+    ends = [seat - 1 for seat in seats] + [seat_count]
+    return [(start, end) for start, end in zip(starts, ends) if start <= end]
+
+#import_reservations() builds a new GatorTicketMaster holding the given reservations, user_ids[i] holds seat_ids[i], with an empty waitlist.
+#seat_count defaults to the highest seat. The pairs are sorted by user (a user with several seats has them in seat order) and by seat with numpy,
+#both trees are built balanced in O(n) from the sorted columns and the free pool is set to the runs between the reserved seats in one step.
+#It raises ValueError for columns of different length, a seat outside 1..seat_count or a seat reserved twice
+@_gc_paused
+def import_reservations(user_ids, seat_ids, seat_count: int = None):
+    if len(user_ids) != len(seat_ids):
+        raise ValueError(f"{len(user_ids)} user ids for {len(seat_ids)} seats")
+    if np is not None:
+        users = np.asarray(user_ids, dtype=np.int64)
+        seats = np.asarray(seat_ids, dtype=np.int64)
+        user_order = np.lexsort((seats, users))
+        users, seats = users[user_order], seats[user_order]
+        seat_order = np.argsort(seats)
+        sorted_seats = seats[seat_order]
+        pairs = zip(users.tolist(), seats.tolist())
+        seat_pairs = zip(users[seat_order].tolist(), sorted_seats.tolist())
+    else:
+        pairs = sorted(zip(user_ids, seat_ids))
+        seat_pairs = sorted(pairs, key=lambda pair: pair[1])
+        sorted_seats = [seat_id for user_id, seat_id in seat_pairs]
+    if seat_count is None:
+        seat_count = int(sorted_seats[-1]) if len(sorted_seats) else 0
+    _check_seats(sorted_seats, seat_count)
+
+    ticket_master = GatorTicketMaster()
+    ticket_master.seat_count = seat_count
+    ticket_master.reserved_seats.bulk_load(pairs, seat_pairs)
+    ticket_master.available_seats.load_runs(free_runs(sorted_seats, seat_count))
+    return ticket_master
+
+#export_reservations() returns the reservations as (user_ids, seat_ids) int64 arrays, lists without numpy.
+#order='user' lists them the way PrintReservations walks the user tree, order='seat' walks the seat index instead
+def export_reservations(ticket_master, order: str = 'user'):
+    tree = ticket_master.reserved_seats
+    if order == 'seat':
+        tree = tree.seat_index
+    elif order != 'user':
+        raise ValueError(f"Unknown order: {order}")
+    nodes = list(tree)  #one walk of the tree, both columns are read from the list
+    user_ids, seat_ids = [node.user_id for node in nodes], [node.seat_id for node in nodes]
+    if np is None:
+        return user_ids, seat_ids
+    return np.array(user_ids, dtype=np.int64), np.array(seat_ids, dtype=np.int64)
+
+#bench() times loading count reservations of shuffled users into a venue with some spare seats through Reserve one by one
+#against import_reservations(), checks that both engines hold the same reservations, then times the export
+def bench(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    seat_count = count + count // 10
+    users = rng.sample(range(1, 10 * count + 1), count)
+    seats = sorted(rng.sample(range(1, seat_count + 1), count))
+
+    started = time.perf_counter()
+    reference = GatorTicketMaster()
+    reference.initialize(seat_count)
+    reference.available_seats.load_runs([(seat, seat) for seat in seats])  #hand out exactly these seats in this order
+    for user_id in users:
+        reference.reserve(user_id, 0)
+    reference.available_seats.load_runs(free_runs(seats, seat_count))
+    reserve_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    imported = import_reservations(users, seats, seat_count)
+    import_time = time.perf_counter() - started
+    if (imported.reserved_seats.inorder_traversal() != reference.reserved_seats.inorder_traversal()
+            or imported.available_seats.runs() != reference.available_seats.runs()):
+        raise AssertionError("import_reservations() doesn't match the engine built with reserve()")
+    print(f"load {count} reservations: reserve() {reserve_time:.2f} s, import {import_time:.2f} s "
+          f"({'numpy' if np is not None else 'lists'}, {reserve_time / import_time:.1f}x)")
+
+    started = time.perf_counter()
+    export_reservations(imported)
+    export_time = time.perf_counter() - started
+    started = time.perf_counter()
+    imported.reserved_seats.inorder_traversal()
+    traversal_time = time.perf_counter() - started
+    print(f"export: arrays {export_time:.2f} s, inorder_traversal() {traversal_time:.2f} s")
+
+# The main block moves reservations between command files and .npz arrays and runs the import benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk import and export of GatorTicketMaster reservations.")
+    modes = parser.add_subparsers(dest='mode', required=True)
+    export_parser = modes.add_parser('export', help="run a command file and save the reservations as user_ids, seat_ids and seat_count in an .npz file")
+    export_parser.add_argument('input')
+    export_parser.add_argument('output')
+    export_parser.add_argument('--order', choices=('user', 'seat'), default='user')
+    run_parser = modes.add_parser('run', help="import the reservations of an .npz file, then run a command file against them")
+    run_parser.add_argument('reservations')
+    run_parser.add_argument('input')
+    run_parser.add_argument('output', nargs='?', default='-', help="text file, or - for stdout (default)")
+    bench_parser = modes.add_parser('bench', help="compare Reserve one by one with import_reservations()")
+    bench_parser.add_argument('--reservations', type=int, default=1000000)
+    bench_parser.add_argument('--seed', type=int, default=0)
+
+    options = parser.parse_args()
+    if options.mode == 'bench':
+        bench(options.reservations, options.seed)
+        sys.exit(0)
+    if np is None:
+        parser.error(".npz files need numpy")
+    if options.mode == 'export':
+        with open(options.input) as infile:
+            ticket_master = run_command_stream(infile, lambda text: None)
+        user_ids, seat_ids = export_reservations(ticket_master, options.order)
+        np.savez(options.output, user_ids=user_ids, seat_ids=seat_ids, seat_count=ticket_master.seat_count)
+    else:
+        with np.load(options.reservations) as arrays:
+            ticket_master = import_reservations(arrays['user_ids'], arrays['seat_ids'], int(arrays['seat_count']))
+        outfile = sys.stdout if options.output == '-' else open(options.output, 'w')
+        try:
+            with open(options.input) as infile:
+                run_command_stream(infile, outfile.write, ticket_master)
+        finally:
+            if outfile is not sys.stdout:
+                outfile.close()
@@ -0,0 +1,338 @@
+import argparse
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from gatorReplay import check_invariants
+from gatorTicketMaster import GatorTicketMaster
+
+#ReadWriteLock lets any number of readers in at once, or one writer alone. It prefers writers: once a writer waits, new readers queue behind it,
+#so a steady stream of reads can't starve Reserve and Cancel. It is not reentrant, a thread holding it must not take it again
+class ReadWriteLock:
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0 #threads inside a read section
+        self.writer = False #True while a thread is inside a write section
+        self.waiting_writers = 0
+
+    def acquire_read(self):
+        with self.condition:
+            while self.writer or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+
+    def release_read(self):
+        with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writer or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writer = True
+
+    def release_write(self):
+        with self.condition:
+            self.writer = False
+            self.condition.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+#ExclusiveLock has the interface of ReadWriteLock on top of one plain lock, reads wait for each other too.
+#It is the one global lock a threaded app would otherwise wrap the engine in, and the baseline of the contention benchmark
+class ExclusiveLock:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.acquire_read = self.acquire_write = self.lock.acquire
+        self.release_read = self.release_write = self.lock.release
+
+    @contextmanager
+    def read_locked(self):
+        with self.lock:
+            yield
+
+    write_locked = read_locked
+
+#_writer() builds a ConcurrentTicketMaster method that runs a state changing command alone under the write lock.
+#The waitlist is only ever changed here, so it always has a single writer, and the Available counts are published before the lock is released
+def _writer(method: str):
+    def write(self, *args):
+        lock = self.lock
+        lock.acquire_write()
+        try:
+            result = getattr(self.ticket_master, method)(*args)
+            self._publish()
+        finally:
+            lock.release_write()
+        return result
+
+    write.__name__ = method
+    return write
+
+#_reader() builds a ConcurrentTicketMaster method for a read-only command, which runs next to other reads under the read lock.
+#A read can still change the engine on the way: pending holds expire before any command, and the first rank query or snapshot builds
+#the structure behind it (builds(ticket_master) is True then). Such a read is found under the read lock and run again under the write lock,
+#so nothing is ever changed by two threads at once
+def _reader(method: str, builds=None):
+    rerun = _writer(method)
+
+    def read(self, *args):
+        ticket_master, lock = self.ticket_master, self.lock
+        lock.acquire_read()
+        try:
+            if not ticket_master.holds and not (builds is not None and builds(ticket_master)):
+                return getattr(ticket_master, method)(*args)
+        finally:
+            lock.release_read()
+        return rerun(self, *args)
+
+    read.__name__ = method
+    return read
+
+#ConcurrentTicketMaster makes one GatorTicketMaster safe to share between threads. State changing commands take the write lock, read-only ones
+#(WaitlistPosition, WaitlistTop, seat_holder, snapshot) share the read lock, PrintReservations reads a snapshot outside the lock, and Available takes no lock at all: it reads counts
+#that every write publishes as one tuple, so it never waits for a writer and never sees a half done one.
+#It has the same command methods as GatorTicketMaster, so dispatch_table() and run_command_stream() work with it unchanged
+class ConcurrentTicketMaster:
+    def __init__(self, ticket_master=None, lock=None):
+        self.ticket_master = ticket_master if ticket_master is not None else GatorTicketMaster()
+        self.lock = lock if lock is not None else ReadWriteLock()
+        self.counts = (0, 0) #(available seats, waitlist size) as of the last write, replaced whole so a reader sees one write or the next
+        self._publish()
+
+    #_publish() stores the Available counts, the writers call it while they still hold the write lock
+    def _publish(self):
+        ticket_master = self.ticket_master
+        self.counts = (len(ticket_master.available_seats), len(ticket_master.waitlist))
+
+    initialize = _writer('initialize')
+    reserve = _writer('reserve')
+    add_seats = _writer('add_seats')
+    cancel = _writer('cancel')
+    update_priority = _writer('update_priority')
+    release_seats = _writer('release_seats')
+    exit_waitlist = _writer('exit_waitlist')
+    reserve_block = _writer('reserve_block')
+    hold = _writer('hold')
+    confirm = _writer('confirm')
+    expire_holds = _writer('expire_holds')
+    reserve_many = _writer('reserve_many')
+    cancel_many = _writer('cancel_many')
+    update_priority_many = _writer('update_priority_many')
+    exit_waitlist_many = _writer('exit_waitlist_many')
+
+    seat_holder = _reader('seat_holder')
+    waitlist_position = _reader('waitlist_position', builds=lambda ticket_master: ticket_master.waitlist.ranks is None)
+    waitlist_top = _reader('waitlist_top', builds=lambda ticket_master: ticket_master.waitlist.ranks is None)
+    snapshot = _reader('snapshot', builds=lambda ticket_master: ticket_master.reserved_seats.versions is None)
+    _print_reservations_locked = _writer('print_reservations')
+
+    #print_reservations() holds the read lock only for the O(1) snapshot and formats the listing after releasing it,
+    #so a full listing of a big venue doesn't keep writers waiting. With pending holds it runs as a write, to report the expiries first
+    def print_reservations(self, *page):
+        if self.ticket_master.holds:
+            return self._print_reservations_locked(*page)
+        return self.snapshot().print_reservations(*page)
+
+    #available() answers from the published counts without locking. Pending holds may be due, so with holds it runs as a write and expires them first
+    def available(self, *ignored):
+        if self.ticket_master.holds:
+            return self._expiring_available()
+        seats, waiting = self.counts
+        return f"Total Seats Available : {seats}, Waitlist : {waiting}"
+
+    _expiring_available = _writer('available')
+
+    #read() calls function(ticket_master) under the read lock and returns what it returns, for reads that look at several structures at once
+    def read(self, function):
+        with self.lock.read_locked():
+            return function(self.ticket_master)
+
+    #__getattr__() hands everything else (reserved_seats, waitlist, ...) to the wrapped engine, without any locking
+    def __getattr__(self, name):
+        return getattr(self.ticket_master, name)
+
+#check_state() returns the first broken invariant of a ticket master that no thread is changing, or None.
+#On top of gatorReplay.check_invariants() (trees, waitlist, seat pool, double booking, snapshot copies) it checks that the published Available counts are current
+def check_state(concurrent):
+    ticket_master = concurrent.ticket_master
+    problem = check_invariants(ticket_master)
+    if problem is not None:
+        return problem
+    if concurrent.counts != (len(ticket_master.available_seats), len(ticket_master.waitlist)):
+        return f"published counts {concurrent.counts} are stale"
+    return None
+
+#stress() hammers one ConcurrentTicketMaster from writer and reader threads at the same time. Writers issue seeded random commands for users
+#they created, ReleaseSeats ranges also reach the users of other writers. Readers hold snapshots across writes, page through the reservations,
+#ask for waitlist positions and check every invariant under the read lock.
+#It returns the list of violations found, empty when the engine held up
+def stress(writers: int = 4, readers: int = 4, commands: int = 20000, seats: int = 200, seed: int = 1):
+    concurrent = ConcurrentTicketMaster()
+    concurrent.initialize(seats)
+    violations = []
+    checks = [0]
+    done = threading.Event()
+
+    def write(worker):
+        rng = random.Random(seed * 1000 + worker)
+        users = []
+        for _ in range(commands):
+            roll = rng.random()
+            if roll < 0.4 or not users:
+                user = (len(users) + 1) * writers + worker #every writer owns the user ids congruent to its number
+                users.append(user)
+                concurrent.reserve(user, rng.randint(1, 5))
+            elif roll < 0.6:
+                user = rng.choice(users)
+                seat = concurrent.read(lambda ticket_master: ticket_master.reserved_seats.search(user).seat_id) #0 when the user has no seat
+                if seat:
+                    concurrent.cancel(seat, user)
+            elif roll < 0.75:
+                concurrent.update_priority(rng.choice(users), rng.randint(1, 5))
+            elif roll < 0.85:
+                concurrent.exit_waitlist(rng.choice(users))
+            elif roll < 0.9:
+                batch = [((len(users) + extra) * writers + worker, rng.randint(1, 5)) for extra in range(1, 4)]
+                users.extend(user for user, priority in batch)
+                concurrent.reserve_many(batch)
+            elif roll < 0.95:
+                low = rng.choice(users)
+                concurrent.release_seats(low, low + writers * rng.randint(0, 3))
+            else:
+                concurrent.add_seats(rng.randint(1, 5))
+
+    def read(worker):
+        rng = random.Random(seed * 1000 + writers + worker)
+        while not done.is_set():
+            snapshot = concurrent.snapshot()
+            before = list(snapshot.reservations())
+            problem = concurrent.read(lambda ticket_master: check_state(concurrent))
+            checks[0] += 1
+            if problem:
+                violations.append(problem)
+                return
+            page = concurrent.print_reservations(rng.randint(0, seats), 20)
+            page_seats = [line.split(',')[0] for line in page.split("\n") if line]
+            if len(set(page_seats)) != len(page_seats):
+                violations.append(f"a page lists a seat twice: {page}")
+                return
+            concurrent.waitlist_position(rng.randint(1, writers * commands))
+            concurrent.available()
+            if list(snapshot.reservations()) != before:
+                violations.append("a snapshot changed while it was read")
+                return
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(writers)]
+    checkers = [threading.Thread(target=read, args=(worker,)) for worker in range(readers)]
+    for thread in threads + checkers:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    for thread in checkers:
+        thread.join()
+    problem = check_state(concurrent)
+    if problem:
+        violations.append(problem)
+    print(f"stress: {writers} writers x {commands} commands, {readers} readers, {checks[0]} invariant checks, {len(violations)} violations")
+    return violations
+
+#bench() measures how reads fare next to one writer that keeps cancelling and reserving and one reporting thread that keeps printing every
+#reservation, for each reader count, under the read-write lock and under one exclusive lock. Readers do seat_holder lookups and Available,
+#the mix a seat map page does, and the p99 is the latency of their lookups
+def bench(reader_counts, seconds: float = 2.0, seats: int = 100000):
+    for name, make_lock in (('exclusive', ExclusiveLock), ('read-write', ReadWriteLock)):
+        for readers in reader_counts:
+            concurrent = ConcurrentTicketMaster(lock=make_lock())
+            concurrent.initialize(seats)
+            concurrent.reserve_many([(user, 1) for user in range(1, seats + 1)])
+            done = threading.Event()
+            latencies = [[] for _ in range(readers)]
+            writes = [0]
+            reports = [0]
+
+            def write():
+                rng = random.Random(1)
+                while not done.is_set():
+                    seat = rng.randint(1, seats)
+                    user = concurrent.seat_holder(seat)
+                    if user is not None:
+                        concurrent.cancel(seat, user)
+                        concurrent.reserve(user, 1)
+                        writes[0] += 2
+
+            def report():
+                while not done.is_set():
+                    concurrent.print_reservations()
+                    reports[0] += 1
+
+            def read(worker):
+                rng = random.Random(worker + 2)
+                timings = latencies[worker]
+                clock = time.perf_counter
+                while not done.is_set():
+                    started = clock()
+                    concurrent.seat_holder(rng.randint(1, seats))
+                    timings.append(clock() - started)
+                    concurrent.available()
+
+            threads = [threading.Thread(target=write), threading.Thread(target=report)]
+            threads += [threading.Thread(target=read, args=(worker,)) for worker in range(readers)]
+            for thread in threads:
+                thread.start()
+            time.sleep(seconds)
+            done.set()
+            for thread in threads:
+                thread.join()
+            timings = sorted(timing for worker in latencies for timing in worker)
+            p99 = timings[int(len(timings) * 0.99)] * 1000 if timings else 0.0
+            slowest = timings[-1] * 1000 if timings else 0.0
+            print(f"{name:<10} readers={readers:<3} {len(timings) * 2 / seconds:>9.0f} reads/s  p99 {p99:>6.2f} ms  max {slowest:>7.2f} ms"
+                  f"  {writes[0] / seconds:>7.0f} writes/s  {reports[0] / seconds:>5.1f} reports/s")
+
+# The main block runs the thread stress test or the contention benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Thread safety stress test and lock contention benchmark for GatorTicketMaster.")
+    modes = parser.add_subparsers(dest='mode', required=True)
+
+    stress_parser = modes.add_parser('stress', help="run writer and checker threads against one engine and report invariant violations")
+    stress_parser.add_argument('--writers', type=int, default=4)
+    stress_parser.add_argument('--readers', type=int, default=4)
+    stress_parser.add_argument('--commands', type=int, default=20000, help="commands per writer")
+    stress_parser.add_argument('--seats', type=int, default=200)
+    stress_parser.add_argument('--seed', type=int, default=1)
+
+    bench_parser = modes.add_parser('bench', help="measure read throughput next to a busy writer")
+    bench_parser.add_argument('--readers', type=int, action='append', help="reader thread count, can be repeated (default 1, 2, 4, 8)")
+    bench_parser.add_argument('--seconds', type=float, default=2.0)
+    bench_parser.add_argument('--seats', type=int, default=100000)
+
+    options = parser.parse_args()
+    if options.mode == 'stress':
+        violations = stress(options.writers, options.readers, options.commands, options.seats, options.seed)
+        for violation in violations:
+            print(violation, file=sys.stderr)
+        sys.exit(1 if violations else 0)
+    else:
+        bench(options.readers or [1, 2, 4, 8], options.seconds, options.seats)
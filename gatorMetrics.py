@@ -0,0 +1,151 @@
+import bisect
+import cProfile
+import json
+import time
+from contextlib import contextmanager
+
+#LATENCY_BUCKETS_US are the upper bounds of the latency histogram buckets in microseconds, anything slower lands in the +Inf bucket
+LATENCY_BUCKETS_US = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000, 100000)
+
+#Metrics collects per-command latency histograms and internal counters of one GatorTicketMaster.
+#Nothing in the engine knows about it: instrument() wraps the dispatch table entries and the rotation/heapify methods of that one instance,
+#so an engine that is not instrumented runs exactly the same code as before and pays nothing
+class Metrics:
+    def __init__(self):
+        self.commands = {} #command name -> [count, total_ns, bucket counts]
+        self.counters = {'tree_rotations': 0, 'seat_index_rotations': 0, 'heapify_up_swaps': 0, 'heapify_down_swaps': 0}
+        self.gauges = {'waitlist_size': 0, 'waitlist_size_peak': 0, 'reservations': 0, 'available_seats': 0}
+        self.ticket_master = None
+
+    #instrument() hooks the counters into ticket_master and returns a timed copy of its dispatch table
+    def instrument(self, ticket_master, table):
+        self.ticket_master = ticket_master
+        tree = ticket_master.reserved_seats
+        self._count_rotations(tree, 'tree_rotations')
+        if tree.seat_index is not None:
+            self._count_rotations(tree.seat_index, 'seat_index_rotations')
+        if hasattr(ticket_master.waitlist, '_heapify_up'):  #a LazyWaitlist has no sift loops of its own, heapq runs them in C
+            self._count_heapify_swaps(ticket_master.waitlist)
+        return {command: (self._timed(command, method), arity) for command, (method, arity) in table.items()}
+
+    #_count_rotations() replaces the rotation methods of one tree instance with counting wrappers
+    def _count_rotations(self, tree, counter):
+        counters = self.counters
+        left, right = tree._left_rotation, tree._right_rotation
+
+        def left_rotation(node):
+            counters[counter] += 1
+            left(node)
+
+        def right_rotation(node):
+            counters[counter] += 1
+            right(node)
+
+        tree._left_rotation = left_rotation
+        tree._right_rotation = right_rotation
+
+    #_count_heapify_swaps() wraps the heapify methods of one heap instance. The number of swaps is the number of levels the entry moved,
+    #read from user_index afterwards, so the sift loops themselves stay untouched
+    def _count_heapify_swaps(self, heap):
+        counters = self.counters
+        up, down = heap._heapify_up, heap._heapify_down
+
+        def heapify_up(index):
+            user_id = heap.heap[index][2]
+            up(index)
+            counters['heapify_up_swaps'] += (index + 1).bit_length() - (heap.user_index.get(user_id, index) + 1).bit_length()
+
+        def heapify_down(index):
+            user_id = heap.heap[index][2]
+            down(index)
+            counters['heapify_down_swaps'] += (heap.user_index.get(user_id, index) + 1).bit_length() - (index + 1).bit_length()
+
+        heap._heapify_up = heapify_up
+        heap._heapify_down = heapify_down
+
+    #_timed() wraps one command method so every call lands in its latency histogram and refreshes the size gauges
+    def _timed(self, command, method):
+        stats = self.commands.setdefault(command, [0, 0, [0] * (len(LATENCY_BUCKETS_US) + 1)])
+        perf_counter_ns = time.perf_counter_ns
+
+        def timed(*args):
+            started = perf_counter_ns()
+            result = method(*args)
+            elapsed = perf_counter_ns() - started
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2][bisect.bisect_left(LATENCY_BUCKETS_US, elapsed / 1000)] += 1
+            self._refresh_gauges()
+            return result
+
+        return timed
+
+    #_refresh_gauges() reads the current sizes from the instrumented engine
+    def _refresh_gauges(self):
+        ticket_master = self.ticket_master
+        gauges = self.gauges
+        waitlist = len(ticket_master.waitlist)
+        gauges['waitlist_size'] = waitlist
+        if waitlist > gauges['waitlist_size_peak']:
+            gauges['waitlist_size_peak'] = waitlist
+        gauges['reservations'] = ticket_master.reserved_seats.size
+        gauges['available_seats'] = len(ticket_master.available_seats)
+
+    #to_dict() returns all the metrics as plain data
+    def to_dict(self):
+        commands = {}
+        for command, (count, total_ns, buckets) in sorted(self.commands.items()):
+            if not count:
+                continue
+            bounds = [str(bound) for bound in LATENCY_BUCKETS_US] + ['+Inf']
+            commands[command] = {
+                'count': count,
+                'total_seconds': total_ns / 1e9,
+                'mean_us': total_ns / count / 1e3,
+                'histogram_us': dict(zip(bounds, buckets)),
+            }
+        return {'commands': commands, 'counters': dict(self.counters), 'gauges': dict(self.gauges)}
+
+    #to_json() returns the metrics as a JSON document
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    #to_prometheus() returns the metrics in the Prometheus text exposition format
+    def to_prometheus(self):
+        lines = ['# HELP gator_command_duration_seconds Time spent running each command.',
+                 '# TYPE gator_command_duration_seconds histogram']
+        for command, (count, total_ns, buckets) in sorted(self.commands.items()):
+            if not count:
+                continue
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS_US, buckets):
+                cumulative += bucket
+                lines.append(f'gator_command_duration_seconds_bucket{{command="{command}",le="{bound / 1e6:g}"}} {cumulative}')
+            lines.append(f'gator_command_duration_seconds_bucket{{command="{command}",le="+Inf"}} {count}')
+            lines.append(f'gator_command_duration_seconds_sum{{command="{command}"}} {total_ns / 1e9:.9f}')
+            lines.append(f'gator_command_duration_seconds_count{{command="{command}"}} {count}')
+        for name, value in self.counters.items():
+            lines.append(f'# TYPE gator_{name}_total counter')
+            lines.append(f'gator_{name}_total {value}')
+        for name, value in self.gauges.items():
+            lines.append(f'# TYPE gator_{name} gauge')
+            lines.append(f'gator_{name} {value}')
+        return "\n".join(lines) + "\n"
+
+    #write() saves the metrics to path, fmt is 'json' or 'prometheus'
+    def write(self, path: str, fmt: str = 'json'):
+        if fmt not in ('json', 'prometheus'):
+            raise ValueError(f"Unknown metrics format: {fmt}")
+        with open(path, 'w') as outfile:
+            outfile.write(self.to_json() + "\n" if fmt == 'json' else self.to_prometheus())
+
+#profiled() runs the body of a with block under cProfile and dumps the pstats file to path, e.g. around gator_ticket_commands()
+@contextmanager
+def profiled(path: str):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,358 @@
+import glob
+import inspect
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+from gatorTicketMaster import COMMANDS, GatorTicketMaster, MinHeap, SeatAllocator
+
+#OPCODES are the state changing commands that go into the write-ahead log, read-only commands are never logged
+OPCODES = {
+    'Initialize': 1,
+    'Reserve': 2,
+    'AddSeats': 3,
+    'Cancel': 4,
+    'UpdatePriority': 5,
+    'ReleaseSeats': 6,
+    'ExitWaitlist': 7,
+    'ReserveBlock': 13, #8 to 12 are the read-only commands of the binary protocol
+}
+OPCODE_METHODS = {opcode: COMMANDS[command][0] for command, opcode in OPCODES.items()}
+OPCODE_ARITY = {opcode: COMMANDS[command][1] for command, opcode in OPCODES.items()}
+
+RECORD_BODY = struct.Struct('<Bqqq') #opcode and up to three int64 arguments, unused arguments are 0
+RECORD_CRC = struct.Struct('<I') #crc32 of the body, a torn or corrupt record ends the readable log
+RECORD_SIZE = RECORD_BODY.size + RECORD_CRC.size
+
+SNAPSHOT_MAGIC = b'GATORSN1'
+SNAPSHOT_HEADER = struct.Struct('<8sqqqqqq') #magic, generation, seat_count, entry_count, reservations, waitlist entries, free runs
+SNAPSHOT_FILE = 'snapshot.bin'
+
+#log_path() returns the path of the log file of one generation
+def log_path(directory: str, generation: int):
+    return os.path.join(directory, f"wal.{generation:010d}.log")
+
+#log_generations() returns the generations that have a log file in directory, oldest first
+def log_generations(directory: str):
+    return sorted(int(os.path.basename(path)[4:14]) for path in glob.glob(os.path.join(directory, "wal.*.log")))
+
+#_fsync_directory() makes renames and new files in directory durable, not every platform can open a directory
+def _fsync_directory(directory: str):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+#WriteAheadLog appends fixed size binary records to one log file. Records are buffered and written with a single write and fsync
+#when group_size records are waiting, when sync() is called, or at the latest max_delay seconds after the oldest one was appended (group commit).
+#The last bound holds while no more commands come: a flusher thread, started with the first record, writes a group that has waited long enough.
+#A write or fsync that fails in the flusher is raised by the next append(), sync() or close()
+class WriteAheadLog:
+    def __init__(self, path: str, group_size: int = 64, max_delay: float = 0.005):
+        self.path = path
+        self.file = open(path, 'ab')
+        self.group_size = group_size
+        self.max_delay = max_delay
+        self.pending = [] #encoded records that are not on disk yet
+        self.pending_since = 0.0
+        self.records = 0 #records appended through this object
+        self.lock = threading.Lock() #guards pending and the file between the caller and the flusher
+        self.due = threading.Condition(self.lock) #wakes the flusher when a new group starts or the log closes
+        self.flusher = None #started by the first append()
+        self.error = None #what the flusher's last write raised
+
+    #append() adds one record, it is durable after the next sync
+    def append(self, opcode: int, args):
+        body = RECORD_BODY.pack(opcode, *args, *(0,) * (3 - len(args)))
+        with self.lock:
+            self._raise_error()
+            if not self.pending:
+                self.pending_since = time.monotonic()
+                if self.flusher is None:
+                    self.flusher = threading.Thread(target=self._flush_due, name=f"wal-flusher {self.path}", daemon=True)
+                    self.flusher.start()
+                self.due.notify()
+            self.pending.append(body + RECORD_CRC.pack(zlib.crc32(body)))
+            self.records += 1
+            if len(self.pending) >= self.group_size:
+                self._write()
+
+    #sync() writes every pending record and fsyncs the file once for the whole group
+    def sync(self):
+        with self.lock:
+            self._raise_error()
+            self._write()
+
+    #_write() is sync() for a caller that holds the lock
+    def _write(self):
+        if not self.pending:
+            return
+        self.file.write(b''.join(self.pending))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending.clear()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    #_flush_due() runs in the flusher thread until the log is closed and writes every group that is max_delay old
+    def _flush_due(self):
+        with self.due:
+            while not self.file.closed:
+                if not self.pending:
+                    self.due.wait()
+                    continue
+                left = self.pending_since + self.max_delay - time.monotonic()
+                if left > 0:
+                    self.due.wait(left)
+                    continue
+                try:
+                    self._write()
+                except OSError as error:
+                    self.error = error
+                    self.pending_since = time.monotonic()  #retry after another max_delay instead of spinning
+
+    #close() syncs and closes the file and stops the flusher
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            try:
+                self._raise_error()
+                self._write()
+            finally:
+                self.file.close()
+                self.due.notify()
+        if self.flusher is not None:
+            self.flusher.join()
+
+#read_log() returns the (opcode, args) records of a log file and the byte length of its valid prefix. Reading stops at the first torn or corrupt record
+def read_log(path: str):
+    with open(path, 'rb') as infile:
+        data = infile.read()
+    records = []
+    valid = 0
+    while valid + RECORD_SIZE <= len(data):
+        body = data[valid:valid + RECORD_BODY.size]
+        (crc,) = RECORD_CRC.unpack_from(data, valid + RECORD_BODY.size)
+        if zlib.crc32(body) != crc:
+            break
+        opcode, *args = RECORD_BODY.unpack(body)
+        arity = OPCODE_ARITY.get(opcode)
+        if arity is None:
+            break
+        records.append((opcode, tuple(args[:arity])))
+        valid += RECORD_SIZE
+    return records, valid
+
+#_to_bytes() and _from_bytes() store int64 arrays little-endian whatever the machine byte order is
+def _to_bytes(values):
+    column = array('q', values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+
+def _from_bytes(data: bytes, offset: int, count: int):
+    column = array('q')
+    column.frombytes(data[offset:offset + count * 8])
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column, offset + count * 8
+
+#write_snapshot() saves the full engine state: reservations in user order, the waitlist entries as a MinHeap array (the heap in its exact
+#array order, a LazyWaitlist in waitlist order) with the entry_count tie-break stamps, and the free seat runs. The file is written next to the old one, fsynced and renamed over it atomically
+def write_snapshot(directory: str, ticket_master: GatorTicketMaster, generation: int):
+    reservations = [value for node in ticket_master.reserved_seats for value in (node.user_id, node.seat_id)]
+    waitlist = [value for entry in ticket_master.waitlist.entries() for value in entry]
+    runs = [value for run in ticket_master.available_seats.runs() for value in run]
+    payload = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, generation, ticket_master.seat_count, ticket_master.waitlist.entry_count,
+                                   len(reservations) // 2, len(waitlist) // 3, len(runs) // 2)
+    payload += _to_bytes(reservations) + _to_bytes(waitlist) + _to_bytes(runs)
+
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as outfile:
+        outfile.write(payload + RECORD_CRC.pack(zlib.crc32(payload)))
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.replace(temp_path, path)
+    _fsync_directory(directory)
+
+#read_snapshot() loads a snapshot file into a new GatorTicketMaster with a waitlist_type waitlist and returns it with the generation it was taken at,
+#or (None, None) if there is none. The file is the same for both waitlist types, so a snapshot can be restored into either
+def read_snapshot(directory: str, waitlist_type=MinHeap):
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        return None, None
+    with open(path, 'rb') as infile:
+        data = infile.read()
+    payload, (crc,) = data[:-RECORD_CRC.size], RECORD_CRC.unpack(data[-RECORD_CRC.size:])
+    if zlib.crc32(payload) != crc:
+        raise ValueError(f"Snapshot {path} is corrupt")
+    magic, generation, seat_count, entry_count, reservations, waitlist, runs = SNAPSHOT_HEADER.unpack_from(payload)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a GatorTicketMaster snapshot")
+
+    offset = SNAPSHOT_HEADER.size
+    reservation_column, offset = _from_bytes(payload, offset, reservations * 2)
+    waitlist_column, offset = _from_bytes(payload, offset, waitlist * 3)
+    run_column, offset = _from_bytes(payload, offset, runs * 2)
+
+    ticket_master = GatorTicketMaster(waitlist_type=waitlist_type)
+    ticket_master.seat_count = seat_count
+    ticket_master.reserved_seats.bulk_load(zip(reservation_column[0::2], reservation_column[1::2]))
+    ticket_master.waitlist.load([list(waitlist_column[i:i + 3]) for i in range(0, len(waitlist_column), 3)], entry_count)
+
+    ticket_master.available_seats = SeatAllocator()
+    ticket_master.available_seats.load_runs(zip(run_column[0::2], run_column[1::2]))
+    return ticket_master, generation
+
+#replay() applies logged records to a ticket master, the results are thrown away
+def replay(ticket_master: GatorTicketMaster, records):
+    for opcode, args in records:
+        getattr(ticket_master, OPCODE_METHODS[opcode])(*args)
+
+#recover() rebuilds the engine from directory: the latest snapshot, then every log generation from the snapshot's one onwards.
+#It returns the ticket master, the generation to keep appending to, and the number of records replayed. A torn tail is cut off the last log.
+#waitlist_type is the waitlist of the recovered engine like GatorTicketMaster's
+def recover(directory: str, waitlist_type=MinHeap):
+    ticket_master, generation = read_snapshot(directory, waitlist_type)
+    if ticket_master is None:
+        ticket_master, generation = GatorTicketMaster(waitlist_type=waitlist_type), 0
+    generations = [gen for gen in log_generations(directory) if gen >= generation]
+    replayed = 0
+    for gen in generations:
+        records, valid = read_log(log_path(directory, gen))
+        replay(ticket_master, records)
+        replayed += len(records)
+        if gen == generations[-1] and valid != os.path.getsize(log_path(directory, gen)):
+            with open(log_path(directory, gen), 'r+b') as logfile:
+                logfile.truncate(valid)
+    if generations:
+        generation = generations[-1]
+    return ticket_master, generation, replayed
+
+#_logged() builds a DurableTicketMaster method that logs the command before running it. Arguments left to their defaults
+#(the priority of ReserveBlock) are logged with the default filled in, so a record always holds every argument the command takes
+def _logged(command: str):
+    method, arity = COMMANDS[command]
+    opcode = OPCODES[command]
+    parameters = list(inspect.signature(getattr(GatorTicketMaster, method)).parameters.values())[1:arity + 1]
+    defaults = tuple(parameter.default for parameter in parameters)
+
+    def logged(self, *args):
+        if len(args) < arity and all(default is not inspect.Parameter.empty for default in defaults[len(args):]):
+            args += defaults[len(args):]
+        self.log.append(opcode, args)
+        result = getattr(self.ticket_master, method)(*args)
+        self.records_since_snapshot += 1
+        if self.snapshot_every and self.records_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        return result
+
+    logged.__name__ = method
+    return logged
+
+#_logged_many() builds a DurableTicketMaster batch method (reserve_many, ...). Every item is logged as its own command record,
+#replaying them one by one ends in the same state as the batch, so recovery doesn't need to know about batches
+def _logged_many(command: str, method: str):
+    opcode = OPCODES[command]
+
+    def logged(self, items):
+        items = list(items)
+        for item in items:
+            self.log.append(opcode, item if isinstance(item, tuple) else (item,))
+        result = getattr(self.ticket_master, method)(items)
+        self.records_since_snapshot += len(items)
+        if self.snapshot_every and self.records_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        return result
+
+    logged.__name__ = method
+    return logged
+
+#DurableTicketMaster wraps a GatorTicketMaster that lives in directory. State changing commands are logged before they run,
+#a snapshot is taken every snapshot_every logged commands, and creating it again on the same directory recovers the state.
+#It has the same command methods as GatorTicketMaster, so dispatch_table() and run_command_stream() work with it unchanged.
+#waitlist_type is passed to the engine on every recovery, the files don't record it
+class DurableTicketMaster:
+    def __init__(self, directory: str, snapshot_every: int = 100000, group_size: int = 64, max_delay: float = 0.005, waitlist_type=MinHeap):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.snapshot_every = snapshot_every #0 turns automatic snapshots off
+        self.group_size = group_size
+        self.max_delay = max_delay
+        self.ticket_master, self.generation, self.replayed = recover(directory, waitlist_type)
+        self.records_since_snapshot = self.replayed
+        self.log = WriteAheadLog(log_path(directory, self.generation), group_size, max_delay)
+
+    initialize = _logged('Initialize')
+    reserve = _logged('Reserve')
+    add_seats = _logged('AddSeats')
+    cancel = _logged('Cancel')
+    update_priority = _logged('UpdatePriority')
+    release_seats = _logged('ReleaseSeats')
+    exit_waitlist = _logged('ExitWaitlist')
+    reserve_block = _logged('ReserveBlock')
+    reserve_many = _logged_many('Reserve', 'reserve_many')
+    cancel_many = _logged_many('Cancel', 'cancel_many')
+    update_priority_many = _logged_many('UpdatePriority', 'update_priority_many')
+    exit_waitlist_many = _logged_many('ExitWaitlist', 'exit_waitlist_many')
+
+    #available() and print_reservations() don't change state, so they are not logged
+    def available(self, *ignored):
+        return self.ticket_master.available()
+
+    def print_reservations(self, *page):
+        return self.ticket_master.print_reservations(*page)
+
+    #Seat holds are not offered: an expiry depends on the clock and can't be replayed from the log, so Hold and Confirm are rejected like unknown commands
+    def hold(self, *args):
+        return "Unrecognized command: Hold"
+
+    def confirm(self, *args):
+        return "Unrecognized command: Confirm"
+
+    #__getattr__() hands everything else (reserved_seats, waitlist, seat_holder, ...) to the wrapped engine
+    def __getattr__(self, name):
+        return getattr(self.ticket_master, name)
+
+    #snapshot() starts a new log generation and saves the state as of its start, then drops the logs the snapshot covers
+    def snapshot(self):
+        self.log.close()
+        self.generation += 1
+        self.log = WriteAheadLog(log_path(self.directory, self.generation), self.group_size, self.max_delay)
+        write_snapshot(self.directory, self.ticket_master, self.generation)
+        for gen in log_generations(self.directory):
+            if gen < self.generation:
+                os.remove(log_path(self.directory, gen))
+        self.records_since_snapshot = 0
+
+    #sync() makes every command run so far durable
+    def sync(self):
+        self.log.sync()
+
+    #close() syncs the log and closes it
+    def close(self):
+        self.log.close()
+
+# The main block recovers a state directory and prints what it found
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Usage: python3 gatorPersistence.py <state_directory>")
+        sys.exit(1)
+    started = time.perf_counter()
+    ticket_master, generation, replayed = recover(sys.argv[1])
+    print(f"Recovered generation {generation} in {time.perf_counter() - started:.3f}s, replayed {replayed} log records")
+    print(ticket_master.available())
+    print(f"Reservations: {ticket_master.reserved_seats.size}")
@@ -0,0 +1,377 @@
+import argparse
+import bisect
+import importlib.util
+import inspect
+import random
+import sys
+import time
+
+import gatorTicketMaster
+from gatorTicketMaster import COMMANDS, LazyWaitlist, parse_command
+
+#BASIC_COMMANDS are the commands every version of the engine knows, --basic streams stick to them so older engines can be the reference
+BASIC_COMMANDS = ('Initialize', 'Reserve', 'Available', 'AddSeats', 'Cancel', 'UpdatePriority', 'PrintReservations', 'ReleaseSeats', 'ExitWaitlist')
+WAITLISTS = {'heap': 'MinHeap', 'lazy': 'LazyWaitlist'} #--waitlist choices and the class each one names in the engine module
+
+#_Broken carries the first broken invariant out of the tree walk, check_invariants() turns it into its return value
+class _Broken(Exception):
+    pass
+
+#_check_tree() checks one red-black tree: a black root without a parent, parent pointers, no red node with a red child, the same number of
+#black nodes on every path, subtree counts and size, and keys in order. key reads the key of a node, name says which tree it is
+def _check_tree(tree, key, name):
+    NIL = tree.NIL
+    if NIL.color != 0 or NIL.count != 0:
+        raise _Broken(f"the {name} NIL leaf is not black and empty")
+    if tree.root is not NIL and (tree.root.color != 0 or tree.root.parent is not None):
+        raise _Broken(f"the {name} root is red or has a parent")
+
+    #black_height() returns the number of black nodes on every path below node, NIL included
+    def black_height(node):
+        if node is NIL:
+            return 1
+        for child in (node.left, node.right):
+            if child is not NIL and child.parent is not node:
+                raise _Broken(f"a child of {name} node {key(node)} points at another parent")
+        if node.color == 1 and (node.left.color == 1 or node.right.color == 1):
+            raise _Broken(f"red {name} node {key(node)} has a red child")
+        left, right = black_height(node.left), black_height(node.right)
+        if left != right:
+            raise _Broken(f"the black heights below {name} node {key(node)} differ: {left} and {right}")
+        if node.count != node.left.count + node.right.count + 1:
+            raise _Broken(f"the subtree count of {name} node {key(node)} is {node.count}, not {node.left.count + node.right.count + 1}")
+        return left + (node.color == 0)
+
+    black_height(tree.root)
+    keys = [key(node) for node in tree]
+    if any(later < earlier for earlier, later in zip(keys, keys[1:])):
+        raise _Broken(f"the {name} keys are out of order")
+    if len(keys) != tree.size or len(keys) != tree.root.count:
+        raise _Broken(f"the {name} holds {len(keys)} nodes but its size is {tree.size} and its root count {tree.root.count}")
+
+#_check_waitlist() checks heap order and the user index of a MinHeap, or heap order and the live items and tombstones of a LazyWaitlist
+def _check_waitlist(waitlist):
+    heap = waitlist.heap
+    if isinstance(waitlist, LazyWaitlist):
+        for index in range(1, len(heap)):
+            if heap[index] < heap[(index - 1) // 2]:
+                raise _Broken(f"the waitlist item of user {heap[index][2]} is above its parent")
+        live = sum(1 for item in heap if waitlist.user_item.get(item[2]) is item)
+        if live != len(waitlist.user_item):
+            raise _Broken(f"{len(waitlist.user_item) - live} waiting users have no live heap item")
+        if len(heap) - live != waitlist.tombstones:
+            raise _Broken(f"the waitlist counts {waitlist.tombstones} tombstones but holds {len(heap) - live}")
+        return
+    for index, entry in enumerate(heap):
+        if waitlist.user_index.get(entry[2]) != index:
+            raise _Broken(f"the waitlist index of user {entry[2]} is wrong")
+        if index and waitlist._compare(entry, heap[(index - 1) // 2]) < 0:
+            raise _Broken(f"the waitlist entry of user {entry[2]} is above its parent")
+    if len(waitlist.user_index) != len(heap):
+        raise _Broken("the waitlist index has stale users")
+
+#_check_pool() checks that the free runs are sorted, apart, inside the venue and mirrored in run_start, that count adds them up,
+#that every run start is in the heap, and that the RunIndex, once built, has every run at its start
+def _check_pool(pool, seat_count: int):
+    runs = pool.runs()
+    for (start, end), (next_start, next_end) in zip(runs, runs[1:]):
+        if next_start <= end + 1:
+            raise _Broken(f"free runs {start}-{end} and {next_start}-{next_end} overlap or touch")
+    for start, end in runs:
+        if not 1 <= start <= end <= seat_count:
+            raise _Broken(f"free run {start}-{end} is not inside 1..{seat_count}")
+        if pool.run_start.get(end) != start:
+            raise _Broken(f"run_start doesn't point back from {end} to {start}")
+    if len(pool.run_start) != len(runs):
+        raise _Broken("run_start has stale runs")
+    if pool.count != sum(end - start + 1 for start, end in runs):
+        raise _Broken(f"the pool counts {pool.count} free seats but its runs hold {sum(end - start + 1 for start, end in runs)}")
+    if not set(pool.run_end) <= set(pool.heap):
+        raise _Broken("a free run is missing from the pool heap")
+    if pool.blocks is not None and pool.blocks.levels[0] != {start: end - start + 1 for start, end in runs}:
+        raise _Broken("the RunIndex differs from the free runs")
+    return runs
+
+#check_invariants() returns the first broken invariant of a ticket master as text, or None when everything holds. It knows the structures of
+#gatorTicketMaster.py: both red-black trees, the waitlist, the seat pool, seats booked twice or both booked and free, holds, and the
+#rank and snapshot structures once they are built. It walks everything, so it costs O(n + W + r) per call
+def check_invariants(ticket_master):
+    try:
+        tree = ticket_master.reserved_seats
+        _check_tree(tree, lambda node: node.user_id, "reservation tree")
+        _check_tree(tree.seat_index, lambda node: node.seat_id, "seat index")
+        pairs = [(node.seat_id, node.user_id) for node in tree.seat_index]
+        for (seat, user), (next_seat, next_user) in zip(pairs, pairs[1:]):
+            if seat == next_seat:
+                raise _Broken(f"seat {seat} is reserved twice, by users {user} and {next_user}")
+        if sorted((node.seat_id, node.user_id) for node in tree) != pairs:
+            raise _Broken("the reservation tree and the seat index hold different reservations")
+
+        seat_count = ticket_master.seat_count
+        runs = _check_pool(ticket_master.available_seats, seat_count)
+        starts = [start for start, end in runs]
+        for seat, user in pairs:
+            if not 1 <= seat <= seat_count:
+                raise _Broken(f"user {user} holds seat {seat} outside 1..{seat_count}")
+            index = bisect.bisect_right(starts, seat) - 1
+            if index >= 0 and seat <= runs[index][1]:
+                raise _Broken(f"seat {seat} is both reserved by user {user} and free")
+        if len(pairs) + len(ticket_master.available_seats) != seat_count:
+            raise _Broken(f"{len(pairs)} reserved and {len(ticket_master.available_seats)} free seats for {seat_count} seats")
+
+        waitlist = ticket_master.waitlist
+        _check_waitlist(waitlist)
+        if len(waitlist) and len(ticket_master.available_seats):
+            raise _Broken(f"{len(waitlist)} users wait while {len(ticket_master.available_seats)} seats are free")
+        order = [(entry[2], entry[0]) for entry in sorted(waitlist.entries(), key=lambda entry: (-entry[0], entry[1]))]
+        if waitlist.ranks is not None and waitlist.ranks.top(len(order)) != order:
+            raise _Broken("the waitlist ranks differ from the waitlist")
+        if waitlist.versions is not None and [user_id for key, user_id in waitlist.versions] != [user_id for user_id, priority in order]:
+            raise _Broken("the persistent waitlist differs from the waitlist")
+        if tree.versions is not None and list(tree.versions) != pairs:
+            raise _Broken("the persistent seat map differs from the seat index")
+
+        if ticket_master.holds is not None:
+            if set(ticket_master.holds.deadlines) != set(ticket_master.hold_seats):
+                raise _Broken(f"the hold timers of users {sorted(ticket_master.holds.deadlines)} don't match the holds of users {sorted(ticket_master.hold_seats)}")
+            for user_id, seat_id in ticket_master.hold_seats.items():
+                if ticket_master.seat_holder(seat_id) != user_id:
+                    raise _Broken(f"user {user_id} holds seat {seat_id}, but the seat index says {ticket_master.seat_holder(seat_id)}")
+                if tree.search_seat(user_id, seat_id) is tree.NIL:
+                    raise _Broken(f"user {user_id} holds seat {seat_id}, but the reservation tree has no such node")
+        elif ticket_master.hold_seats:
+            raise _Broken(f"users {sorted(ticket_master.hold_seats)} hold seats without a hold timer")
+    except _Broken as broken:
+        return str(broken)
+    return None
+
+#StepClock is the clock of the engines in a replay and of the generator's shadow engine. It is set to the position of the command before
+#the command runs, so Hold deadlines count in commands and a hold expires at the same command in every engine
+class StepClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+#load_engine() returns a factory that builds the GatorTicketMaster of the module file at path (this gatorTicketMaster.py for None)
+#with a StepClock and the named waitlist. Older engines without a clock or waitlist_type parameter get what they accept
+def load_engine(path: str = None, waitlist: str = None):
+    module = gatorTicketMaster
+    if path is not None:
+        spec = importlib.util.spec_from_file_location(f"engine_{abs(hash(path))}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    engine = module.GatorTicketMaster
+    parameters = inspect.signature(engine).parameters
+    if waitlist is not None and ('waitlist_type' not in parameters or not hasattr(module, WAITLISTS[waitlist])):
+        raise ValueError(f"{path or 'gatorTicketMaster.py'} can't run with the {waitlist} waitlist")
+
+    def factory(clock):
+        options = {}
+        if 'clock' in parameters:
+            options['clock'] = clock
+        if waitlist is not None:
+            options['waitlist_type'] = getattr(module, WAITLISTS[waitlist])
+        return engine(**options)
+    return factory
+
+#run_line() runs one parsed command the way run_command_stream() does and returns its text, methods an engine doesn't have are unrecognized
+def run_line(ticket_master, command: str, args: tuple):
+    entry = COMMANDS.get(command)
+    method = getattr(ticket_master, entry[0], None) if entry is not None else None
+    if method is None or (entry[1] is not None and entry[1] != len(args)):
+        return f"Unrecognized command: {command}"
+    return method(*args)
+
+#Divergence is the first place a candidate engine went wrong in a replay. kind is 'output' for a different output line, 'error' for an
+#exception and 'invariant' for a broken invariant. command is the 0-based position of the command line, output_line the 1-based output line
+class Divergence:
+    def __init__(self, kind: str, command: int, line: str, output_line: int, expected, got):
+        self.kind = kind
+        self.command = command
+        self.line = line
+        self.output_line = output_line
+        self.expected = expected
+        self.got = got
+
+    def __str__(self):
+        where = f"command {self.command + 1} ({self.line}), output line {self.output_line}"
+        if self.kind == 'invariant':
+            return f"{where}: invariant broken after the command: {self.got}"
+        return f"{where}: expected {self.expected!r}, got {self.got!r}"
+
+#_output_lines() returns the lines a command writes, none for an empty result
+def _output_lines(result):
+    return result.split("\n") if result else []
+
+#replay() runs command lines through a reference and a candidate engine built by the two factories, command by command, and returns the first
+#Divergence or None. With check_every > 0 check_invariants() runs on the candidate after every check_every commands and after the last one
+def replay(lines, reference_factory=None, candidate_factory=None, check_every: int = 0):
+    reference_factory = reference_factory or load_engine()
+    candidate_factory = candidate_factory or load_engine()
+    clock = StepClock()
+    reference, candidate = reference_factory(clock), candidate_factory(clock)
+    written = 0 #output lines before the current command
+    position, line = -1, ""
+    stripped = (text.strip() for text in lines)
+    for position, line in enumerate(text for text in stripped if text):
+        clock.now = position
+        command, args = parse_command(line)
+        if command == 'Quit':
+            break
+        expected = _output_lines(run_line(reference, command, args))
+        try:
+            got = _output_lines(run_line(candidate, command, args))
+        except Exception as error:
+            return Divergence('error', position, line, written + 1, expected[0] if expected else None, f"{type(error).__name__}: {error}")
+        if got != expected:
+            index = next((i for i, (want, have) in enumerate(zip(expected, got)) if want != have), min(len(expected), len(got)))
+            return Divergence('output', position, line, written + index + 1, expected[index] if index < len(expected) else None,
+                              got[index] if index < len(got) else None)
+        written += len(expected)
+        if check_every and (position + 1) % check_every == 0:
+            problem = check_invariants(candidate)
+            if problem:
+                return Divergence('invariant', position, line, written, None, problem)
+    if check_every:
+        problem = check_invariants(candidate)
+        if problem:
+            return Divergence('invariant', position, line, written, None, problem)
+    return None
+
+#generate_stream() returns a reproducible fuzz stream of command lines for seed, starting with Initialize and ending with Quit.
+#A shadow engine runs along so Reserve goes to users who neither hold a seat nor wait (the engine expects that), Hold and ReserveBlock
+#sometimes go to users who already have seats and Hold sometimes to a user whose hold is still pending, while Cancel, ExitWaitlist, UpdatePriority and Confirm mostly hit users who are in the system. It also sends invalid counts and ranges,
+#wrong argument counts and unknown commands. With basic=True it only sends BASIC_COMMANDS with the arguments the first engine took
+def generate_stream(seed: int, commands: int = 500, seats: int = None, users: int = None, basic: bool = False):
+    rng = random.Random(seed)
+    seats = seats or rng.randint(1, 30)
+    users = users or rng.randint(5, 80)
+    clock = StepClock()
+    shadow = load_engine()(clock)
+    tree = shadow.reserved_seats
+    lines = [f"Initialize({seats})"]
+    shadow.initialize(seats)
+
+    kinds = ['reserve', 'cancel_own', 'cancel_any', 'exit_waitlist', 'update_priority', 'add_seats', 'release_seats', 'available', 'print_reservations']
+    weights = [30, 12, 4, 7, 10, 4, 4, 5, 4]
+    if not basic:
+        kinds += ['print_page', 'waitlist_position', 'waitlist_top', 'reserve_block', 'hold', 'confirm', 'invalid']
+        weights += [2, 4, 2, 3, 4, 3, 1]
+    for kind in rng.choices(kinds, weights, k=commands):
+        user_id = rng.randint(1, users)
+        if kind == 'hold' and shadow.hold_seats and rng.random() < 0.1:
+            user_id = rng.choice(list(shadow.hold_seats))  #a second Hold has to be turned down
+            line = f"Hold({user_id}, {rng.randint(1, 5)}, {rng.randint(0, 8)})"
+        elif kind in ('reserve', 'reserve_block', 'hold'):
+            seated = kind != 'reserve' and rng.random() < 0.3  #a user who already has seats is fine too
+            while (user_id in shadow.waitlist or user_id in shadow.hold_seats
+                   or (tree.search(user_id) is not tree.NIL and not seated)):
+                user_id = rng.randint(1, users * 3) if rng.random() < 0.7 else rng.randint(1, 10 ** 6)
+            if kind == 'reserve':
+                line = f"Reserve({user_id}, {rng.randint(1, 5)})"
+            elif kind == 'reserve_block':
+                line = f"ReserveBlock({user_id}, {rng.randint(0, 5)}, {rng.randint(1, 5)})"
+            else:
+                line = f"Hold({user_id}, {rng.randint(1, 5)}, {rng.randint(0, 8)})"
+        elif kind == 'cancel_own':
+            node = tree.search(user_id)
+            line = f"Cancel({node.seat_id if node is not tree.NIL else rng.randint(1, seats)}, {user_id})"
+        elif kind == 'cancel_any':
+            line = f"Cancel({rng.randint(1, seats + 10)}, {user_id})"
+        elif kind == 'exit_waitlist':
+            line = f"ExitWaitlist({user_id})"
+        elif kind == 'update_priority':
+            line = f"UpdatePriority({user_id}, {rng.randint(1, 5)})"
+        elif kind == 'add_seats':
+            line = f"AddSeats({rng.randint(-1, 6)})"
+        elif kind == 'release_seats':
+            lo = rng.randint(1, users)
+            line = f"ReleaseSeats({lo}, {lo + rng.randint(-2, 15)})"
+        elif kind == 'available':
+            line = "Available()"
+        elif kind == 'print_reservations':
+            line = "PrintReservations()"
+        elif kind == 'print_page':
+            line = f"PrintReservations({rng.randint(-1, seats)}, {rng.randint(0, 6)})"
+        elif kind == 'waitlist_position':
+            line = f"WaitlistPosition({user_id})"
+        elif kind == 'waitlist_top':
+            line = f"WaitlistTop({rng.randint(0, 6)})"
+        elif kind == 'confirm':
+            held = list(shadow.hold_seats)
+            line = f"Confirm({rng.choice(held) if held and rng.random() < 0.8 else user_id})"
+        else:
+            line = rng.choice([f"Reserve({user_id})", f"Release({user_id}, {user_id + 3})", "Cancel()", f"AddSeats(1, {user_id})"])
+
+        clock.now = len(lines)
+        run_line(shadow, *parse_command(line))
+        lines.append(line)
+    lines.append("Quit()")
+    return lines
+
+#fuzz() replays the streams of seeds first_seed, first_seed + 1, ... and returns (seed, Divergence) for the first one that diverges, or None
+def fuzz(seeds: int, reference_factory=None, candidate_factory=None, check_every: int = 0, first_seed: int = 0, **stream_options):
+    for seed in range(first_seed, first_seed + seeds):
+        divergence = replay(generate_stream(seed, **stream_options), reference_factory, candidate_factory, check_every)
+        if divergence is not None:
+            return seed, divergence
+    return None
+
+# The main block compares two engines on a command file or on fuzz streams, and writes fuzz streams out so a failure can be replayed
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Differential replay and invariant checks for GatorTicketMaster engines.")
+    modes = parser.add_subparsers(dest='mode', required=True)
+    diff_parser = modes.add_parser('diff', help="replay a command file through both engines and report the first diverging output line")
+    diff_parser.add_argument('input')
+    fuzz_parser = modes.add_parser('fuzz', help="replay seeded fuzz streams through both engines until one diverges")
+    fuzz_parser.add_argument('--seeds', type=int, default=200)
+    fuzz_parser.add_argument('--first-seed', type=int, default=0)
+    generate_parser = modes.add_parser('generate', help="write the fuzz stream of one seed")
+    generate_parser.add_argument('--seed', type=int, default=0)
+    generate_parser.add_argument('output', nargs='?', default='-', help="text file, or - for stdout (default)")
+    for mode_parser in (fuzz_parser, generate_parser):
+        mode_parser.add_argument('--commands', type=int, default=500, help="commands per stream (default 500)")
+        mode_parser.add_argument('--seats', type=int, help="seats to initialize (default: drawn from the seed, 1..30)")
+        mode_parser.add_argument('--users', type=int, help="size of the user id space (default: drawn from the seed, 5..80)")
+        mode_parser.add_argument('--basic', action='store_true', help="only the original nine commands, for an old reference engine")
+    for mode_parser in (diff_parser, fuzz_parser):
+        mode_parser.add_argument('--reference', help="engine module file (default: this gatorTicketMaster.py)")
+        mode_parser.add_argument('--candidate', help="engine module file (default: this gatorTicketMaster.py)")
+        mode_parser.add_argument('--reference-waitlist', choices=sorted(WAITLISTS))
+        mode_parser.add_argument('--candidate-waitlist', choices=sorted(WAITLISTS))
+        mode_parser.add_argument('--check-every', type=int, default=0, help="check the candidate's invariants every N commands (default off)")
+
+    options = parser.parse_args()
+    if options.mode == 'generate':
+        lines = generate_stream(options.seed, options.commands, options.seats, options.users, options.basic)
+        outfile = sys.stdout if options.output == '-' else open(options.output, 'w')
+        try:
+            outfile.write("".join(line + "\n" for line in lines))
+        finally:
+            if outfile is not sys.stdout:
+                outfile.close()
+        sys.exit(0)
+
+    reference = load_engine(options.reference, options.reference_waitlist)
+    candidate = load_engine(options.candidate, options.candidate_waitlist)
+    started = time.perf_counter()
+    if options.mode == 'diff':
+        with open(options.input) as infile:
+            divergence = replay(infile, reference, candidate, options.check_every)
+        if divergence is not None:
+            print(f"{options.input}: {divergence}")
+            sys.exit(1)
+        print(f"{options.input}: identical output in {time.perf_counter() - started:.2f}s")
+    else:
+        failure = fuzz(options.seeds, reference, candidate, options.check_every, options.first_seed,
+                       commands=options.commands, seats=options.seats, users=options.users, basic=options.basic)
+        if failure is not None:
+            seed, divergence = failure
+            print(f"seed {seed}: {divergence}")
+            print(f"replay it with: python3 gatorReplay.py generate --seed {seed} --commands {options.commands}"
+                  + (f" --seats {options.seats}" if options.seats else "") + (f" --users {options.users}" if options.users else "")
+                  + (" --basic" if options.basic else "") + " stream.txt")
+            sys.exit(1)
+        print(f"{options.seeds} streams of {options.commands} commands: identical output in {time.perf_counter() - started:.2f}s")
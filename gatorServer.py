@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+
+from gatorPersistence import OPCODES, DurableTicketMaster
+from gatorTicketMaster import COMMANDS, QUIT_MESSAGE, GatorTicketMaster, dispatch_table, parse_command, run_command
+
+#PROTOCOL_OPCODES extends the write-ahead log opcodes with the read-only commands and the holds for the binary protocol.
+#A binary request is REQUEST (opcode, three int64 arguments, unused ones 0), the reply is a 4 byte length followed by the UTF-8 result text
+PROTOCOL_OPCODES = {**OPCODES, 'Available': 8, 'PrintReservations': 9, 'Quit': 10, 'WaitlistPosition': 11, 'WaitlistTop': 12,
+                    'Hold': 14, 'Confirm': 15}
+OPCODE_COMMANDS = {opcode: command for command, opcode in PROTOCOL_OPCODES.items()}
+OPCODE_ARITY = {opcode: (COMMANDS[command][1] or 0) if command in COMMANDS else 0 for command, opcode in PROTOCOL_OPCODES.items()}
+REQUEST = struct.Struct('<Bqqq')
+REQUEST_ARGS = 3
+REPLY_LENGTH = struct.Struct('<I')
+BINARY_PREAMBLE = b'\x00' #the first byte of a binary connection, a text command never starts with NUL
+READ_SIZE = 1 << 16
+
+#_text_reply() frames one result for the text protocol: the result lines followed by an empty line. Results never contain empty lines, so the
+#empty line always ends the reply, and an empty result (PrintReservations with no reservations) is just the empty line
+def _text_reply(result: str):
+    return (result + "\n\n" if result else "\n").encode()
+
+#_binary_reply() frames one result for the binary protocol
+def _binary_reply(result: str):
+    encoded = result.encode()
+    return REPLY_LENGTH.pack(len(encoded)) + encoded
+
+#TicketServer serves the command protocol to many connections and runs every command through one engine.
+#A connection parses everything it has read into a batch and puts it on a queue, one engine task runs the batches in arrival order,
+#so the engine has a single writer and a pipelined read of many commands costs one queue round trip and one write back
+class TicketServer:
+    def __init__(self, ticket_master=None):
+        self.ticket_master = ticket_master if ticket_master is not None else GatorTicketMaster()
+        self.table = dispatch_table(self.ticket_master)
+        self.queue = None #created on the running loop in start()
+        self.commands = 0 #commands run so far
+        self.server = None
+        self.engine_task = None
+
+    #start() starts the engine task and listens on host:port, or on a Unix socket when unix_path is given
+    async def start(self, host: str = '127.0.0.1', port: int = 7777, unix_path: str = None):
+        self.queue = asyncio.Queue()
+        self.engine_task = asyncio.create_task(self._engine())
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self._handle, path=unix_path)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    #close() stops listening and stops the engine task
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.engine_task.cancel()
+
+    #_engine() is the only place commands run. A batch is a list of (command, args), args is None for a line that could not be parsed.
+    #Processing stops at Quit, so the caller can tell from the number of results whether the connection asked to quit.
+    #A command that raises is answered with an error line and the batch goes on, a failed sync fails the whole batch it should have made durable.
+    #Either way the task keeps running, one bad request must not leave every other connection waiting forever
+    async def _engine(self):
+        table = self.table
+        sync = getattr(self.ticket_master, 'sync', None) #a DurableTicketMaster group-commits once per batch before answering
+        while True:
+            batch, future = await self.queue.get()
+            results = []
+            for command, args in batch:
+                if command == 'Quit':
+                    results.append(QUIT_MESSAGE)
+                    break
+                if args is None:
+                    results.append(f"Unrecognized command: {command}")
+                    continue
+                try:
+                    results.append(run_command(table, command, args))
+                except Exception as error:
+                    print(f"{command}{args} failed: {error!r}", file=sys.stderr, flush=True)
+                    results.append(f"Error: {command} failed: {error}")
+            self.commands += len(results)
+            try:
+                if sync is not None:
+                    sync()
+            except Exception as error:
+                if not future.cancelled():
+                    future.set_exception(error)
+                continue
+            if not future.cancelled():  #the connection went away while its batch was queued
+                future.set_result(results)
+
+    #_submit() queues a batch for the engine and waits for its results
+    async def _submit(self, batch):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((batch, future))
+        return await future
+
+    #_handle() looks at the first byte of a connection to pick the protocol: a binary client opens with BINARY_PREAMBLE, anything else is text.
+    #Opcodes such as Quit=10 are also whitespace bytes, so the opcode itself can't tell a binary request from a text client's blank line
+    async def _handle(self, reader, writer):
+        try:
+            data = await reader.read(READ_SIZE)
+            if data[:1] == BINARY_PREAMBLE:
+                await self._serve_binary(reader, writer, data[1:] or await reader.read(READ_SIZE))
+            elif data:
+                await self._serve_text(reader, writer, data)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    #_run_batch() sends a batch to the engine, writes the replies and returns True if the connection quit
+    async def _run_batch(self, writer, batch, frame):
+        results = await self._submit(batch)
+        writer.write(b''.join(frame(result) for result in results))
+        await writer.drain()
+        return batch[len(results) - 1][0] == 'Quit'
+
+    #_serve_text() runs the line protocol, the complete lines of every read become one batch.
+    #Bytes that are not UTF-8 are decoded as U+FFFD, so such a line fails to parse and is answered as unrecognized
+    async def _serve_text(self, reader, writer, data: bytes):
+        carry = b''
+        while data:
+            data = carry + data
+            end = data.rfind(b'\n')
+            if end < 0:
+                carry = data
+            else:
+                carry = data[end + 1:]
+                batch = []
+                for line in data[:end].decode(errors='replace').split('\n'):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        batch.append(parse_command(line))
+                    except ValueError:  #bad numbers are answered instead of dropping the connection
+                        batch.append((line.partition('(')[0], None))
+                if batch and await self._run_batch(writer, batch, _text_reply):
+                    return
+            data = await reader.read(READ_SIZE)
+
+    #_serve_binary() runs the fixed width protocol, the complete requests of every read become one batch
+    async def _serve_binary(self, reader, writer, data: bytes):
+        size = REQUEST.size
+        carry = b''
+        while data:
+            data = carry + data
+            whole = len(data) - len(data) % size
+            carry = data[whole:]
+            batch = []
+            for opcode, first, second, third in REQUEST.iter_unpack(data[:whole]):
+                command = OPCODE_COMMANDS.get(opcode)
+                if command is None:
+                    batch.append((f"opcode {opcode}", None))
+                else:
+                    batch.append((command, (first, second, third)[:OPCODE_ARITY[opcode]]))
+            if batch and await self._run_batch(writer, batch, _binary_reply):
+                return
+            data = await reader.read(READ_SIZE)
+
+#encode_binary() turns command lines into binary protocol requests. A line with more arguments than its request carries raises ValueError
+#instead of losing the extra ones, that covers the paged PrintReservations, which the binary protocol only sends without a page
+def encode_binary(lines):
+    requests = []
+    for line in lines:
+        command, args = parse_command(line)
+        opcode = PROTOCOL_OPCODES[command]
+        if len(args) > OPCODE_ARITY[opcode]:
+            raise ValueError(f"{command} takes at most {OPCODE_ARITY[opcode]} arguments in a binary request, got {len(args)}")
+        args = tuple(args) + (0,) * (REQUEST_ARGS - len(args))
+        requests.append(REQUEST.pack(opcode, *args))
+    return b''.join(requests)
+
+#TicketClient is a small pipelining client for both protocols, a binary client opens the connection with BINARY_PREAMBLE
+class TicketClient:
+    def __init__(self, reader, writer, binary: bool = False):
+        self.reader = reader
+        self.writer = writer
+        self.binary = binary
+        if binary:
+            writer.write(BINARY_PREAMBLE)
+
+    #connect() opens a connection to host:port, or to a Unix socket when unix_path is given
+    @classmethod
+    async def connect(cls, host: str = '127.0.0.1', port: int = 7777, unix_path: str = None, binary: bool = False):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, binary)
+
+    #send() pipelines a list of command lines in one write and returns their results in order
+    async def send(self, lines):
+        self.writer.write(encode_binary(lines) if self.binary else ("\n".join(lines) + "\n").encode())
+        await self.writer.drain()
+        results = []
+        for _ in lines:
+            if self.binary:
+                (length,) = REPLY_LENGTH.unpack(await self.reader.readexactly(REPLY_LENGTH.size))
+                results.append((await self.reader.readexactly(length)).decode())
+            else:
+                reply = []
+                line = await self.reader.readline()
+                while line not in (b'\n', b''):
+                    reply.append(line[:-1].decode())
+                    line = await self.reader.readline()
+                results.append("\n".join(reply))
+            if results[-1] == QUIT_MESSAGE:
+                break
+        return results
+
+    #close() closes the connection
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+#client_workload() returns a reproducible command mix for one load generator connection, user ids are unique to the connection
+def client_workload(connection: int, commands: int, seed: int = 1):
+    rng = random.Random(seed * 100003 + connection)
+    base = (connection + 1) * 10_000_000
+    lines = []
+    next_user = 0
+    for _ in range(commands):
+        roll = rng.random()
+        if roll < 0.6 or next_user == 0:
+            next_user += 1
+            lines.append(f"Reserve({base + next_user}, {rng.randint(1, 5)})")
+        elif roll < 0.75:
+            lines.append("Available()")
+        elif roll < 0.9:
+            lines.append(f"UpdatePriority({base + rng.randint(1, next_user)}, {rng.randint(1, 5)})")
+        else:
+            lines.append(f"ExitWaitlist({base + rng.randint(1, next_user)})")
+    return lines
+
+#run_load() opens connections clients, each sending commands commands pipeline at a time, and returns throughput and batch latency figures
+async def run_load(connections: int = 100, commands: int = 1000, pipeline: int = 32, host: str = '127.0.0.1', port: int = 7777,
+                   unix_path: str = None, binary: bool = False, seed: int = 1):
+    latencies = []
+
+    async def one_client(connection):
+        client = await TicketClient.connect(host, port, unix_path, binary)
+        lines = client_workload(connection, commands, seed)
+        for start in range(0, len(lines), pipeline):
+            before = time.perf_counter()
+            await client.send(lines[start:start + pipeline])
+            latencies.append(time.perf_counter() - before)
+        await client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_client(connection) for connection in range(connections)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    total = connections * commands
+    return {
+        'connections': connections,
+        'commands': total,
+        'pipeline': pipeline,
+        'protocol': 'binary' if binary else 'text',
+        'seconds': elapsed,
+        'commands_per_second': total / elapsed if elapsed else 0.0,
+        'batch_p50_ms': latencies[len(latencies) // 2] * 1e3 if latencies else 0.0,
+        'batch_p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3 if latencies else 0.0,
+    }
+
+#serve() runs a server until it is interrupted
+async def serve(host, port, unix_path, ticket_master=None):
+    server = TicketServer(ticket_master)
+    await server.start(host, port, unix_path)
+    print(f"Serving on {unix_path or f'{host}:{port}'}", file=sys.stderr, flush=True)
+    await server.server.serve_forever()
+
+#bench() starts a server in a child process, so the load generator does not share its core, and reports throughput for each pipeline depth
+def bench(connections, commands, pipelines, seats, binary, port):
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--port', str(port)], stderr=subprocess.PIPE)
+    try:
+        child.stderr.readline()  #wait for the "Serving on" line
+
+        async def run_all():
+            setup = await TicketClient.connect(port=port)
+            await setup.send([f"Initialize({seats})"])
+            await setup.close()
+            reports = []
+            for pipeline in pipelines:
+                reports.append(await run_load(connections, commands, pipeline, port=port, binary=binary))
+            return reports
+
+        for report in asyncio.run(run_all()):
+            print(f"{report['protocol']} pipeline={report['pipeline']:<4} {report['connections']} connections, {report['commands']} commands: "
+                  f"{report['commands_per_second']:.0f} commands/s, batch p50 {report['batch_p50_ms']:.2f}ms p99 {report['batch_p99_ms']:.2f}ms")
+    finally:
+        child.terminate()
+        child.wait()
+
+# The main block has three modes: serve runs the server, load runs the load generator against a running server, bench does both and reports throughput
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Network front-end for GatorTicketMaster.")
+    modes = parser.add_subparsers(dest='mode', required=True)
+
+    serve_parser = modes.add_parser('serve', help="run the server")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=7777)
+    serve_parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    serve_parser.add_argument('--state-dir', metavar='DIR', help="keep the engine durable in DIR (see gatorPersistence.py)")
+
+    load_parser = modes.add_parser('load', help="run the load generator against a running server")
+    load_parser.add_argument('--host', default='127.0.0.1')
+    load_parser.add_argument('--port', type=int, default=7777)
+    load_parser.add_argument('--unix', metavar='PATH')
+    load_parser.add_argument('--connections', type=int, default=100)
+    load_parser.add_argument('--commands', type=int, default=1000, help="commands per connection")
+    load_parser.add_argument('--pipeline', type=int, default=32, help="commands sent per write")
+    load_parser.add_argument('--binary', action='store_true', help="use the binary protocol")
+    load_parser.add_argument('--seed', type=int, default=1)
+
+    bench_parser = modes.add_parser('bench', help="start a server and measure throughput for several pipeline depths")
+    bench_parser.add_argument('--port', type=int, default=7788)
+    bench_parser.add_argument('--connections', type=int, default=200)
+    bench_parser.add_argument('--commands', type=int, default=500, help="commands per connection")
+    bench_parser.add_argument('--pipeline', type=int, action='append', help="pipeline depth, can be repeated (default 1, 16, 128)")
+    bench_parser.add_argument('--seats', type=int, default=50000)
+    bench_parser.add_argument('--binary', action='store_true')
+
+    options = parser.parse_args()
+    if options.mode == 'serve':
+        ticket_master = DurableTicketMaster(options.state_dir) if options.state_dir else None
+        try:
+            asyncio.run(serve(options.host, options.port, options.unix, ticket_master))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if ticket_master is not None:
+                ticket_master.close()
+    elif options.mode == 'load':
+        report = asyncio.run(run_load(options.connections, options.commands, options.pipeline, options.host, options.port,
+                                      options.unix, options.binary, options.seed))
+        print(report)
+    else:
+        bench(options.connections, options.commands, options.pipeline or [1, 16, 128], options.seats, options.binary, options.port)
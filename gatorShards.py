@@ -0,0 +1,162 @@
+import argparse
+import multiprocessing
+import sys
+import time
+import zlib
+
+from gatorTicketMaster import QUIT_MESSAGE, GatorTicketMaster, dispatch_table, parse_command, run_command
+
+BATCH_SIZE = 10000 #event commands collected before they are routed to the workers
+
+#parse_event_line() splits an event scoped line such as "42:Reserve(6, 2)" into the event id and the command line
+def parse_event_line(line: str):
+    event, separator, command = line.partition(':')
+    if not separator:
+        raise ValueError(f"Missing event id in: {line}")
+    return event.strip(), command.strip()
+
+#shard_of() maps an event id to a worker. crc32 is used instead of hash() so the routing is the same in every run
+def shard_of(event: str, workers: int):
+    return zlib.crc32(event.encode()) % workers
+
+#_worker() runs in a child process and owns one GatorTicketMaster per event routed to it.
+#It receives batches of (position, event, line) in routing order, so the commands of an event always run in the order they were sent
+def _worker(connection):
+    tables = {}
+    while True:
+        batch = connection.recv()
+        if batch is None:
+            break
+        results = []
+        for position, event, line in batch:
+            table = tables.get(event)
+            if table is None:
+                table = tables[event] = dispatch_table(GatorTicketMaster())
+            try:
+                command, args = parse_command(line)
+            except ValueError:
+                results.append((position, f"Unrecognized command: {line.partition('(')[0]}"))
+                continue
+            if command == 'Quit':  #Quit closes the event, a later command for it starts a fresh engine
+                del tables[event]
+                results.append((position, QUIT_MESSAGE))
+            else:
+                results.append((position, run_command(table, command, args)))
+        connection.send(results)
+    connection.close()
+
+#ShardedTicketMaster runs many events on a pool of worker processes, one GatorTicketMaster per event.
+#Events are routed to workers by hash, so each event lives on exactly one worker and keeps its command order, while different events run in parallel
+class ShardedTicketMaster:
+    def __init__(self, workers: int = None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.connections = []
+        self.processes = []
+        for _ in range(self.workers):
+            parent_end, child_end = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, args=(child_end,), daemon=True)
+            process.start()
+            child_end.close()
+            self.connections.append(parent_end)
+            self.processes.append(process)
+
+    #run_batch() runs a list of (event, command line) pairs and returns the results in the same order.
+    #Every worker gets its share before any result is collected, so the workers run the batch at the same time
+    def run_batch(self, commands):
+        shards = [[] for _ in range(self.workers)]
+        for position, (event, line) in enumerate(commands):
+            shards[shard_of(event, self.workers)].append((position, event, line))
+        busy = []
+        for connection, shard in zip(self.connections, shards):
+            if shard:
+                connection.send(shard)
+                busy.append(connection)
+        results = [None] * len(commands)
+        for connection in busy:
+            for position, result in connection.recv():
+                results[position] = result
+        return results
+
+    #run_lines() runs event scoped lines ("42:Reserve(6, 2)") in batches of batch_size and yields (event, result) in input order
+    def run_lines(self, lines, batch_size: int = BATCH_SIZE):
+        batch = []
+        for line in lines:
+            line = line.strip()
+            if line:
+                batch.append(parse_event_line(line))
+                if len(batch) >= batch_size:
+                    yield from zip((event for event, _ in batch), self.run_batch(batch))
+                    batch = []
+        if batch:
+            yield from zip((event for event, _ in batch), self.run_batch(batch))
+
+    #close() stops the worker processes
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for process in self.processes:
+            process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+#event_workload() interleaves seeded benchmark workloads of many events into one event scoped command stream
+def event_workload(events: int, commands_per_event: int, seats: int = 500, seed: int = 1):
+    from gatorBenchmark import WorkloadSpec, generate_workload
+    streams = [generate_workload(WorkloadSpec(seats=seats, users=seats * 3, commands=commands_per_event, seed=seed + event))[:-1]
+               for event in range(events)]
+    lines = []
+    for position in range(commands_per_event + 1):
+        for event, stream in enumerate(streams):
+            if position < len(stream):
+                lines.append(f"{event}:{stream[position]}")
+    return lines
+
+#bench() runs the same event workload on every worker count and prints the scaling curve
+def bench(events: int, commands_per_event: int, worker_counts, batch_size: int):
+    lines = event_workload(events, commands_per_event)
+    baseline = None
+    for workers in worker_counts:
+        with ShardedTicketMaster(workers) as sharded:
+            started = time.perf_counter()
+            for _ in sharded.run_lines(lines, batch_size):
+                pass
+            elapsed = time.perf_counter() - started
+        rate = len(lines) / elapsed
+        baseline = baseline or rate
+        print(f"workers={workers:<3} {len(lines)} commands over {events} events: {rate:.0f} commands/s ({rate / baseline:.2f}x)")
+
+# The main block runs an event scoped command file on a worker pool, or runs the scaling benchmark
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run many GatorTicketMaster events on a process pool.")
+    modes = parser.add_subparsers(dest='mode', required=True)
+
+    run_parser = modes.add_parser('run', help="run an event scoped command file, lines look like 42:Reserve(6, 2)")
+    run_parser.add_argument('input')
+    run_parser.add_argument('output', nargs='?', default='-', help="result file, or - for stdout (default)")
+    run_parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    run_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    bench_parser = modes.add_parser('bench', help="measure throughput for several worker counts")
+    bench_parser.add_argument('--events', type=int, default=200)
+    bench_parser.add_argument('--commands', type=int, default=2000, help="commands per event")
+    bench_parser.add_argument('--workers', type=int, action='append', help="worker count, can be repeated (default 1, 2, 4, 8)")
+    bench_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    options = parser.parse_args()
+    if options.mode == 'run':
+        outfile = sys.stdout if options.output == '-' else open(options.output, 'w')
+        try:
+            with open(options.input) as infile, ShardedTicketMaster(options.workers) as sharded:
+                for event, result in sharded.run_lines(infile, options.batch_size):
+                    if result:
+                        outfile.write("".join(f"{event}:{line}\n" for line in result.split("\n")))
+        finally:
+            if outfile is not sys.stdout:
+                outfile.close()
+    else:
+        bench(options.events, options.commands, options.workers or [1, 2, 4, 8], options.batch_size)
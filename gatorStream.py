@@ -0,0 +1,132 @@
+import argparse
+import mmap
+import os
+import stat
+import sys
+import time
+
+from gatorMetrics import Metrics, profiled
+from gatorPersistence import DurableTicketMaster
+from gatorTicketMaster import run_command_stream
+
+CHUNK_SIZE = 1 << 20 #bytes read from the input at a time
+
+#StreamStats keeps the progress counters of a streaming run and prints them to stderr every report_every seconds
+class StreamStats:
+    def __init__(self, report_every: float = 0, out=sys.stderr):
+        self.lines = 0 #complete input lines handed to the engine
+        self.bytes = 0 #input bytes consumed
+        self.started = time.perf_counter()
+        self.report_every = report_every #0 turns periodic reports off
+        self.last_report = self.started
+        self.out = out
+
+    #add() counts a block of input and prints a progress line if one is due
+    def add(self, lines: int, nbytes: int):
+        self.lines += lines
+        self.bytes += nbytes
+        if self.report_every:
+            now = time.perf_counter()
+            if now - self.last_report >= self.report_every:
+                self.last_report = now
+                self.report()
+
+    #elapsed() returns the seconds since the stream started
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    #lines_per_second() returns the average input rate so far
+    def lines_per_second(self):
+        elapsed = self.elapsed()
+        return self.lines / elapsed if elapsed > 0 else 0.0
+
+    #report() prints the current counters
+    def report(self):
+        elapsed = self.elapsed()
+        mb_per_second = self.bytes / elapsed / 1e6 if elapsed > 0 else 0.0
+        print(f"{self.lines} lines, {self.bytes} bytes in {elapsed:.1f}s ({self.lines_per_second():.0f} lines/s, {mb_per_second:.1f} MB/s)", file=self.out, flush=True)
+
+#iter_chunks() yields the input as bytes blocks of about chunk_size. Regular files are memory-mapped, pipes such as stdin are read in chunks
+def iter_chunks(binary_file, chunk_size: int = CHUNK_SIZE, use_mmap: bool = True):
+    try:
+        fd = binary_file.fileno()
+        regular = stat.S_ISREG(os.fstat(fd).st_mode)
+    except (AttributeError, OSError, ValueError):
+        regular = False
+
+    if use_mmap and regular and os.fstat(fd).st_size > 0:
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(0, len(mapped), chunk_size):
+                yield mapped[start:start + chunk_size]
+        return
+
+    while True:
+        chunk = binary_file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+#iter_lines() turns bytes blocks into str lines. Only the complete lines of a block are decoded, the partial last line is carried into the next block
+def iter_lines(chunks, stats: StreamStats = None, encoding: str = 'utf-8'):
+    carry = b''
+    for chunk in chunks:
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            carry += chunk
+            continue
+        block = carry + chunk[:end]
+        carry = chunk[end + 1:]
+        lines = block.decode(encoding).split('\n')
+        if stats is not None:
+            stats.add(len(lines), len(block) + 1)
+        yield from lines
+    if carry:
+        if stats is not None:
+            stats.add(1, len(carry))
+        yield carry.decode(encoding)
+
+#stream_commands() runs a command stream from binary_in and writes the results to text_out, returning the final StreamStats
+#ticket_master lets the caller pass an engine to continue from, e.g. a DurableTicketMaster
+def stream_commands(binary_in, text_out, chunk_size: int = CHUNK_SIZE, use_mmap: bool = True, report_every: float = 0, metrics: Metrics = None,
+                    ticket_master=None):
+    stats = StreamStats(report_every)
+    run_command_stream(iter_lines(iter_chunks(binary_in, chunk_size, use_mmap), stats), text_out.write, ticket_master, metrics)
+    text_out.flush()
+    return stats
+
+# The main block pipes a command stream through the engine, "-" means stdin or stdout
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream GatorTicketMaster commands with constant memory.")
+    parser.add_argument('input', nargs='?', default='-', help="command file, or - for stdin (default)")
+    parser.add_argument('output', nargs='?', default='-', help="result file, or - for stdout (default)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="bytes read per block")
+    parser.add_argument('--no-mmap', action='store_true', help="read regular files in chunks instead of memory-mapping them")
+    parser.add_argument('--progress', type=float, default=0, metavar='SECONDS', help="print progress counters to stderr every SECONDS")
+    parser.add_argument('--metrics', metavar='PATH', help="collect per-command latencies and internal counters and save them to PATH")
+    parser.add_argument('--metrics-format', choices=('json', 'prometheus'), default='json')
+    parser.add_argument('--profile', metavar='PATH', help="run under cProfile and save the pstats file to PATH")
+    parser.add_argument('--state-dir', metavar='DIR', help="recover the engine from DIR and keep a write-ahead log and snapshots there")
+    parser.add_argument('--snapshot-every', type=int, default=100000, metavar='N', help="snapshot after every N logged commands (0 = never)")
+    options = parser.parse_args()
+    metrics = Metrics() if options.metrics else None
+    ticket_master = DurableTicketMaster(options.state_dir, options.snapshot_every) if options.state_dir else None
+
+    binary_in = sys.stdin.buffer if options.input == '-' else open(options.input, 'rb')
+    text_out = sys.stdout if options.output == '-' else open(options.output, 'w')
+    try:
+        if options.profile:
+            with profiled(options.profile):
+                stats = stream_commands(binary_in, text_out, options.chunk_size, not options.no_mmap, options.progress, metrics, ticket_master)
+        else:
+            stats = stream_commands(binary_in, text_out, options.chunk_size, not options.no_mmap, options.progress, metrics, ticket_master)
+    finally:
+        if ticket_master is not None:
+            ticket_master.close()
+        if binary_in is not sys.stdin.buffer:
+            binary_in.close()
+        if text_out is not sys.stdout:
+            text_out.close()
+    if options.progress:
+        stats.report()
+    if metrics is not None:
+        metrics.write(options.metrics, options.metrics_format)
@@ -1,8 +1,19 @@
 from datetime import datetime
+import functools
+import gc
+import heapq
+import math
 import sys
+import threading
+import time
+from itertools import islice
 
 #This is a Node class for the Red-Black Tree. It represents a reservation with user_id, seat_id, color, and pointers to left child, right child, and parent nodes
+#__slots__ drops the per node __dict__, which is most of the memory of a reservation when there are millions of them
+#count is the number of nodes in the subtree rooted here, it turns the tree into an order statistics tree (rank, k-th node, range counts)
 class Node:
+    __slots__ = ('user_id', 'seat_id', 'color', 'left', 'right', 'parent', 'count')
+
     def __init__(self, user_id: int, seat_id: int):
         self.user_id = user_id
         self.seat_id = seat_id
@@ -10,79 +21,103 @@ class Node:
         self.left = None
         self.right = None
         self.parent = None
+        self.count = 1
 
-class RedBlackTree:
-    #The RedBlackTree class is initialized with an empty node and this node is sets as the root
+#RedBlackBase is the part of a Red-Black Tree that never compares keys: the NIL leaf, the subtree counts, walks by position, the rotations,
+#the insert and delete fix-ups and the balanced rebuild. RedBlackTree orders its nodes by user_id and SeatIndex by seat_id,
+#each of them adds the searches, inserts and deletes that compare its key, and the count_less() that count_in_range() is built on
+class RedBlackBase:
+    #The tree is initialized with an empty node and this node is sets as the root
     def __init__(self):
         self.NIL = Node(0, 0) 
         self.NIL.color = 0  #0 = black, 1 = red
+        self.NIL.count = 0  #empty subtrees count as 0 so subtree sizes can be added up without checks
         self.root = self.NIL #we assign the node black color
+        self.size = 0 #number of reservations stored in the tree
 
-    #search() searches for a node with the given user_id.
-    def search(self, user_id: int):
-        def _search_helper(node, user_id):
-            if node == self.NIL or user_id == node.user_id:   #if the first node is the required node, we return it
-                return node
-            
-            #if the required node is less than the current node, we recursively move to left in search of the node(recursion is implemented in search helper function)
-            if user_id < node.user_id:
-                return _search_helper(node.left, user_id)
-            
-            #if the required node is greater than the current node, we recursively move to right in search of the node(recursion is implemented in search helper function)
-            return _search_helper(node.right, user_id)
-        return _search_helper(self.root, user_id)    
-
-    #In the inserts(), a new node into the Red-Black Tree, maintaining its properties
-    def insert(self, user_id: int, seat_id: int):
-        node = Node(user_id, seat_id)  #create the new node to be inserted
-        node.left = self.NIL
-        node.right = self.NIL
-        trail_pntr = None
-        trav_pntr = self.root
+    #__iter__() lazily yields the nodes in key order using an explicit stack, so big trees don't hit the recursion limit.
+    #The tree must not be changed while an iteration is in progress
+    def __iter__(self):
+        NIL = self.NIL
+        stack = []
+        current = self.root
+        while True:
+            while current is not NIL:
+                stack.append(current)
+                current = current.left
+            if not stack:
+                return
+            current = stack.pop()
+            yield current
+            current = current.right
 
-        #using binary search tree insertion, we traverse from root to left or right till we find new node's appropriate position in the tree
-        while trav_pntr != self.NIL:
-            trail_pntr = trav_pntr
-            if node.user_id < trav_pntr.user_id:
-                trav_pntr = trav_pntr.left
+    #count_in_range() returns the number of nodes whose key is in [lo, hi] in O(log n)
+    def count_in_range(self, lo: int, hi: int):
+        if lo > hi:
+            return 0
+        return self.count_less(hi + 1) - self.count_less(lo)
+
+    #kth() returns the node at 0-based position index in key order, or NIL if the tree is smaller than that
+    def kth(self, index: int):
+        node = self.root
+        NIL = self.NIL
+        while node is not NIL:
+            left = node.left.count
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node
             else:
-                trav_pntr = trav_pntr.right
-
-        node.parent = trail_pntr
-
-        if trail_pntr is None:
-            self.root = node
-        elif node.user_id < trail_pntr.user_id:
-            trail_pntr.left = node
-        else:
-            trail_pntr.right = node
-
-        node.color = 1
-        self._correct_insert_node(node)  #we call correct insert node function to maintain the redblack tree properties  
-
-    #delete() deletes a node from the Red-Black Tree.
-    def delete(self, user_id: int):
-        node = self.search(user_id)  #search if the node to be deleted exists in the tree
-        if node == self.NIL: #if not, return
-            return
+                index -= left + 1
+                node = node.right
+        return NIL
+
+    #iter_from() lazily yields the nodes in key order starting at 0-based position index, so a page deep into a big tree costs O(log n + page size)
+    def iter_from(self, index: int):
+        NIL = self.NIL
+        stack = [] #nodes still to come, like the stack of __iter__() after index nodes were yielded
+        current = self.root
+        while current is not NIL:
+            left = current.left.count
+            if index < left:
+                stack.append(current)
+                current = current.left
+            elif index == left:
+                stack.append(current)
+                break
+            else:
+                index -= left + 1
+                current = current.right
+        while stack:
+            current = stack.pop()
+            yield current
+            current = current.right
+            while current is not NIL:
+                stack.append(current)
+                current = current.left
 
-        #elseif it exists
+    #_unlink() takes a node that is known to be in the tree out of it and restores the Red-Black Tree properties
+    def _unlink(self, node):
+        self.size -= 1
         target_node = node
         target_node_original_color = target_node.color
 
         #case 1: If the node to be deleted has no left child, we replace the node with the right child
         if node.left == self.NIL:
             replace_node = node.right
+            self._shrink_path(node)
             self._transplantion(node, node.right)
         #case 1: If the node to be deleted has no right child, we replace the node with the left child    
         elif node.right == self.NIL:
             replace_node = node.left
+            self._shrink_path(node)
             self._transplantion(node, node.left)
         #If the node to be deleted has both children, we find min node in right subtree and it becomes the successor    
         else:
             target_node = self._find_minimum_node(node.right)
             target_node_original_color = target_node.color
             replace_node = target_node.right
+            self._shrink_path(target_node)  #the successor leaves its place, node itself is on that path and is shrunk too
 
             if target_node.parent == node:
                 replace_node.parent = target_node
@@ -95,10 +130,18 @@ class RedBlackTree:
             target_node.left = node.left
             target_node.left.parent = target_node
             target_node.color = node.color
+            target_node.count = node.count
 
         if target_node_original_color == 0:
             self._correct_delete_node(replace_node)    #after deletion, we call correct delete node to rebalance and maintain the redblack tree properties
 
+    #_shrink_path() takes one node off the subtree count of every ancestor of a node that is about to leave its place
+    def _shrink_path(self, node):
+        ancestor = node.parent
+        while ancestor is not None:
+            ancestor.count -= 1
+            ancestor = ancestor.parent
+
     #_correct_delete_node corrects the Red-Black Tree properties after insertion
     def _correct_insert_node(self, new_node):
         while new_node.parent and new_node.parent.color == 1:  #while loop continues till new parent is red
@@ -215,11 +258,30 @@ class RedBlackTree:
 
         fix_node.color = 0    
 
-    #inorder_traversal() returns an inorder traversal of the tree.
+    #_build_balanced() replaces the tree with a perfectly balanced tree made of the given nodes, which must be in key order.
+    #Every level is black except the deepest one, which is only partly filled and colored red, so all paths have the same black height
+    def _build_balanced(self, nodes):
+        self.size = len(nodes)
+        red_depth = (len(nodes) + 1).bit_length() - 1  #depth of the first level that is not completely filled
+
+        NIL = self.NIL
+
+        #_build() links nodes[lo..hi] under parent, empty ranges become NIL without a call of their own
+        def _build(lo, hi, parent, depth):
+            mid = (lo + hi) // 2
+            node = nodes[mid]
+            node.parent = parent
+            node.color = 1 if depth == red_depth else 0
+            node.count = hi - lo + 1
+            node.left = _build(lo, mid - 1, node, depth + 1) if lo < mid else NIL
+            node.right = _build(mid + 1, hi, node, depth + 1) if mid < hi else NIL
+            return node
+
+        self.root = _build(0, len(nodes) - 1, None, 0) if nodes else NIL
+
+    #inorder_traversal() returns an inorder traversal of the tree as (seat_id, user_id) pairs.
     def inorder_traversal(self):
-        result = []   #initilize empty list
-        self._inorder_helper(self.root, result) #calls inorder helper which traverse first to right, then root then left
-        return result    
+        return [(node.seat_id, node.user_id) for node in self]
     
     #_right_rotation() performs a right rotation on the given node.
     def _right_rotation(self, gp_node):
@@ -248,6 +310,10 @@ class RedBlackTree:
         father_node.right = gp_node
         gp_node.parent = father_node
 
+        # father_node now roots the subtree gp_node rooted before, gp_node lost father_node and its left subtree
+        father_node.count = gp_node.count
+        gp_node.count = gp_node.left.count + gp_node.right.count + 1
+
     #_left_rotation() performs a left rotation on the given node.
     def _left_rotation(self, gp_node):
         # Set father_node as the right child of gp_node
@@ -275,19 +341,10 @@ class RedBlackTree:
         father_node.left = gp_node
         gp_node.parent = father_node
 
-    #inorder_helper() helps the inorder_traversal() to traversal and keep in order
-    def _inorder_helper(self, node, result):
-        # Base case: if the current node is not NIL (sentinel node)
-        if node != self.NIL:
-            # Recursively traverse the left subtree
-            self._inorder_helper(node.left, result)
-            
-            # Process the current node: append its seat_id and user_id to the result list
-            result.append((node.seat_id, node.user_id))
-            
-            # Recursively traverse the right subtree
-            self._inorder_helper(node.right, result)
-  
+        # father_node now roots the subtree gp_node rooted before, gp_node lost father_node and its right subtree
+        father_node.count = gp_node.count
+        gp_node.count = gp_node.left.count + gp_node.right.count + 1
+
     #_transplantion() replaces one subtree with another.
     def _transplantion(self, old_node, replace_node):
         # If old_node is the root, update the root to be replace_node
@@ -311,6 +368,597 @@ class RedBlackTree:
         # Return the leftmost node, which has the minimum key in the subtree
         return node
 
+class RedBlackTree(RedBlackBase):
+    #With index_seats=True the tree also keeps a SeatIndex ordered by seat_id in sync on every insert and delete
+    def __init__(self, index_seats: bool = False):
+        super().__init__()
+        self.seat_index = SeatIndex() if index_seats else None #secondary index answering seat lookups and seat ordered listings
+        self.versions = None #PersistentTree of seat_id -> user_id for snapshots, built by the first GatorTicketMaster.snapshot() and kept in sync from then on
+
+    #search() searches for a node with the given user_id. It walks down from the root in a loop, so there is no helper closure and no call per level
+    def search(self, user_id: int):
+        node = self.root
+        NIL = self.NIL
+        while node is not NIL and user_id != node.user_id:
+            #if the required node is less than the current node, we move to left, else we move to right
+            node = node.left if user_id < node.user_id else node.right
+        return node
+
+    #search_seat() returns the node of user_id that holds seat_id, or NIL. A user holds several seats only after ReserveBlock,
+    #the nodes of one user are next to each other in key order, so the others are only scanned when the first one found is not it
+    def search_seat(self, user_id: int, seat_id: int):
+        node = self.search(user_id)
+        if node is self.NIL or node.seat_id == seat_id:
+            return node
+        for node in self.iter_range(user_id, user_id):
+            if node.seat_id == seat_id:
+                return node
+        return self.NIL
+
+    #iter_range() lazily yields the nodes whose user_id is in [lo, hi] in key order, skipping the subtrees that are outside the range
+    def iter_range(self, lo: int, hi: int):
+        NIL = self.NIL
+        stack = []
+        current = self.root
+        while True:
+            while current is not NIL:
+                if lo <= current.user_id:
+                    stack.append(current)
+                    current = current.left
+                else:  #the node and its whole left subtree are below the range
+                    current = current.right
+            if not stack:
+                return
+            current = stack.pop()
+            if current.user_id > hi:
+                return
+            yield current
+            current = current.right
+
+    #count_less() returns the number of nodes whose user_id is below key, adding up left subtree counts on the way down in O(log n)
+    def count_less(self, key: int):
+        node = self.root
+        NIL = self.NIL
+        count = 0
+        while node is not NIL:
+            if node.user_id < key:
+                count += node.left.count + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    #In the inserts(), a new node into the Red-Black Tree, maintaining its properties
+    def insert(self, user_id: int, seat_id: int):
+        node = Node(user_id, seat_id)  #create the new node to be inserted
+        node.left = self.NIL
+        node.right = self.NIL
+        trail_pntr = None
+        trav_pntr = self.root
+
+        #using binary search tree insertion, we traverse from root to left or right till we find new node's appropriate position in the tree
+        while trav_pntr != self.NIL:
+            trail_pntr = trav_pntr
+            trav_pntr.count += 1  #the new node ends up in the subtree of every node on the way down
+            if node.user_id < trav_pntr.user_id:
+                trav_pntr = trav_pntr.left
+            else:
+                trav_pntr = trav_pntr.right
+
+        node.parent = trail_pntr
+
+        if trail_pntr is None:
+            self.root = node
+        elif node.user_id < trail_pntr.user_id:
+            trail_pntr.left = node
+        else:
+            trail_pntr.right = node
+
+        node.color = 1
+        self.size += 1
+        self._correct_insert_node(node)  #we call correct insert node function to maintain the redblack tree properties  
+        if self.seat_index is not None:
+            self.seat_index.insert(user_id, seat_id)
+        if self.versions is not None:
+            self.versions.insert(seat_id, user_id)
+
+    #delete() deletes a node from the Red-Black Tree.
+    def delete(self, user_id: int):
+        node = self.search(user_id)  #search if the node to be deleted exists in the tree
+        if node == self.NIL: #if not, return
+            return
+
+        #elseif it exists
+        self._delete_node(node)
+
+    #_delete_node() unlinks a node that is already known to be in the tree, so callers holding the node don't pay for another search
+    def _delete_node(self, node):
+        if self.seat_index is not None:
+            self.seat_index.delete(node.seat_id)
+        if self.versions is not None:
+            self.versions.delete(node.seat_id)
+        self._unlink(node)
+
+    #delete_range() removes every node whose user_id is in [lo, hi] and returns their (seat_id, user_id) pairs in user order.
+    #A small range is unlinked node by node, a range covering a big part of the tree is cheaper to drop by rebuilding the tree from the nodes that are left
+    def delete_range(self, lo: int, hi: int):
+        if not self.count_in_range(lo, hi):  #an empty range is answered from the subtree counts without touching a node twice
+            return []
+        removed = list(self.iter_range(lo, hi))
+
+        if len(removed) * 4 > self.size:
+            kept = [node for node in self if not (lo <= node.user_id <= hi)]
+            self._build_balanced(kept)
+            if self.seat_index is not None:
+                #the seat index is already in seat order, so it is filtered and rebuilt the same way
+                self.seat_index._build_balanced([node for node in self.seat_index if not (lo <= node.user_id <= hi)])
+            self._reload_versions()
+        else:
+            for node in removed:
+                self._delete_node(node)
+        return [(node.seat_id, node.user_id) for node in removed]
+
+    #insert_many() inserts a batch of (user_id, seat_id) pairs. A small batch is inserted one by one,
+    #a batch that is big next to the tree is merged with the existing nodes in key order and the tree is rebuilt once in O(n)
+    def insert_many(self, pairs):
+        pairs = sorted(pairs)
+        if len(pairs) * 4 <= self.size:
+            for user_id, seat_id in pairs:
+                self.insert(user_id, seat_id)
+            return
+        #heapq.merge is stable, so on equal keys the existing node stays first like insert() would keep it
+        self._build_balanced(list(heapq.merge(self, [Node(user_id, seat_id) for user_id, seat_id in pairs], key=lambda node: node.user_id)))
+        if self.seat_index is not None:
+            index = self.seat_index
+            added = sorted((Node(user_id, seat_id) for user_id, seat_id in pairs), key=lambda node: node.seat_id)
+            index._build_balanced(list(heapq.merge(index, added, key=lambda node: node.seat_id)))
+        self._reload_versions()
+
+    #delete_many() removes a batch of nodes that are known to be in the tree, the same way delete_range() does:
+    #one by one for a small batch, by rebuilding from the nodes that are left when the batch is a big part of the tree
+    def delete_many(self, nodes):
+        if len(nodes) * 4 <= self.size:
+            for node in nodes:
+                self._delete_node(node)
+            return
+        removed = set(nodes)
+        self._build_balanced([node for node in self if node not in removed])
+        if self.seat_index is not None:
+            seats = {node.seat_id for node in nodes}
+            self.seat_index._build_balanced([node for node in self.seat_index if node.seat_id not in seats])
+        self._reload_versions()
+
+    #bulk_load() replaces the contents of the tree with (user_id, seat_id) pairs that are already sorted by user_id, building a balanced tree in O(n).
+    #seat_pairs, if given, are the same pairs sorted by seat_id, so the seat index is built in O(n) as well instead of sorting the pairs again
+    def bulk_load(self, pairs, seat_pairs=None):
+        nodes = [Node(user_id, seat_id) for user_id, seat_id in pairs]
+        self._build_balanced(nodes)
+        if self.seat_index is not None:
+            if seat_pairs is None:
+                self.seat_index.bulk_load([(node.user_id, node.seat_id) for node in nodes])
+            else:
+                self.seat_index._build_balanced([Node(user_id, seat_id) for user_id, seat_id in seat_pairs])
+        self._reload_versions()
+
+    #_reload_versions() rebuilds the persistent seat map from the seat index after a batch rebuilt both trees at once.
+    #Snapshots taken before keep the old version, which is freed when the last of them is dropped
+    def _reload_versions(self):
+        if self.versions is not None:
+            self.versions.load((node.seat_id, node.user_id) for node in self.seat_index)
+
+#SeatIndex class is a Red-Black Tree over the same reservations as RedBlackTree but ordered by seat_id, so "who holds seat X" is a O(log n) lookup
+#and walking it in order lists the reservations by seat without sorting. Only the RedBlackTree that owns it changes it, which keeps both in sync
+class SeatIndex(RedBlackBase):
+    #search() searches for the node holding the given seat_id
+    def search(self, seat_id: int):
+        node = self.root
+        NIL = self.NIL
+        while node is not NIL and seat_id != node.seat_id:
+            node = node.left if seat_id < node.seat_id else node.right
+        return node
+
+    #iter_range() lazily yields the nodes whose seat_id is in [lo, hi] in seat order
+    def iter_range(self, lo: int, hi: int):
+        NIL = self.NIL
+        stack = []
+        current = self.root
+        while True:
+            while current is not NIL:
+                if lo <= current.seat_id:
+                    stack.append(current)
+                    current = current.left
+                else:
+                    current = current.right
+            if not stack:
+                return
+            current = stack.pop()
+            if current.seat_id > hi:
+                return
+            yield current
+            current = current.right
+
+    #count_less() returns the number of nodes whose seat_id is below key
+    def count_less(self, key: int):
+        node = self.root
+        NIL = self.NIL
+        count = 0
+        while node is not NIL:
+            if node.seat_id < key:
+                count += node.left.count + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    #insert() inserts a new node keyed by its seat_id
+    def insert(self, user_id: int, seat_id: int):
+        node = Node(user_id, seat_id)
+        node.left = self.NIL
+        node.right = self.NIL
+        trail_pntr = None
+        trav_pntr = self.root
+        while trav_pntr != self.NIL:
+            trail_pntr = trav_pntr
+            trav_pntr.count += 1
+            trav_pntr = trav_pntr.left if seat_id < trav_pntr.seat_id else trav_pntr.right
+
+        node.parent = trail_pntr
+        if trail_pntr is None:
+            self.root = node
+        elif seat_id < trail_pntr.seat_id:
+            trail_pntr.left = node
+        else:
+            trail_pntr.right = node
+
+        self.size += 1
+        self._correct_insert_node(node)
+
+    #delete() deletes the node holding the given seat_id
+    def delete(self, seat_id: int):
+        node = self.search(seat_id)
+        if node != self.NIL:
+            self._unlink(node)
+
+    #bulk_load() replaces the contents of the index with (user_id, seat_id) pairs in any order, they are sorted by seat first
+    def bulk_load(self, pairs):
+        self._build_balanced([Node(user_id, seat_id) for user_id, seat_id in sorted(pairs, key=lambda pair: pair[1])])
+
+#PersistentNode is a node of a PersistentTree. It is never changed after it is built, an update copies the nodes on the path it touches and
+#shares every other node with the version before. There are no parent pointers (they would tie a shared node to one version), and None is the empty tree
+class PersistentNode:
+    __slots__ = ('color', 'left', 'key', 'value', 'right', 'count')
+
+    def __init__(self, color: int, left, key, value, right):
+        self.color = color  # 1 is for color red and 0 is for color black, like Node
+        self.left = left
+        self.key = key
+        self.value = value
+        self.right = right
+        self.count = (left.count if left else 0) + (right.count if right else 0) + 1
+
+#The functions below are the functional red-black insert and delete of Kahrs ("Red-black trees with types", 2001).
+#Each one returns a new subtree and leaves its arguments alone, which is what lets old versions stay valid
+def _is_red(node):
+    return node is not None and node.color == 1
+
+def _recolor(node, color: int):
+    return PersistentNode(color, node.left, node.key, node.value, node.right)
+
+#_balance() builds a black node over left and right, or fixes the red-red pair below it by rotating, the four cases of Okasaki's insert
+def _balance(left, key, value, right):
+    if _is_red(left) and _is_red(right):
+        return PersistentNode(1, _recolor(left, 0), key, value, _recolor(right, 0))
+    if _is_red(left):
+        if _is_red(left.left):
+            return PersistentNode(1, _recolor(left.left, 0), left.key, left.value, PersistentNode(0, left.right, key, value, right))
+        if _is_red(left.right):
+            middle = left.right
+            return PersistentNode(1, PersistentNode(0, left.left, left.key, left.value, middle.left), middle.key, middle.value,
+                                  PersistentNode(0, middle.right, key, value, right))
+    if _is_red(right):
+        if _is_red(right.right):
+            return PersistentNode(1, PersistentNode(0, left, key, value, right.left), right.key, right.value, _recolor(right.right, 0))
+        if _is_red(right.left):
+            middle = right.left
+            return PersistentNode(1, PersistentNode(0, left, key, value, middle.left), middle.key, middle.value,
+                                  PersistentNode(0, middle.right, right.key, right.value, right.right))
+    return PersistentNode(0, left, key, value, right)
+
+#_insert() only balances where the new subtree came back red under a black node, anywhere else there is no red-red pair to fix
+def _insert(node, key, value):
+    if node is None:
+        return PersistentNode(1, None, key, value, None)
+    if key < node.key:
+        left = _insert(node.left, key, value)
+        if node.color == 0 and left.color == 1:
+            return _balance(left, node.key, node.value, node.right)
+        return PersistentNode(node.color, left, node.key, node.value, node.right)
+    if key > node.key:
+        right = _insert(node.right, key, value)
+        if node.color == 0 and right.color == 1:
+            return _balance(node.left, node.key, node.value, right)
+        return PersistentNode(node.color, node.left, node.key, node.value, right)
+    return PersistentNode(node.color, node.left, key, value, node.right)
+
+#_balance_left() and _balance_right() rebuild a node whose left (right) subtree lost one black level in a delete
+def _balance_left(left, key, value, right):
+    if _is_red(left):
+        return PersistentNode(1, _recolor(left, 0), key, value, right)
+    if right.color == 0:
+        return _balance(left, key, value, _recolor(right, 1))
+    middle = right.left
+    return PersistentNode(1, PersistentNode(0, left, key, value, middle.left), middle.key, middle.value,
+                          _balance(middle.right, right.key, right.value, _recolor(right.right, 1)))
+
+def _balance_right(left, key, value, right):
+    if _is_red(right):
+        return PersistentNode(1, left, key, value, _recolor(right, 0))
+    if left.color == 0:
+        return _balance(_recolor(left, 1), key, value, right)
+    middle = left.right
+    return PersistentNode(1, _balance(_recolor(left.left, 1), left.key, left.value, middle.left), middle.key, middle.value,
+                          PersistentNode(0, middle.right, key, value, right))
+
+#_append() joins the two subtrees of a deleted node, every key of left is smaller than every key of right
+def _append(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.color == right.color:
+        middle = _append(left.right, right.left)
+        if _is_red(middle):
+            return PersistentNode(1, PersistentNode(left.color, left.left, left.key, left.value, middle.left), middle.key, middle.value,
+                                  PersistentNode(left.color, middle.right, right.key, right.value, right.right))
+        if left.color == 1:
+            return PersistentNode(1, left.left, left.key, left.value, PersistentNode(1, middle, right.key, right.value, right.right))
+        return _balance_left(left.left, left.key, left.value, PersistentNode(0, middle, right.key, right.value, right.right))
+    if right.color == 1:
+        return PersistentNode(1, _append(left, right.left), right.key, right.value, right.right)
+    return PersistentNode(1, left.left, left.key, left.value, _append(left.right, right))
+
+#_delete() removes key, which must be in the tree below node
+def _delete(node, key):
+    if key < node.key:
+        if node.left.color == 0:
+            return _balance_left(_delete(node.left, key), node.key, node.value, node.right)
+        return PersistentNode(1, _delete(node.left, key), node.key, node.value, node.right)
+    if key > node.key:
+        if node.right.color == 0:
+            return _balance_right(node.left, node.key, node.value, _delete(node.right, key))
+        return PersistentNode(1, node.left, node.key, node.value, _delete(node.right, key))
+    return _append(node.left, node.right)
+
+#walk_persistent() lazily yields the (key, value) pairs of a persistent root in key order, starting at 0-based position index.
+#A root never changes, so the walk can take as long as it likes while newer versions are made
+def walk_persistent(root, index: int = 0):
+    stack = []
+    current = root
+    while current is not None:
+        left = current.left.count if current.left else 0
+        if index < left:
+            stack.append(current)
+            current = current.left
+        elif index == left:
+            stack.append(current)
+            break
+        else:
+            index -= left + 1
+            current = current.right
+    while stack:
+        current = stack.pop()
+        yield current.key, current.value
+        current = current.right
+        while current is not None:
+            stack.append(current)
+            current = current.left
+
+#PersistentTree is a copy-on-write red-black tree: insert() and delete() copy the O(log n) nodes on one path and make a new root,
+#so holding on to an old root is a snapshot taken in O(1). The nodes have no cycles, so a version is freed by reference counting
+#as soon as the last snapshot holding its root is dropped, without waiting for the garbage collector
+class PersistentTree:
+    #pairs are (key, value) pairs sorted by key, they are built into a balanced tree in O(n)
+    def __init__(self, pairs=()):
+        self.root = None
+        self.load(pairs)
+
+    def __len__(self):
+        return self.root.count if self.root else 0
+
+    def __iter__(self):
+        return walk_persistent(self.root)
+
+    #load() replaces the contents with sorted (key, value) pairs. Like RedBlackTree._build_balanced() every level is black
+    #except the deepest one, which is only partly filled and colored red
+    def load(self, pairs):
+        pairs = list(pairs)
+        red_depth = (len(pairs) + 1).bit_length() - 1
+
+        def _build(lo, hi, depth):
+            if lo > hi:
+                return None
+            mid = (lo + hi) // 2
+            key, value = pairs[mid]
+            return PersistentNode(1 if depth == red_depth else 0, _build(lo, mid - 1, depth + 1), key, value, _build(mid + 1, hi, depth + 1))
+
+        self.root = _build(0, len(pairs) - 1, 0)
+
+    #insert() adds key or replaces its value
+    def insert(self, key, value):
+        root = _insert(self.root, key, value)
+        self.root = _recolor(root, 0) if root.color == 1 else root
+
+    #delete() removes key, which must be in the tree
+    def delete(self, key):
+        root = _delete(self.root, key)
+        self.root = _recolor(root, 0) if _is_red(root) else root
+
+#WaitlistVersions keeps the waitlist as a PersistentTree in the order users get a seat, keyed by (-priority, entry_count).
+#It has the add/discard/move hooks of WaitlistRanks, and MinHeap calls it at the same places
+class WaitlistVersions(PersistentTree):
+    def __init__(self, entries=()):
+        super().__init__(sorted(((-entry[0], entry[1]), entry[2]) for entry in entries))
+
+    def add(self, entry):
+        self.insert((-entry[0], entry[1]), entry[2])
+
+    def discard(self, entry):
+        self.delete((-entry[0], entry[1]))
+
+    def move(self, entry, old_priority):
+        self.delete((-old_priority, entry[1]))
+        self.add(entry)
+
+#Snapshot is a read-only view of the reservations and the waitlist as they were when GatorTicketMaster.snapshot() took it.
+#It holds two persistent roots and two counts, so taking it is O(1), and reading it never blocks or is disturbed by later commands
+class Snapshot:
+    def __init__(self, reservations, waitlist, available: int, waiting: int, expired: str = ""):
+        self.reservations_root = reservations
+        self.waitlist_root = waitlist
+        self.available_count = available
+        self.waiting_count = waiting
+        self.expired = expired #the lines of the holds that expired right before the snapshot was taken, "" if none did
+
+    #reservations() yields (seat_id, user_id) pairs in seat order, from 0-based position offset on
+    def reservations(self, offset: int = 0):
+        return walk_persistent(self.reservations_root, offset)
+
+    #waitlist() yields (user_id, priority) pairs in the order the users would get a seat
+    def waitlist(self):
+        for (priority, stamp), user_id in walk_persistent(self.waitlist_root):
+            yield user_id, -priority
+
+    #available() and print_reservations() answer like the GatorTicketMaster commands would have at the time of the snapshot
+    def available(self, *ignored):
+        return f"Total Seats Available : {self.available_count}, Waitlist : {self.waiting_count}"
+
+    def print_reservations(self, *page):
+        if len(page) != 2:
+            return "\n".join([f"Seat {seat_id}, User {user_id}" for seat_id, user_id in self.reservations()])
+        offset, limit = page
+        if offset < 0 or limit <= 0:
+            return "Invalid input. Please provide a valid page."
+        return "\n".join([f"Seat {seat_id}, User {user_id}" for seat_id, user_id in islice(self.reservations(offset), limit)])
+
+#WaitlistRanks answers "where is this user in the waitlist" without sorting the heap. Waitlist order is priority descending, then entry_count,
+#so for every priority it keeps a Fenwick tree over the entry_count stamps of the users waiting with that priority, and one more Fenwick tree
+#over the priorities themselves holds how many users wait with each one. A user's rank is the number of users waiting with a higher priority,
+#a prefix query on the priority tree, plus the prefix count of earlier stamps at their own priority. Both are O(log W + log |priority|),
+#whatever the number of distinct priorities is
+class WaitlistRanks:
+    def __init__(self, entries=()):
+        self.trees = {} #priority -> sparse Fenwick tree (index -> count) over stamp + 1
+        self.counts = {} #priority -> number of users waiting with it
+        self.totals = {} #sparse Fenwick tree (index -> count) over priority + bias + 1 of the users waiting with each priority
+        self.bias = 16 #the priority tree covers priorities -bias..bias-1, 2 * bias is always a power of two
+        self.size = 0 #number of users counted
+        self.stamp_user = {} #entry_count stamp -> user_id, used to turn top-k stamps back into users
+        self.capacity = 1024 #the stamp trees cover stamps 0..capacity-1, always a power of two
+        for entry in entries:
+            self.add(entry)
+
+    #add() counts a heap entry [priority, stamp, user_id]
+    def add(self, entry):
+        priority, stamp, user_id = entry
+        self.stamp_user[stamp] = user_id
+        self._change(priority, stamp, 1)
+
+    #discard() forgets a heap entry, entry[0] must still be the priority it was counted with
+    def discard(self, entry):
+        del self.stamp_user[entry[1]]
+        self._change(entry[0], entry[1], -1)
+
+    #move() moves an entry whose priority just changed from old_priority to entry[0]
+    def move(self, entry, old_priority):
+        self._change(old_priority, entry[1], -1)
+        self._change(entry[0], entry[1], 1)
+
+    #_change() adds delta to the count of stamp at priority, growing the trees when the stamp or the priority is past what they cover
+    def _change(self, priority, stamp, delta):
+        while stamp >= self.capacity:
+            #doubling a power of two Fenwick tree only adds one node that covers everything: the new root holds the old total
+            self.capacity *= 2
+            for tree_priority, tree in self.trees.items():
+                tree[self.capacity] = self.counts[tree_priority]
+        if not -self.bias <= priority < self.bias:
+            #widening the priority range moves every index, the priority tree is rebuilt from the counts. The range doubles each time,
+            #so this happens O(log |priority|) times in all
+            while not -self.bias <= priority < self.bias:
+                self.bias *= 2
+            self.totals = {}
+            for counted, count in self.counts.items():
+                self._change_total(counted, count)
+
+        tree = self.trees.get(priority)
+        if tree is None:
+            tree = self.trees[priority] = {}
+            self.counts[priority] = 0
+        self.counts[priority] += delta
+        self.size += delta
+        self._change_total(priority, delta)
+
+        if not self.counts[priority]:  #the last user with this priority left
+            del self.trees[priority]
+            del self.counts[priority]
+            return
+        index = stamp + 1
+        capacity = self.capacity
+        while index <= capacity:
+            tree[index] = tree.get(index, 0) + delta
+            index += index & -index
+
+    #_change_total() adds delta to the number of users waiting with priority in the priority tree
+    def _change_total(self, priority, delta):
+        totals = self.totals
+        index = priority + self.bias + 1
+        span = 2 * self.bias
+        while index <= span:
+            totals[index] = totals.get(index, 0) + delta
+            index += index & -index
+
+    #_higher() returns the number of users waiting with a priority above priority, the total minus a prefix query of the priority tree
+    def _higher(self, priority):
+        totals = self.totals
+        index = priority + self.bias + 1
+        position = self.size
+        while index > 0:
+            position -= totals.get(index, 0)
+            index -= index & -index
+        return position
+
+    #rank() returns the 0-based waitlist position of a counted entry in O(log W + log |priority|)
+    def rank(self, entry):
+        priority, stamp = entry[0], entry[1]
+        position = self._higher(priority)
+        tree = self.trees[priority]
+        index = stamp  #prefix count of stamps 0..stamp-1
+        while index > 0:
+            position += tree.get(index, 0)
+            index -= index & -index
+        return position
+
+    #_find() returns the smallest index of a sparse Fenwick tree covering 1..span whose prefix count reaches remaining, walking down from the root in O(log span)
+    def _find(self, tree, span, remaining):
+        index, step = 0, span
+        while step:
+            if index + step <= span and tree.get(index + step, 0) < remaining:
+                index += step
+                remaining -= tree.get(index, 0)
+            step //= 2
+        return index + 1
+
+    #top() returns the first count users of the waitlist as (user_id, priority) pairs. The next priority is found by a descent of the priority tree
+    #to the user after the ones already listed, each stamp by a descent of its stamp tree, so it costs O(log) per user and per priority it reaches
+    def top(self, count):
+        result = []
+        span = 2 * self.bias
+        while len(result) < min(count, self.size):
+            priority = self._find(self.totals, span, self.size - len(result)) - self.bias - 1  #in ascending order, the user len(result) from the top
+            tree = self.trees[priority]
+            for k in range(1, min(self.counts[priority], count - len(result)) + 1):
+                result.append((self.stamp_user[self._find(tree, self.capacity, k) - 1], priority))
+        return result
+
 #MinHeap class implements a Min Heap for managing the waitlist.
 class MinHeap:
     #__init__() is the constructor for the MinHeap class. 
@@ -318,6 +966,20 @@ class MinHeap:
         self.heap = [] #Heap list is used for storing elements of the heap
         self.entry_count = 0 #The entry_count is keeping track of the order in which elements are added to the heap
         self.user_index = {} #The user_index dictionary keeping track of the index of each user in the heap
+        self.ranks = None #WaitlistRanks, built by the first rank() or top() call and kept in sync from then on
+        self.versions = None #WaitlistVersions, built by the first GatorTicketMaster.snapshot() and kept in sync from then on
+
+    #__len__() returns the number of waiting users, so the waitlist can be used directly in if conditions
+    def __len__(self):
+        return len(self.heap)
+
+    #__contains__() tells whether user_id is waiting
+    def __contains__(self, user_id):
+        return user_id in self.user_index
+
+    #entries() returns the live [priority, stamp, user_id] entries, here simply the heap array in heap order
+    def entries(self):
+        return self.heap
 
     #insert() inserts a new entry into the heap.
     def insert(self, priority, user_id):
@@ -326,6 +988,10 @@ class MinHeap:
         self.heap.append(entry) #this entry is appended at the end of the heap
         self.user_index[user_id] = len(self.heap) - 1 
         self.entry_count += 1
+        if self.ranks is not None:
+            self.ranks.add(entry)
+        if self.versions is not None:
+            self.versions.add(entry)
         self._heapify_up(len(self.heap) - 1) #after insertion of new node in the heap, we call heapify_up() to correct and maintain heap properties
 
     #compare() compares two heap entries.
@@ -351,8 +1017,31 @@ class MinHeap:
             self._heapify_down(0) #and then we call heapify_down to adjust and maintain heap properties which will take the currently top element down and it will get further replaced by the corresponding nodes
         
         del self.user_index[min_item[2]]
+        if self.ranks is not None:
+            self.ranks.discard(min_item)
+        if self.versions is not None:
+            self.versions.discard(min_item)
         return min_item #we give back the min element from the waiting list so they can get a seat 
     
+    #extract_many() extracts and returns up to count of the minimum elements in priority order, the rest of the heap is left untouched.
+    #Taking a big part of the heap is done by sorting it once and cutting off the front, the sorted rest is still a valid heap
+    def extract_many(self, count):
+        if count * 8 > len(self.heap) > 64:
+            self._rebuild(self.heap)
+            entries = self.heap[:count]
+            self._rebuild(self.heap[count:])
+            if self.ranks is not None:
+                for entry in entries:
+                    self.ranks.discard(entry)
+            if self.versions is not None:
+                for entry in entries:
+                    self.versions.discard(entry)
+            return entries
+        entries = []
+        while self.heap and len(entries) < count:
+            entries.append(self.extract_min())
+        return entries
+
     # remove() removes a specific user from the heap.
     def remove(self, user_id):
         if user_id not in self.user_index:   #checks if the user exists
@@ -360,6 +1049,7 @@ class MinHeap:
         
         #here in the user to be deleted exisits, we move the last person in line to that spot, updates their position, and then removes the last spot in line
         index = self.user_index[user_id]
+        entry = self.heap[index]
         self.heap[index] = self.heap[-1]
         self.user_index[self.heap[-1][2]] = index
         self.heap.pop()
@@ -373,8 +1063,104 @@ class MinHeap:
                 self._heapify_down(index)
         
         del self.user_index[user_id]
+        if self.ranks is not None:
+            self.ranks.discard(entry)
+        if self.versions is not None:
+            self.versions.discard(entry)
         return True
 
+    #remove_range() removes every user whose id is in [lo, hi] and returns the removed entries
+    def remove_range(self, lo, hi):
+        #a narrow id range is cheaper to probe in user_index and remove one by one
+        if (hi - lo + 1) * 16 < len(self.heap):
+            removed = [self.heap[self.user_index[user_id]] for user_id in range(lo, hi + 1) if user_id in self.user_index]
+            for entry in removed:
+                self.remove(entry[2])
+            return removed
+
+        #otherwise filter the whole heap in one pass and rebuild it
+        removed = [entry for entry in self.heap if lo <= entry[2] <= hi]
+        if removed:
+            self._rebuild([entry for entry in self.heap if not (lo <= entry[2] <= hi)])
+            if self.ranks is not None:
+                for entry in removed:
+                    self.ranks.discard(entry)
+            if self.versions is not None:
+                for entry in removed:
+                    self.versions.discard(entry)
+        return removed
+
+    #insert_many() inserts a batch of (priority, user_id) pairs, stamped in batch order exactly like calling insert() for each.
+    #When the batch is big next to the heap, the entries are appended and the whole heap is rebuilt once instead of sifting each one up
+    def insert_many(self, pairs):
+        if len(pairs) * 16 <= len(self.heap):
+            for priority, user_id in pairs:
+                self.insert(priority, user_id)
+            return
+        for priority, user_id in pairs:
+            entry = [priority, self.entry_count, user_id]
+            self.heap.append(entry)
+            self.entry_count += 1
+            if self.ranks is not None:
+                self.ranks.add(entry)
+            if self.versions is not None:
+                self.versions.add(entry)
+        self._rebuild(self.heap)
+
+    #remove_many() removes every listed user that is in the heap and returns the removed entries in the order the users were listed.
+    #Like remove_range(), a big batch is filtered out in one pass and the heap is rebuilt once
+    def remove_many(self, user_ids):
+        removed = {}
+        for user_id in user_ids:
+            if user_id in self.user_index and user_id not in removed:
+                removed[user_id] = self.heap[self.user_index[user_id]]
+        if len(removed) * 16 <= len(self.heap):
+            for user_id in removed:
+                self.remove(user_id)
+        elif removed:
+            self._rebuild([entry for entry in self.heap if entry[2] not in removed])
+            if self.ranks is not None:
+                for entry in removed.values():
+                    self.ranks.discard(entry)
+            if self.versions is not None:
+                for entry in removed.values():
+                    self.versions.discard(entry)
+        return list(removed.values())
+
+    #update_many() sets the priority of every listed (user_id, priority) pair that is in the heap and returns whether each one was found.
+    #A big batch changes the entries in place and rebuilds the heap once instead of sifting after every change
+    def update_many(self, pairs):
+        if len(pairs) * 16 <= len(self.heap):
+            return [self.update_priority(user_id, priority) for user_id, priority in pairs]
+        found = []
+        for user_id, priority in pairs:
+            index = self.user_index.get(user_id)
+            if index is not None:
+                entry = self.heap[index]
+                old_priority, entry[0] = entry[0], priority
+                if self.ranks is not None:
+                    self.ranks.move(entry, old_priority)
+                if self.versions is not None:
+                    self.versions.move(entry, old_priority)
+            found.append(index is not None)
+        self._rebuild(self.heap)
+        return found
+
+    #load() replaces the contents with [priority, stamp, user_id] entries that form a valid heap array, as entries() returns them,
+    #and entry_count, the stamp the next user will get. A snapshot is restored through it
+    def load(self, entries, entry_count):
+        self.heap = entries
+        self.user_index = {entry[2]: i for i, entry in enumerate(entries)}
+        self.entry_count = entry_count
+        self.ranks = self.versions = None
+
+    #_rebuild() makes the given entries the heap and rebuilds user_index. A list sorted in priority order is already a valid heap,
+    #and sorting runs in C, which beats sifting every internal node down in Python even though it is O(W log W) instead of O(W)
+    def _rebuild(self, entries):
+        entries.sort(key=lambda entry: (-entry[0], entry[1]))
+        self.heap = entries
+        self.user_index = {entry[2]: i for i, entry in enumerate(entries)}
+
     #update_priority() updates the priority of a user in the heap
     def update_priority(self, user_id, new_priority):
         if user_id not in self.user_index:      #checks if the user exists
@@ -385,12 +1171,31 @@ class MinHeap:
         index = self.user_index[user_id]
         old_priority = self.heap[index][0]
         self.heap[index][0] = new_priority
+        if self.ranks is not None:
+            self.ranks.move(self.heap[index], old_priority)
+        if self.versions is not None:
+            self.versions.move(self.heap[index], old_priority)
         if new_priority > old_priority:
             self._heapify_up(index)  #moves node up
         else:
             self._heapify_down(index) #moves node down
         return True
-    
+
+    #rank() returns the 0-based waitlist position of user_id, or None if the user is not waiting.
+    #The first call builds the WaitlistRanks in O(W log W), a heap that is never asked pays nothing for it
+    def rank(self, user_id):
+        if user_id not in self.user_index:
+            return None
+        if self.ranks is None:
+            self.ranks = WaitlistRanks(self.heap)
+        return self.ranks.rank(self.heap[self.user_index[user_id]])
+
+    #top() returns the first count users of the waitlist as (user_id, priority) pairs in the order they would get a seat
+    def top(self, count):
+        if self.ranks is None:
+            self.ranks = WaitlistRanks(self.heap)
+        return self.ranks.top(count)
+
     #heapify_up maintains the heap property by moving an element up.
     def _heapify_up(self, index):
         parent = (index - 1) // 2
@@ -424,39 +1229,550 @@ class MinHeap:
             self.user_index[self.heap[smallest][2]] = smallest
             index = smallest    
 
+#LazyWaitlist is a drop-in replacement for MinHeap, for waitlists where users keep changing their priority or leaving.
+#MinHeap sifts an entry into place on every remove and update and rewrites two user_index entries per swap. LazyWaitlist leaves the old item
+#in the heap as a tombstone instead. user_item maps every waiting user to their live heap item, and an item that is not the live one of its user
+#is skipped when it reaches the top. An update pushes a new item with the same stamp, so the item object itself is the version.
+#Items are (-priority, stamp, user_id) tuples of ints, which heapq compares in C and the garbage collector stops tracking, and the
+#[priority, stamp, user_id] entries MinHeap hands out are only made for users who leave the waitlist.
+#Once the tombstones outnumber the live items the heap is compacted, so it never grows past about twice the waitlist
+class LazyWaitlist:
+    def __init__(self):
+        self.heap = [] #heapq list of (-priority, stamp, user_id) items, the smallest one is the next user to get a seat
+        self.entry_count = 0 #stamps users in arrival order like MinHeap, an update keeps the stamp
+        self.user_item = {} #user_id -> live heap item
+        self.tombstones = 0 #heap items that are not live any more: removed users, batch extracts and replaced priorities
+        self.ranks = None #WaitlistRanks, built by the first rank() or top() call and kept in sync from then on
+        self.versions = None #WaitlistVersions, built by the first GatorTicketMaster.snapshot() and kept in sync from then on
+
+    def __len__(self):
+        return len(self.user_item)
+
+    def __contains__(self, user_id):
+        return user_id in self.user_item
+
+    #entries() returns the live [priority, stamp, user_id] entries in the order the users get a seat. A sorted list is also a valid MinHeap array
+    def entries(self):
+        return [[-key, stamp, user_id] for key, stamp, user_id in sorted(self.user_item.values())]
+
+    #load() replaces the contents with [priority, stamp, user_id] entries in any order and entry_count, the stamp the next user will get
+    def load(self, entries, entry_count):
+        self.user_item = {user_id: (-priority, stamp, user_id) for priority, stamp, user_id in entries}
+        self.entry_count = entry_count
+        self.tombstones = 0
+        self.ranks = self.versions = None
+        self._compact()
+
+    #insert() adds a user with a new stamp
+    def insert(self, priority, user_id):
+        item = (-priority, self.entry_count, user_id)
+        self.entry_count += 1
+        self.user_item[user_id] = item
+        heapq.heappush(self.heap, item)
+        if self.ranks is not None:
+            self.ranks.add((priority, item[1], user_id))
+        if self.versions is not None:
+            self.versions.add((priority, item[1], user_id))
+
+    #extract_min() removes and returns the entry of the next user to get a seat, popping the tombstones above it, or None if nobody waits
+    def extract_min(self):
+        if not self.user_item:
+            return None
+        heap, user_item = self.heap, self.user_item
+        item = heapq.heappop(heap)
+        while user_item.get(item[2]) is not item:
+            self.tombstones -= 1
+            item = heapq.heappop(heap)
+        del user_item[item[2]]
+        entry = [-item[0], item[1], item[2]]
+        if self.ranks is not None:
+            self.ranks.discard(entry)
+        if self.versions is not None:
+            self.versions.discard(entry)
+        return entry
+
+    #extract_many() removes and returns up to count of the next entries in order. Taking a big part of the waitlist sorts the live items once,
+    #the sorted rest is a valid heap without any tombstones
+    def extract_many(self, count):
+        if count * 8 > len(self.user_item) > 64:
+            items = sorted(self.user_item.values())
+            self.heap = items[count:]
+            self.tombstones = 0
+            entries = [[-key, stamp, user_id] for key, stamp, user_id in items[:count]]
+            for entry in entries:
+                del self.user_item[entry[2]]
+            self._forget(entries)
+            return entries
+        entries = []
+        while self.user_item and len(entries) < count:
+            entries.append(self.extract_min())
+        return entries
+
+    #remove() takes a user off the waitlist in O(1), their heap item stays behind as a tombstone
+    def remove(self, user_id):
+        item = self.user_item.pop(user_id, None)
+        if item is None:
+            return False
+        self._bury([item])
+        return True
+
+    #remove_range() removes every user whose id is in [lo, hi] and returns the removed entries
+    def remove_range(self, lo, hi):
+        user_item = self.user_item
+        if (hi - lo + 1) * 16 < len(user_item):  #a narrow id range is probed id by id
+            removed = [user_item[user_id] for user_id in range(lo, hi + 1) if user_id in user_item]
+        else:
+            removed = [item for item in user_item.values() if lo <= item[2] <= hi]
+        for item in removed:
+            del user_item[item[2]]
+        return self._bury(removed)
+
+    #insert_many() inserts a batch of (priority, user_id) pairs stamped in batch order, a batch that is big next to the heap is heapified once
+    def insert_many(self, pairs):
+        heap = self.heap
+        heapify = len(pairs) * 16 > len(heap)
+        for priority, user_id in pairs:
+            item = (-priority, self.entry_count, user_id)
+            self.entry_count += 1
+            self.user_item[user_id] = item
+            if heapify:
+                heap.append(item)
+            else:
+                heapq.heappush(heap, item)
+            if self.ranks is not None:
+                self.ranks.add((priority, item[1], user_id))
+            if self.versions is not None:
+                self.versions.add((priority, item[1], user_id))
+        if heapify:
+            heapq.heapify(heap)
+
+    #remove_many() removes every listed user that is waiting and returns the removed entries in the order the users were listed
+    def remove_many(self, user_ids):
+        removed = []
+        for user_id in user_ids:
+            item = self.user_item.pop(user_id, None)
+            if item is not None:
+                removed.append(item)
+        return self._bury(removed)
+
+    #update_many() sets the priority of every listed (user_id, priority) pair that is waiting and returns whether each one was found.
+    #Every update is already a single push, so there is nothing to gain from batching them
+    def update_many(self, pairs):
+        return [self.update_priority(user_id, priority) for user_id, priority in pairs]
+
+    #update_priority() replaces a user's item with one at the new priority and the same stamp, the old item becomes a tombstone
+    def update_priority(self, user_id, new_priority):
+        item = self.user_item.get(user_id)
+        if item is None:
+            return False
+        updated = self.user_item[user_id] = (-new_priority, item[1], user_id)
+        heapq.heappush(self.heap, updated)
+        if self.ranks is not None:
+            self.ranks.move((new_priority, item[1], user_id), -item[0])
+        if self.versions is not None:
+            self.versions.move((new_priority, item[1], user_id), -item[0])
+        self.tombstones += 1
+        if self.tombstones > len(self.user_item) + 64:
+            self._compact()
+        return True
+
+    #rank() and top() answer like MinHeap's, from the same WaitlistRanks
+    def rank(self, user_id):
+        item = self.user_item.get(user_id)
+        if item is None:
+            return None
+        return self._ranks().rank((-item[0], item[1]))
+
+    def top(self, count):
+        return self._ranks().top(count)
+
+    #_ranks() returns the WaitlistRanks, building it on the first call
+    def _ranks(self):
+        if self.ranks is None:
+            self.ranks = WaitlistRanks((-key, stamp, user_id) for key, stamp, user_id in self.user_item.values())
+        return self.ranks
+
+    #_forget() drops entries that left the waitlist from the rank and snapshot structures
+    def _forget(self, entries):
+        if self.ranks is not None:
+            for entry in entries:
+                self.ranks.discard(entry)
+        if self.versions is not None:
+            for entry in entries:
+                self.versions.discard(entry)
+
+    #_bury() turns the items of removed users into tombstones and returns them as entries
+    def _bury(self, items):
+        entries = [[-key, stamp, user_id] for key, stamp, user_id in items]
+        self._forget(entries)
+        self.tombstones += len(items)
+        if self.tombstones > len(self.user_item) + 64:
+            self._compact()
+        return entries
+
+    #_compact() rebuilds the heap from the live items once the tombstones outnumber them, O(W) amortized over the W or more operations that left them
+    def _compact(self):
+        self.heap = list(self.user_item.values())
+        heapq.heapify(self.heap)
+        self.tombstones = 0
+
+#RunIndex finds the lowest free run that is at least a given length. It is a segment tree over seat ids that stores every run's length
+#at the run's first seat and the longest run below every internal node. Only the nodes above a run start exist (one dict per level),
+#so it follows the run compressed pool: memory grows with the number of runs, not with the number of seats
+class RunIndex:
+    def __init__(self, runs=()):
+        self.levels = [{}] #levels[h] maps position -> longest run starting in [position << h, (position + 1) << h)
+        for start, end in runs:
+            self.set(start, end - start + 1)
+
+    #set() records a run of length seats starting at start, length 0 removes it
+    def set(self, start: int, length: int):
+        levels = self.levels
+        while start >> (len(levels) - 1):  #grow the root until it covers start
+            levels.append({0: levels[-1].get(0, 0)} if levels[-1].get(0) else {})
+            #the old root is the left child of the new one, so the new root starts with the old maximum
+        position = start
+        level = levels[0]
+        if length:
+            level[position] = length
+        else:
+            level.pop(position, None)
+        for h in range(1, len(levels)):
+            sibling = position ^ 1
+            best = max(level.get(position, 0), level.get(sibling, 0))
+            position >>= 1
+            level = levels[h]
+            if level.get(position, 0) == best:  #the maxima above don't change either
+                return
+            if best:
+                level[position] = best
+            else:
+                del level[position]
+
+    #find() returns the first seat of the lowest run with at least length seats, or None, walking down from the root in O(log S)
+    def find(self, length: int):
+        levels = self.levels
+        if levels[-1].get(0, 0) < length:
+            return None
+        position = 0
+        for h in range(len(levels) - 2, -1, -1):
+            position *= 2
+            if levels[h].get(position, 0) < length:
+                position += 1
+        return position
+
+#SeatAllocator class keeps the pool of free seats and always hands out the lowest numbered seat first.
+#The free seats are stored as runs of consecutive seats, so a venue of any size starts out as a single run and memory only grows when reservations punch holes into it
+class SeatAllocator:
+    #__init__() creates an empty pool
+    def __init__(self):
+        self.run_end = {} #maps the first seat of every free run to its last seat
+        self.run_start = {} #maps the last seat of every free run to its first seat
+        self.heap = [] #min heap of run starts, entries whose run was merged or used up are skipped lazily
+        self.count = 0 #total number of free seats in all the runs
+        self.blocks = None #RunIndex over the runs, built by the first allocate_block() and kept in sync from then on
+
+    #__len__() returns the number of free seats, so the pool can be used directly in if conditions
+    def __len__(self):
+        return self.count
+
+    #add_range() adds the seats lo..hi to the pool, merging with the free runs right before and after it
+    def add_range(self, lo: int, hi: int):
+        if lo > hi:
+            return
+        self.count += hi - lo + 1
+        if lo - 1 in self.run_start:  #the new seats continue the run that ends at lo - 1
+            lo = self.run_start.pop(lo - 1)
+            del self.run_end[lo]
+        else:
+            heapq.heappush(self.heap, lo)
+        if hi + 1 in self.run_end:  #the new seats run into the run that starts at hi + 1
+            hi_next = self.run_end.pop(hi + 1)
+            del self.run_start[hi_next]
+            if self.blocks is not None:
+                self.blocks.set(hi + 1, 0)
+            hi = hi_next
+        self.run_end[lo] = hi
+        self.run_start[hi] = lo
+        if self.blocks is not None:
+            self.blocks.set(lo, hi - lo + 1)
+        #drop the stale heap entries once they outnumber the live runs
+        if len(self.heap) > 2 * len(self.run_end) + 64:
+            self.heap = list(self.run_end)
+            heapq.heapify(self.heap)
+
+    #load_runs() replaces the pool with (start, end) runs that are sorted, disjoint and not adjacent, like the ones runs() returns, in O(R).
+    #A sorted list is already a valid heap, so nothing is pushed one by one
+    def load_runs(self, runs):
+        self.run_end = dict(runs)
+        self.run_start = {end: start for start, end in self.run_end.items()}
+        self.heap = list(self.run_end)
+        self.count = sum(end - start + 1 for start, end in self.run_end.items())
+        self.blocks = None
+
+    #_lowest_run() removes the lowest free run from the pool and returns it as (start, end)
+    def _lowest_run(self):
+        heap = self.heap
+        while heap[0] not in self.run_end:  #skip the stale entries
+            heapq.heappop(heap)
+        start = heapq.heappop(heap)
+        end = self.run_end.pop(start)
+        del self.run_start[end]
+        if self.blocks is not None:
+            self.blocks.set(start, 0)
+        return start, end
+
+    #allocate() removes and returns the lowest free seat, or None if the pool is empty
+    def allocate(self):
+        if not self.count:
+            return None
+        start, end = self._lowest_run()
+        self.count -= 1
+        if start < end:  #the rest of the run stays free
+            self.run_end[start + 1] = end
+            self.run_start[end] = start + 1
+            heapq.heappush(self.heap, start + 1)
+            if self.blocks is not None:
+                self.blocks.set(start + 1, end - start)
+        return start
+
+    #allocate_many() removes and returns up to count of the lowest free seats in ascending order, taking whole runs at a time
+    def allocate_many(self, count: int):
+        seats = []
+        count = min(count, self.count)
+        while count > 0:
+            start, end = self._lowest_run()
+            take = min(count, end - start + 1)
+            seats.extend(range(start, start + take))
+            self.count -= take
+            count -= take
+            if start + take <= end:
+                self.run_end[start + take] = end
+                self.run_start[end] = start + take
+                heapq.heappush(self.heap, start + take)
+                if self.blocks is not None:
+                    self.blocks.set(start + take, end - start - take + 1)
+        return seats
+
+    #allocate_block() removes the lowest count consecutive free seats and returns the first one, or None if no free run is that long.
+    #The first call builds the RunIndex from the runs, a pool that never hands out blocks doesn't pay for keeping it
+    def allocate_block(self, count: int):
+        if self.blocks is None:
+            self.blocks = RunIndex(self.run_end.items())
+        start = self.blocks.find(count)
+        if start is None:
+            return None
+        end = self.run_end.pop(start)
+        del self.run_start[end]
+        self.blocks.set(start, 0)
+        self.count -= count
+        if start + count <= end:  #the rest of the run stays free, the old heap entry of start is skipped lazily
+            self.run_end[start + count] = end
+            self.run_start[end] = start + count
+            heapq.heappush(self.heap, start + count)
+            self.blocks.set(start + count, end - start - count + 1)
+        return start
+
+    #free() puts a seat back into the pool
+    def free(self, seat_id: int):
+        self.add_range(seat_id, seat_id)
+
+    #free_many() puts a batch of seats back into the pool, consecutive seats in the batch go in as one run
+    def free_many(self, seats):
+        seats = sorted(seats)
+        i = 0
+        while i < len(seats):
+            j = i
+            while j + 1 < len(seats) and seats[j + 1] == seats[j] + 1:
+                j += 1
+            self.add_range(seats[i], seats[j])
+            i = j + 1
+
+    #runs() returns the free runs as (start, end) pairs in seat order
+    def runs(self):
+        return sorted(self.run_end.items())
+
+#TimerWheel is a hierarchical timer wheel over integer ticks. Level 0 has one slot per tick, every level above has slots 64 times as wide,
+#so 4 levels cover 64**4 ticks (about 194 days of seconds) and later deadlines wait in an overflow list.
+#schedule() and cancel() are O(1), advance() does O(1) work per tick plus the timers it cascades down or fires,
+#and it jumps straight over stretches where the lower levels are empty
+class TimerWheel:
+    SLOT_BITS = 6
+    SLOTS = 1 << SLOT_BITS
+    LEVELS = 4
+
+    def __init__(self, now: int = 0):
+        self._reset(now)
+
+    #_reset() empties the wheel and sets its clock to tick now
+    def _reset(self, now: int):
+        self.now = now #last tick that was processed
+        self.wheels = [[[] for _ in range(self.SLOTS)] for _ in range(self.LEVELS)] #wheels[level][slot] is a list of (deadline, key)
+        self.sizes = [0] * self.LEVELS #entries in each level, cancelled ones included until their slot comes up
+        self.overflow = [] #(deadline, key) pairs beyond the top level
+        self.deadlines = {} #key -> deadline of its live timer, a slot entry that doesn't match it was cancelled or rescheduled
+
+    #__len__() returns the number of live timers
+    def __len__(self):
+        return len(self.deadlines)
+
+    #schedule() sets the timer of key to fire at tick deadline, replacing any timer key already had
+    def schedule(self, key, deadline: int):
+        self.deadlines[key] = deadline
+        self._place(key, deadline, self.now + 1)
+
+    #cancel() stops the timer of key and returns whether it had one. The slot entry stays behind and is skipped when its slot comes up
+    def cancel(self, key):
+        return self.deadlines.pop(key, None) is not None
+
+    #_place() puts a timer in the lowest level whose range reaches its deadline, a deadline before tick earliest fires at earliest.
+    #schedule() passes the next tick, a cascade passes the tick it runs at, which advance() fires right after the cascade
+    def _place(self, key, deadline: int, earliest: int):
+        tick = max(deadline, earliest)
+        delta = tick - self.now
+        for level in range(self.LEVELS):
+            if delta < 1 << (self.SLOT_BITS * (level + 1)):
+                self.wheels[level][(tick >> (self.SLOT_BITS * level)) & (self.SLOTS - 1)].append((deadline, key))
+                self.sizes[level] += 1
+                return
+        self.overflow.append((deadline, key))
+
+    #advance() moves the wheel to tick now and returns the keys whose timers fired, in deadline order
+    def advance(self, now: int):
+        expired = []
+        mask = self.SLOTS - 1
+        while self.now < now:
+            if not self.deadlines:  #nothing is pending, so the empty ticks don't need to be walked
+                self._reset(now)
+                break
+            if not self.sizes[0]:
+                #nothing can fire before the next slot of the lowest level that holds timers turns over, skip to the tick before it
+                level = 1
+                while level < self.LEVELS and not self.sizes[level]:
+                    level += 1
+                span = 1 << (self.SLOT_BITS * level)
+                boundary = (self.now // span + 1) * span
+                if boundary > now:
+                    self.now = now
+                    break
+                self.now = boundary - 1
+            self.now += 1
+            tick = self.now
+            if not tick & mask:
+                self._cascade(tick)
+            slot = self.wheels[0][tick & mask]
+            if slot:
+                self.wheels[0][tick & mask] = []
+                self.sizes[0] -= len(slot)
+                slot.sort(key=lambda entry: entry[0])  #deadlines that had passed when they were scheduled share the slot of the next tick
+                for deadline, key in slot:
+                    if self.deadlines.get(key) == deadline:
+                        del self.deadlines[key]
+                        expired.append(key)
+        return expired
+
+    #_cascade() runs when level 0 wraps around: the slot of level 1 that starts now is spread over the levels below,
+    #and each higher level is spread the same way when the level below it wrapped too
+    def _cascade(self, tick: int):
+        for level in range(1, self.LEVELS):
+            index = (tick >> (self.SLOT_BITS * level)) & (self.SLOTS - 1)
+            slot = self.wheels[level][index]
+            if slot:
+                self.wheels[level][index] = []
+                self.sizes[level] -= len(slot)
+                for deadline, key in slot:
+                    if self.deadlines.get(key) == deadline:
+                        self._place(key, deadline, tick)
+            if index:
+                return
+        overflow, self.overflow = self.overflow, []
+        for deadline, key in overflow:
+            if self.deadlines.get(key) == deadline:
+                self._place(key, deadline, tick)
+
+#_expiring() wraps a command method so the holds that ran out are expired before the command sees the state.
+#The lines the expiries produce come before the command's own result. An engine without pending holds only pays for the check
+def _expiring(method):
+    @functools.wraps(method)
+    def expiring(self, *args):
+        if not self.holds:
+            return method(self, *args)
+        expired = self.expire_holds()
+        result = method(self, *args)
+        if expired and result:
+            return f"{expired}\n{result}"
+        return expired or result
+    return expiring
+
+#_gc_paused() wraps a batch method so it runs with the cyclic garbage collector paused. A big batch allocates its nodes and entries in one go,
+#and every collection those allocations trigger would walk the whole tree and heap again for nothing.
+#The switch is process wide, so wrapped calls that run at once in several threads share one pause: _gc_pauses counts them under _gc_pause_lock
+#and the last one to finish turns the collector back on. A collector that was already off when no wrapped call ran is left off
+_gc_pause_lock = threading.Lock()
+_gc_pauses = 0 #wrapped calls running now that paused the collector
+
+def _gc_paused(method):
+    @functools.wraps(method)
+    def paused(*args):
+        global _gc_pauses
+        with _gc_pause_lock:
+            pausing = _gc_pauses or gc.isenabled()
+            if pausing:
+                _gc_pauses += 1
+                gc.disable()
+        if not pausing:
+            return method(*args)
+        try:
+            return method(*args)
+        finally:
+            with _gc_pause_lock:
+                _gc_pauses -= 1
+                if not _gc_pauses:
+                    gc.enable()
+    return paused
+
 #GatorTicketMaster Class implements the main ticket reservation system
 class GatorTicketMaster:
-     
-    def __init__(self):
-        self.reserved_seats = RedBlackTree()  #Creates a new instance of the RedBlackTree class to manage reserved seats
-        self.waitlist = MinHeap() #Initializes a MinHeap to manage the waitlist
-        self.available_seats = [] #empty list to keep track of available (unassigned) seats
+    #clock returns the current time in seconds, it only drives seat holds and can be swapped for a fake one in tests.
+    #waitlist_type is MinHeap, or LazyWaitlist for waitlists with heavy ExitWaitlist/UpdatePriority churn, both give the same output
+    def __init__(self, clock=time.monotonic, waitlist_type=MinHeap):
+        self.reserved_seats = RedBlackTree(index_seats=True)  #Creates a new instance of the RedBlackTree class to manage reserved seats, with a seat ordered index next to it
+        self.waitlist = waitlist_type() #Initializes a MinHeap (or LazyWaitlist) to manage the waitlist
+        self.available_seats = SeatAllocator() #pool of available (unassigned) seats, hands out the lowest seat first
         self.seat_count = 0 #initializes a counter for the total number of seats
+        self.clock = clock
+        self.holds = None #TimerWheel of the unconfirmed holds keyed by user_id, created by the first hold
+        self.hold_seats = {} #user_id -> seat_id of every unconfirmed hold
 
     #init() initializes the system with a given number of seats
+    @_expiring
     def initialize(self, seat_count: int):
         #if number of seats entered are less than or equal to 0
         if seat_count <= 0:
             return "Invalid input. Please provide a valid number of seats."
         self.seat_count = seat_count
-        self.available_seats = list(range(1, seat_count + 1))
+        self.available_seats = SeatAllocator()
+        self.available_seats.add_range(1, seat_count)
         return f"{seat_count} Seats are made available for reservation"
 
     #reserve() handles seat reservations or adds users to the waitlist
+    @_expiring
     def reserve(self, user_id: int, user_priority: int):
         if self.available_seats:  # check for any available seats
-            seat = self.available_seats.pop(0)  #pop the available seats
+            seat = self.available_seats.allocate()  #take the lowest available seat
             self.reserved_seats.insert(user_id, seat) #assign the seats to the user
             return f"User {user_id} reserved seat {seat}"
         else:
             self.waitlist.insert(user_priority, user_id) #if there are no seats available, then add to the waitlist
             return f"User {user_id} is added to the waiting list"   
 
-    #available() returns the number of available seats and waitlist size.
-    def available(self):
-        return f"Total Seats Available : {len(self.available_seats)}, Waitlist : {len(self.waitlist.heap)}"     
+    #available() returns the number of available seats and waitlist size. Anything passed between the parentheses is ignored
+    @_expiring
+    def available(self, *ignored):
+        return f"Total Seats Available : {len(self.available_seats)}, Waitlist : {len(self.waitlist)}"     
 
     #add_seats() adds new seats to the system and assigns them to waitlisted users if possible
+    @_expiring
     def add_seats(self, count: int):
         if count <= 0:
             return "Invalid input. Please provide a valid number of seats."
@@ -465,52 +1781,131 @@ class GatorTicketMaster:
         self.seat_count += count
         result = f"Additional {count} Seats are made available for reservation"
         
-        # Store waitlist entries temporarily to maintain correct order
-        waitlist_entries = []
-        while self.waitlist.heap:
-            waitlist_entries.append(self.waitlist.extract_min())
-            
-        # Process waitlist in priority order
-        new_seats = list(range(new_seat_start, self.seat_count + 1))
-        seat_idx = 0
-        
-        for entry in waitlist_entries:
-            if seat_idx < len(new_seats):
-                self.reserved_seats.insert(entry[2], new_seats[seat_idx])
-                result += f"\nUser {entry[2]} reserved seat {new_seats[seat_idx]}"
-                seat_idx += 1
-            else:
-                # Put back in waitlist if no seat available
-                self.waitlist.insert(entry[0], entry[2])
+        # Only the users who will get one of the new seats leave the waitlist, everyone else keeps their place and their original timestamp
+        next_seat = new_seat_start
+        for entry in self.waitlist.extract_many(count):
+            self.reserved_seats.insert(entry[2], next_seat)
+            result += f"\nUser {entry[2]} reserved seat {next_seat}"
+            next_seat += 1
                 
-        # Add remaining seats to available_seats
-        while seat_idx < len(new_seats):
-            self.available_seats.append(new_seats[seat_idx])
-            seat_idx += 1
-            
-        self.available_seats.sort()
+        # Add remaining seats to available_seats as a single run
+        self.available_seats.add_range(next_seat, self.seat_count)
         return result    
 
+    #seat_holder() returns the user holding seat_id, or None if the seat is not reserved
+    def seat_holder(self, seat_id: int):
+        node = self.reserved_seats.seat_index.search(seat_id)
+        return None if node == self.reserved_seats.seat_index.NIL else node.user_id
+
+    #snapshot() returns a Snapshot of the reservations and the waitlist as they are now in O(1), for reports that read while commands keep running.
+    #The first call builds the persistent copies in O(n + W log W), from then on every change also updates them in O(log n).
+    #Like a command it expires the holds that ran out first, so a snapshot never shows an expired hold. The expiry lines are kept in Snapshot.expired
+    def snapshot(self):
+        expired = self.expire_holds()
+        tree, waitlist = self.reserved_seats, self.waitlist
+        if tree.versions is None or waitlist.versions is None:
+            self._build_versions()
+        return Snapshot(tree.versions.root, waitlist.versions.root, len(self.available_seats), len(waitlist), expired)
+
+    #_build_versions() builds the persistent copies that snapshot() hands out, only the first snapshot pays for it
+    @_gc_paused
+    def _build_versions(self):
+        tree, waitlist = self.reserved_seats, self.waitlist
+        if tree.versions is None:
+            tree.versions = PersistentTree((node.seat_id, node.user_id) for node in tree.seat_index)
+        if waitlist.versions is None:
+            waitlist.versions = WaitlistVersions(waitlist.entries())
+
     #cancel() cancels a reservation and handles waitlist if necessary.
+    @_expiring
     def cancel(self, seat_id: int, user_id: int):
-        node = self.reserved_seats.search(user_id)  #search user in the reserved seat
+        node = self.reserved_seats.search_seat(user_id, seat_id)  #search the user's node for this seat in the reserved seats
 
-        if node and node.seat_id == seat_id:  #if user is available in the reserved seat list, delete them from the list
-            self.reserved_seats.delete(user_id)
+        if node is not self.reserved_seats.NIL and node.seat_id == seat_id:  #if the user holds this seat, delete exactly that node, no second search
+            if self.holds:
+                self._drop_hold(user_id, seat_id)
             result = f"User {user_id} canceled their reservation"
-
-            if self.waitlist.heap:   #after cancellation, if waitlist is not empty, check if any other user in the waitlist, if so, assign then the seat
-                next_user = self.waitlist.extract_min()
-                self.reserved_seats.insert(next_user[2], seat_id)
-                result += f"\nUser {next_user[2]} reserved seat {seat_id}"
-            else:
-                self.available_seats.append(seat_id)  #if waitlist is empty, give them the seat
-                self.available_seats.sort()
+            next_user = self._release_seat(node)
+            if next_user:
+                result += f"\n{next_user}"
             return result
         
         return f"User {user_id} has no reservation for seat {seat_id} to cancel"
+
+    #_release_seat() deletes a reservation node and gives its seat to the next user in the waitlist, or puts it back into the pool.
+    #It returns the line for the user who got the seat, or None
+    def _release_seat(self, node):
+        seat_id = node.seat_id
+        self.reserved_seats._delete_node(node)
+        if self.waitlist:   #after cancellation, if waitlist is not empty, check if any other user in the waitlist, if so, assign then the seat
+            next_user = self.waitlist.extract_min()
+            self.reserved_seats.insert(next_user[2], seat_id)
+            return f"User {next_user[2]} reserved seat {seat_id}"
+        self.available_seats.free(seat_id)  #if waitlist is empty, the seat goes back to the pool
+        return None
+
+    #reserve_block() reserves count seats next to each other for user_id, the lowest block that fits.
+    #A block request never waits: a waitlist entry stands for one seat, so without a long enough free run nothing changes.
+    #The priority is accepted like Reserve's but unused for the same reason
+    @_expiring
+    def reserve_block(self, user_id: int, count: int, user_priority: int = 0):
+        if count <= 0:
+            return "Invalid input. Please provide a valid number of seats."
+        start = self.available_seats.allocate_block(count)
+        if start is None:
+            return f"No block of {count} seats together is available for User {user_id}"
+        self.reserved_seats.insert_many([(user_id, seat) for seat in range(start, start + count)])
+        if count == 1:
+            return f"User {user_id} reserved seat {start}"
+        return f"User {user_id} reserved seats {start}-{start + count - 1}"
+
+    #hold() puts the lowest free seat on hold for user_id for ttl seconds. A hold that is not confirmed in time expires and its seat goes
+    #to the waitlist the same way a cancelled seat does. Without a free seat the user joins the waitlist like reserve(), and a seat given from there is a reservation
+    @_expiring
+    def hold(self, user_id: int, user_priority: int, ttl: int):
+        if ttl <= 0:
+            return "Invalid input. Please provide a valid hold time."
+        if user_id in self.hold_seats:
+            return f"User {user_id} already holds seat {self.hold_seats[user_id]}"
+        if not self.available_seats:
+            self.waitlist.insert(user_priority, user_id)
+            return f"User {user_id} is added to the waiting list"
+        seat = self.available_seats.allocate()
+        self.reserved_seats.insert(user_id, seat)
+        if self.holds is None:
+            self.holds = TimerWheel(math.floor(self.clock()))
+        self.holds.schedule(user_id, math.ceil(self.clock() + ttl))
+        self.hold_seats[user_id] = seat
+        return f"User {user_id} is holding seat {seat} for {ttl} seconds"
+
+    #confirm() turns a hold into a reservation
+    @_expiring
+    def confirm(self, user_id: int):
+        if self.holds and self.holds.cancel(user_id):
+            return f"User {user_id} confirmed seat {self.hold_seats.pop(user_id)}"
+        return f"User {user_id} has no seat on hold"
+
+    #expire_holds() cancels every hold whose time ran out and returns what happened, the commands call it before they run
+    def expire_holds(self):
+        if not self.holds:
+            return ""
+        result = []
+        for user_id in self.holds.advance(math.floor(self.clock())):
+            seat_id = self.hold_seats.pop(user_id)
+            result.append(f"User {user_id} hold on seat {seat_id} expired")
+            next_user = self._release_seat(self.reserved_seats.search_seat(user_id, seat_id))  #the held node, not any seat of the user
+            if next_user:
+                result.append(next_user)
+        return "\n".join(result)
+
+    #_drop_hold() forgets the hold of a user whose seat_id was cancelled or released some other way. Any other seat of the user leaves the hold alone
+    def _drop_hold(self, user_id: int, seat_id: int):
+        if self.hold_seats.get(user_id) == seat_id:
+            self.holds.cancel(user_id)
+            del self.hold_seats[user_id]
     
     #update_priority() updates a user's priority in the waitlist
+    @_expiring
     def update_priority(self, user_id: int, user_priority: int):
         if self.waitlist.update_priority(user_id, user_priority): #updates priority of the user
             return f"User {user_id} priority has been updated to {user_priority}"
@@ -520,52 +1915,40 @@ class GatorTicketMaster:
         
         return f"User {user_id} is not in the system"
 
-    #print_reservation() prints all current reservations
-    def print_reservations(self):
-        return "\n".join([f"Seat {seat_id}, User {user_id}" for seat_id, user_id in sorted(self.reserved_seats.inorder_traversal())])
+    #print_reservation() prints all current reservations. PrintReservations(offset, limit) prints one page of limit reservations starting at the offset-th one in seat order, any other arguments print everything
+    @_expiring
+    def print_reservations(self, *page):
+        seat_index = self.reserved_seats.seat_index
+        if len(page) != 2:
+            #the seat index is already ordered by seat, so it is walked lazily without building or sorting a list of pairs
+            return "\n".join([f"Seat {node.seat_id}, User {node.user_id}" for node in seat_index])
+        offset, limit = page
+        if offset < 0 or limit <= 0:
+            return "Invalid input. Please provide a valid page."
+        #the subtree counts find the first node of the page in O(log n), only the page itself is walked
+        return "\n".join([f"Seat {node.seat_id}, User {node.user_id}" for node in islice(seat_index.iter_from(offset), limit)])
 
     #release_seats() releases seats for a range of user IDs and reassigns them to waitlisted users
+    @_expiring
     def release_seats(self, user_id1: int, user_id2: int):
         # Check if the range is valid
         if user_id1 > user_id2:
             return "Invalid input. Please provide a valid range of users."
         
-        released_seats = []
-        stack = []
-        current = self.reserved_seats.root
-        
-        # we collect all seats to be released using an in-order traversal
-        while current != self.reserved_seats.NIL or stack:
-            while current != self.reserved_seats.NIL:
-                stack.append(current)
-                current = current.left
-            current = stack.pop()
-            if user_id1 <= current.user_id <= user_id2:
-                released_seats.append((current.seat_id, current.user_id))
-            if current.user_id > user_id2:
-                break  # break if we gone past the range
-            current = current.right
+        # Remove the reservations and the waitlist entries of every user in the range
+        released_seats = self.reserved_seats.delete_range(user_id1, user_id2)
+        if self.holds:
+            for seat_id, user_id in released_seats:
+                self._drop_hold(user_id, seat_id)
+        removed_waitlist = self.waitlist.remove_range(user_id1, user_id2)
         
         result = []
-        # we check if there are seats to release or users in the waitlist within the range
-        if released_seats or any(user_id1 <= user[2] <= user_id2 for user in self.waitlist.heap):
+        if released_seats or removed_waitlist:
             result.append(f"Reservations of the Users in the range [{user_id1}, {user_id2}] are released")
-            
-            # Release seats from the Red-Black Tree
-            for seat_id, user_id in released_seats:
-                self.reserved_seats.delete(user_id)
-                self.available_seats.append(seat_id)
-            
-            # Remove users from the waitlist if they're in the specified range
-            self.waitlist.heap = [user for user in self.waitlist.heap if not (user_id1 <= user[2] <= user_id2)]
-            self.waitlist.user_index = {user[2]: i for i, user in enumerate(self.waitlist.heap)}
-            
-            # Sort available seats to maintain order
-            self.available_seats.sort()
+            self.available_seats.free_many(seat_id for seat_id, user_id in released_seats)
             
             # Reassign available seats to users in the waitlist
-            while self.available_seats and self.waitlist.heap:
-                next_seat = self.available_seats.pop(0)
+            for next_seat in self.available_seats.allocate_many(min(len(self.available_seats), len(self.waitlist))):
                 next_user = self.waitlist.extract_min()
                 self.reserved_seats.insert(next_user[2], next_seat)
                 result.append(f"User {next_user[2]} reserved seat {next_seat}")
@@ -575,6 +1958,7 @@ class GatorTicketMaster:
         return f"No reservations or waitlist entries found in the range [{user_id1}, {user_id2}]"
 
     #exit_waitlist() removes a user from the waitlist
+    @_expiring
     def exit_waitlist(self, user_id: int):
         # remove the user from the waitlist
         if self.waitlist.remove(user_id):
@@ -583,66 +1967,201 @@ class GatorTicketMaster:
         # if the user was not in the waitlist
         return f"User {user_id} is not in waitlist"
 
+    #waitlist_position() tells a user where they are in the waitlist, 1 is the next user to get a seat
+    @_expiring
+    def waitlist_position(self, user_id: int):
+        rank = self.waitlist.rank(user_id)
+        if rank is None:
+            return f"User {user_id} is not in waitlist"
+        return f"User {user_id} is at position {rank + 1} of {len(self.waitlist)} in the waiting list"
+
+    #waitlist_top() lists the next count users in the order they will get a seat
+    @_expiring
+    def waitlist_top(self, count: int):
+        if count <= 0:
+            return "Invalid input. Please provide a valid number of users."
+        return "\n".join(f"Position {position}, User {user_id}, Priority {priority}"
+                         for position, (user_id, priority) in enumerate(self.waitlist.top(count), 1))
+
+    #The *_many() methods run a whole batch of one command and return the same text as calling the command once per item, joined by newlines.
+    #They touch the pool, the tree and the heap once per batch: seats come out of the pool together, the tree is bulk merged and the heap heapified once
+
+    #reserve_many() reserves seats for a batch of (user_id, priority) pairs. The first users get the lowest free seats in batch order, the rest join the waitlist
+    @_expiring
+    @_gc_paused
+    def reserve_many(self, requests):
+        requests = list(requests)
+        seats = self.available_seats.allocate_many(len(requests))
+        seated = [(user_id, seat) for (user_id, priority), seat in zip(requests, seats)]
+        waiting = [(priority, user_id) for user_id, priority in requests[len(seats):]]
+        self.reserved_seats.insert_many(seated)
+        self.waitlist.insert_many(waiting)
+
+        result = [f"User {user_id} reserved seat {seat}" for user_id, seat in seated]
+        result.extend(f"User {user_id} is added to the waiting list" for priority, user_id in waiting)
+        return "\n".join(result)
+
+    #cancel_many() cancels a batch of (seat_id, user_id) pairs. The freed seats go to the waitlist in priority order, whatever is left goes back to the pool
+    @_expiring
+    @_gc_paused
+    def cancel_many(self, requests):
+        requests = list(requests)
+        users = [user_id for seat_id, user_id in requests]
+        #a user listed twice or a waitlisted user can get a seat part way through the batch, those batches are run one by one
+        if len(set(users)) != len(users) or any(user_id in self.waitlist for user_id in users):
+            return "\n".join(self.cancel(seat_id, user_id) for seat_id, user_id in requests)
+
+        tree = self.reserved_seats
+        canceled = []
+        for seat_id, user_id in requests:
+            node = tree.search_seat(user_id, seat_id)
+            canceled.append(node if node is not tree.NIL and node.seat_id == seat_id else None)
+        nodes = [node for node in canceled if node is not None]
+        if self.holds:
+            for node in nodes:
+                self._drop_hold(node.user_id, node.seat_id)
+        tree.delete_many(nodes)
+
+        next_users = self.waitlist.extract_many(len(nodes))
+        tree.insert_many([(entry[2], node.seat_id) for entry, node in zip(next_users, nodes)])
+        self.available_seats.free_many(node.seat_id for node in nodes[len(next_users):])
 
-#gator_ticket_commands() processes commands from an input file and writes results to an output file            
-def gator_ticket_commands(input_file: str, output_file: str):
-    # Initialize the GatorTicketMaster instance
-    ticket_master = GatorTicketMaster()
-    
-    # Open input and output files
-    with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
-        for line in infile:
+        result = []
+        next_users = iter(next_users)
+        for (seat_id, user_id), node in zip(requests, canceled):
+            if node is None:
+                result.append(f"User {user_id} has no reservation for seat {seat_id} to cancel")
+                continue
+            result.append(f"User {user_id} canceled their reservation")
+            next_user = next(next_users, None)
+            if next_user is not None:
+                result.append(f"User {next_user[2]} reserved seat {seat_id}")
+        return "\n".join(result)
+
+    #update_priority_many() updates the priority of a batch of (user_id, priority) pairs
+    @_expiring
+    @_gc_paused
+    def update_priority_many(self, requests):
+        requests = list(requests)
+        result = []
+        for (user_id, user_priority), found in zip(requests, self.waitlist.update_many(requests)):
+            if found:
+                result.append(f"User {user_id} priority has been updated to {user_priority}")
+            elif self.reserved_seats.search(user_id) != self.reserved_seats.NIL:
+                result.append(f"User {user_id} priority is not updated")
+            else:
+                result.append(f"User {user_id} is not in the system")
+        return "\n".join(result)
+
+    #exit_waitlist_many() removes a batch of users from the waitlist
+    @_expiring
+    @_gc_paused
+    def exit_waitlist_many(self, user_ids):
+        user_ids = list(user_ids)
+        removed = {entry[2] for entry in self.waitlist.remove_many(user_ids)}
+        result = []
+        for user_id in user_ids:
+            if user_id in removed:
+                removed.discard(user_id)  #a user listed twice is only removed the first time
+                result.append(f"User {user_id} is removed from the waiting list")
+            else:
+                result.append(f"User {user_id} is not in waitlist")
+        return "\n".join(result)
+
+
+#COMMANDS maps every command name to the GatorTicketMaster method that runs it and the number of int arguments it takes.
+#None means the command accepts any number of arguments and the method gets whatever was given
+COMMANDS = {
+    'Initialize': ('initialize', 1),
+    'Reserve': ('reserve', 2),
+    'Available': ('available', None),
+    'AddSeats': ('add_seats', 1),
+    'Cancel': ('cancel', 2),
+    'UpdatePriority': ('update_priority', 2),
+    'PrintReservations': ('print_reservations', None),
+    'ReleaseSeats': ('release_seats', 2),
+    'ExitWaitlist': ('exit_waitlist', 1),
+    'WaitlistPosition': ('waitlist_position', 1),
+    'WaitlistTop': ('waitlist_top', 1),
+    'ReserveBlock': ('reserve_block', 3),
+    'Hold': ('hold', 3),
+    'Confirm': ('confirm', 1),
+}
+QUIT_MESSAGE = "Program Terminated!!"
+OUTPUT_BATCH = 4096 #number of results collected before they are written out in one call
+
+#parse_command() splits a stripped command line such as "Reserve(6, 2)" into its name and a tuple of int arguments
+def parse_command(line: str):
+    command, _, args = line.partition('(')
+    if '(' in args:  #only the text up to a second '(' is treated as arguments
+        args = args.split('(', 1)[0]
+    args = args[:-1]  #drop the closing ')'
+    return command, tuple(map(int, args.split(','))) if args else ()
+
+#dispatch_table() binds COMMANDS to one GatorTicketMaster instance, so running a command is a single dict lookup
+def dispatch_table(ticket_master):
+    return {command: (getattr(ticket_master, method), arity) for command, (method, arity) in COMMANDS.items()}
+
+#run_command() runs a parsed command through the dispatch table and returns its result text, Quit is left to the caller
+def run_command(table, command: str, args: tuple):
+    entry = table.get(command)
+    if entry is None or (entry[1] is not None and entry[1] != len(args)):
+        return f"Unrecognized command: {command}"
+    return entry[0](*args)
+
+#run_command_stream() runs command lines (an open file or any iterable of str) through one GatorTicketMaster and passes the output text to write() in batches.
+#It stops after Quit and returns the ticket master so callers can look at the final state. Passing a gatorMetrics.Metrics instruments this run only
+def run_command_stream(lines, write, ticket_master=None, metrics=None):
+    # Initialize the GatorTicketMaster instance and its dispatch table
+    if ticket_master is None:
+        ticket_master = GatorTicketMaster()
+    table = dispatch_table(ticket_master)
+    if metrics is not None:
+        table = metrics.instrument(ticket_master, table)
+    lookup = table.get
+
+    pending = [] #results waiting to be written, flushed in batches of OUTPUT_BATCH
+    try:
+        for line in lines:
             # Strip whitespace and skip empty lines
             line = line.strip()
             if not line:
                 continue
-            
-            # Parse the command and arguments
-            command, *args = line.split('(')
-            args = args[0][:-1] if args else ''
-            args = list(map(int, args.split(','))) if args else []
-
-            result = ""
-            # Process each command
-            if command == 'Initialize' and len(args) == 1:
-                result = ticket_master.initialize(args[0])
-                
-            elif command == 'Reserve' and len(args) == 2:
-                result = ticket_master.reserve(args[0], args[1])
-
-            elif command == 'Available':
-                result = ticket_master.available()    
-
-            elif command == 'AddSeats' and len(args) == 1:
-                result = ticket_master.add_seats(args[0])
-
-            elif command == 'Cancel' and len(args) == 2:
-                result = ticket_master.cancel(args[0], args[1])  
-
-            elif command == 'UpdatePriority' and len(args) == 2:
-                result = ticket_master.update_priority(args[0], args[1])      
-
-            elif command == 'PrintReservations':
-                result = ticket_master.print_reservations()
-
-            elif command == 'ReleaseSeats' and len(args) == 2:
-                result = ticket_master.release_seats(args[0], args[1])
 
-            elif command == 'ExitWaitlist' and len(args) == 1:
-                result = ticket_master.exit_waitlist(args[0])
-
-            elif command == 'Quit':
-                result = "Program Terminated!!"
-                # Write the result and break the loop
-                outfile.write(result + '\n')
-                break
+            # Same steps as parse_command() and run_command(), inlined because this loop runs once per input line
+            command, _, args = line.partition('(')
+            if '(' in args:
+                args = args.split('(', 1)[0]
+            args = args[:-1]
+            args = tuple(map(int, args.split(','))) if args else ()
+
+            entry = lookup(command)
+            if entry is None:
+                if command == 'Quit':
+                    pending.append(QUIT_MESSAGE)
+                    break
+                result = f"Unrecognized command: {command}"
+            elif entry[1] is None or entry[1] == len(args):
+                result = entry[0](*args)
             else:
-                # Handle unrecognized commands
                 result = f"Unrecognized command: {command}"
 
-            # Write the result to the output file
             if result:
-                outfile.write(result + '\n')
+                pending.append(result)
+                if len(pending) >= OUTPUT_BATCH:
+                    write("\n".join(pending) + "\n")
+                    pending.clear()
+    finally:
+        # Write whatever is left, also when a bad line stops the run part way
+        if pending:
+            write("\n".join(pending) + "\n")
+    return ticket_master
+
+#gator_ticket_commands() processes commands from an input file and writes results to an output file            
+def gator_ticket_commands(input_file: str, output_file: str, metrics=None):
+    # Open input and output files
+    with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
+        run_command_stream(infile, outfile.write, metrics=metrics)
 
 # The main block handles command-line execution of the program
 if __name__ == '__main__':
@@ -0,0 +1,5 @@
+import os
+import sys
+
+#The gator modules live at the top of the repository and are run as scripts, so the tests import them from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+from gatorTicketMaster import GatorTicketMaster, RedBlackTree
+
+#_check_tree() asserts the red-black properties of a tree: a black root, no red node with a red child, the same number of black nodes
+#on every path, parent links that match the child links, subtree counts and keys in order
+def _check_tree(tree, key):
+    NIL = tree.NIL
+    assert tree.root is NIL or (tree.root.color == 0 and tree.root.parent is None)
+    heights = {NIL: 1}
+    stack = [(tree.root, False)]
+    while stack:
+        node, done = stack.pop()
+        if node is NIL:
+            continue
+        if done:
+            assert heights[node.left] == heights[node.right]
+            assert node.count == node.left.count + node.right.count + 1
+            heights[node] = heights[node.left] + (node.color == 0)
+            continue
+        for child in (node.left, node.right):
+            assert child is NIL or child.parent is node
+            assert not (node.color == 1 and child is not NIL and child.color == 1)
+        stack.extend([(node, True), (node.right, False), (node.left, False)])
+    keys = [key(node) for node in tree]
+    assert keys == sorted(keys) and len(keys) == tree.size
+
+@pytest.mark.parametrize('seed', range(10))
+def test_reservation_tree_batches_keep_both_trees_in_sync(seed):
+    rng = random.Random(seed)
+    tree, model = RedBlackTree(index_seats=True), {}
+    next_seat = 1
+    for step in range(80):
+        operation = rng.random()
+        if operation < 0.4:
+            #batches from a few pairs up to several times the tree take both the one by one and the rebuild path
+            pairs = [(rng.randint(1, 300), next_seat + i) for i in range(rng.choice([1, 3, 40, 200]))]
+            next_seat += len(pairs)
+            tree.insert_many(pairs)
+            model.update((seat_id, user_id) for user_id, seat_id in pairs)
+        elif operation < 0.7:
+            lo = rng.randint(1, 300)
+            hi = lo + rng.choice([0, 5, 300])
+            removed = tree.delete_range(lo, hi)
+            assert sorted(removed) == sorted((seat_id, user_id) for seat_id, user_id in model.items() if lo <= user_id <= hi)
+            for seat_id, user_id in removed:
+                del model[seat_id]
+        else:
+            nodes = list(tree)
+            doomed = rng.sample(nodes, rng.randint(0, len(nodes)))
+            tree.delete_many(doomed)
+            for node in doomed:
+                del model[node.seat_id]
+        _check_tree(tree, lambda node: node.user_id)
+        _check_tree(tree.seat_index, lambda node: node.seat_id)
+        assert [(node.seat_id, node.user_id) for node in tree.seat_index] == sorted(model.items())
+        assert sorted((node.seat_id, node.user_id) for node in tree) == sorted(model.items())
+        if model:
+            #the subtree counts find any position and page of the seat order
+            index = rng.randrange(len(model))
+            assert tree.seat_index.kth(index).seat_id == sorted(model)[index]
+            assert [node.seat_id for node in tree.seat_index.iter_from(index)] == sorted(model)[index:]
+            lo = rng.randint(1, 300)
+            assert tree.count_in_range(lo, lo + 20) == sum(lo <= user_id <= lo + 20 for user_id in model.values())
+
+@pytest.mark.parametrize('seed', range(10))
+def test_batches_answer_like_the_commands_one_by_one(seed):
+    rng = random.Random(seed)
+    batched, single = GatorTicketMaster(), GatorTicketMaster()
+    seats = rng.randint(1, 60)
+    batched.initialize(seats)
+    single.initialize(seats)
+    next_user = 1
+    for step in range(60):
+        operation = rng.random()
+        if operation < 0.4:
+            requests = [(next_user + i, rng.randint(1, 5)) for i in range(rng.randint(0, 30))]
+            next_user += len(requests)
+            expected = "\n".join(single.reserve(*request) for request in requests)
+            assert batched.reserve_many(requests) == expected
+        elif operation < 0.7:
+            held = [(node.seat_id, node.user_id) for node in single.reserved_seats]
+            requests = rng.sample(held, rng.randint(0, len(held))) + [(rng.randint(1, seats), rng.randint(1, next_user))]
+            expected = "\n".join(single.cancel(*request) for request in requests)
+            assert batched.cancel_many(requests) == expected
+        elif operation < 0.85:
+            requests = [(rng.randint(1, next_user), rng.randint(1, 5)) for _ in range(rng.randint(0, 10))]
+            expected = "\n".join(single.update_priority(*request) for request in requests)
+            assert batched.update_priority_many(requests) == expected
+        else:
+            user_ids = [rng.randint(1, next_user) for _ in range(rng.randint(0, 10))]
+            expected = "\n".join(single.exit_waitlist(user_id) for user_id in user_ids)
+            assert batched.exit_waitlist_many(user_ids) == expected
+        assert batched.print_reservations() == single.print_reservations()
+        assert batched.available() == single.available()
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from gatorTicketMaster import RunIndex, SeatAllocator
+
+@pytest.mark.parametrize('seed', range(20))
+def test_allocate_block_takes_the_lowest_run_that_fits(seed):
+    rng = random.Random(seed)
+    seat_count = rng.randint(1, 300)
+    pool, free = SeatAllocator(), set(range(1, seat_count + 1))
+    pool.add_range(1, seat_count)
+    for step in range(400):
+        operation = rng.random()
+        if operation < 0.4:
+            count = rng.randint(1, 12)
+            start = next((seat for seat in sorted(free) if all(seat + i in free for i in range(count))), None)
+            assert pool.allocate_block(count) == start, step
+            if start is not None:
+                free -= set(range(start, start + count))
+        elif operation < 0.55:
+            seat = min(free, default=None)
+            assert pool.allocate() == seat
+            free.discard(seat)
+        elif operation < 0.65:
+            count = rng.randint(0, 8)
+            seats = pool.allocate_many(count)
+            assert seats == sorted(free)[:count]
+            free -= set(seats)
+        else:
+            taken = sorted(set(range(1, seat_count + 1)) - free)
+            if taken:
+                seats = rng.sample(taken, rng.randint(1, min(len(taken), 6)))
+                pool.free_many(seats)
+                free |= set(seats)
+        assert len(pool) == len(free)
+        assert [seat for start, end in pool.runs() for seat in range(start, end + 1)] == sorted(free)
+
+def test_run_index_finds_runs_anywhere_in_a_wide_range():
+    runs = {}
+    index = RunIndex()
+    rng = random.Random(5)
+    for step in range(500):
+        start = rng.choice([rng.randint(0, 100), rng.randint(0, 10 ** 9)])
+        length = rng.choice([0, rng.randint(1, 50)])
+        index.set(start, length)
+        if length:
+            runs[start] = length
+        else:
+            runs.pop(start, None)
+        wanted = rng.randint(1, 50)
+        assert index.find(wanted) == min((run for run, size in runs.items() if size >= wanted), default=None)
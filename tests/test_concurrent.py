@@ -0,0 +1,106 @@
+import gc
+import threading
+import time
+
+from gatorConcurrent import ConcurrentTicketMaster, ReadWriteLock, check_state, stress
+from gatorTicketMaster import GatorTicketMaster, _gc_paused
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=5)  #only passes when all three readers are inside at once
+
+    def read():
+        with lock.read_locked():
+            inside.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not inside.broken
+
+def test_a_writer_is_alone_in_the_lock():
+    lock = ReadWriteLock()
+    state = {'readers': 0, 'writers': 0}
+    overlaps = []
+    guard = threading.Lock()
+
+    def enter(kind):
+        with guard:
+            state[kind] += 1
+            if state['writers'] > 1 or (state['writers'] and state['readers']):
+                overlaps.append(dict(state))
+
+    def leave(kind):
+        with guard:
+            state[kind] -= 1
+
+    def work(kind, locked):
+        for _ in range(300):
+            with locked():
+                enter(kind)
+                time.sleep(0)
+                leave(kind)
+
+    threads = [threading.Thread(target=work, args=('writers', lock.write_locked)) for _ in range(3)]
+    threads += [threading.Thread(target=work, args=('readers', lock.read_locked)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == []
+
+def test_a_waiting_writer_goes_before_new_readers():
+    lock = ReadWriteLock()
+    order = []
+    lock.acquire_read()
+    writer = threading.Thread(target=lambda: (lock.acquire_write(), order.append('writer'), lock.release_write()))
+    writer.start()
+    while not lock.waiting_writers:
+        time.sleep(0.001)
+    reader = threading.Thread(target=lambda: (lock.acquire_read(), order.append('reader'), lock.release_read()))
+    reader.start()
+    time.sleep(0.05)
+    assert order == []  #the new reader queues behind the writer instead of joining the read that is still running
+    lock.release_read()
+    writer.join(5)
+    reader.join(5)
+    assert order == ['writer', 'reader']
+
+def test_reads_with_pending_holds_run_as_writes():
+    now = [0]
+    concurrent = ConcurrentTicketMaster(GatorTicketMaster(clock=lambda: now[0]))
+    concurrent.initialize(2)
+    assert concurrent.hold(1, 1, 3) == "User 1 is holding seat 1 for 3 seconds"
+    concurrent.reserve(2, 1)
+    concurrent.reserve(3, 4)
+    now[0] = 3
+    assert concurrent.waitlist_position(3) == "User 1 hold on seat 1 expired\nUser 3 reserved seat 1\nUser 3 is not in waitlist"
+    assert concurrent.available() == "Total Seats Available : 0, Waitlist : 0"
+    assert check_state(concurrent) is None
+
+def test_overlapping_gc_pauses_end_with_the_last_one():
+    entered, leave = threading.Event(), threading.Event()
+
+    @_gc_paused
+    def second():
+        entered.set()
+        leave.wait(5)
+
+    @_gc_paused
+    def first():
+        thread = threading.Thread(target=second)
+        thread.start()
+        entered.wait(5)
+        return thread
+
+    assert gc.isenabled()
+    thread = first()  #ends while second() is still running
+    assert not gc.isenabled()
+    leave.set()
+    thread.join(5)
+    assert gc.isenabled()
+
+def test_stress_finds_no_violations():
+    assert stress(writers=3, readers=2, commands=1500, seats=40, seed=3) == []
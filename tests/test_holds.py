@@ -0,0 +1,139 @@
+import random
+
+import pytest
+
+from gatorReplay import StepClock, check_invariants
+from gatorTicketMaster import GatorTicketMaster, TimerWheel
+
+#_engine() returns a ticket master with 10 seats where user 7 reserved seats 1-3 and holds seat 4 until tick 5, and its clock
+def _engine():
+    clock = StepClock()
+    ticket_master = GatorTicketMaster(clock=clock)
+    ticket_master.initialize(10)
+    assert ticket_master.reserve_block(7, 3, 1) == "User 7 reserved seats 1-3"
+    assert ticket_master.hold(7, 1, 5) == "User 7 is holding seat 4 for 5 seconds"
+    return ticket_master, clock
+
+#_seats() returns the reservations as (seat_id, user_id) pairs in seat order
+def _seats(ticket_master):
+    return ticket_master.reserved_seats.seat_index.inorder_traversal()
+
+def test_expiry_frees_the_held_seat_not_another_seat_of_the_user():
+    ticket_master, clock = _engine()
+    clock.now = 6
+    assert ticket_master.available() == "User 7 hold on seat 4 expired\nTotal Seats Available : 7, Waitlist : 0"
+    assert _seats(ticket_master) == [(1, 7), (2, 7), (3, 7)]
+    assert ticket_master.hold_seats == {}
+    assert check_invariants(ticket_master) is None
+
+def test_expired_seat_goes_to_the_waitlist():
+    ticket_master, clock = _engine()
+    for user_id in range(20, 26):
+        ticket_master.reserve(user_id, 1)
+    ticket_master.reserve(30, 5)
+    clock.now = 6
+    assert ticket_master.available() == "User 7 hold on seat 4 expired\nUser 30 reserved seat 4\nTotal Seats Available : 0, Waitlist : 0"
+    assert (4, 30) in _seats(ticket_master)
+    assert check_invariants(ticket_master) is None
+
+def test_cancelling_another_seat_keeps_the_hold():
+    ticket_master, clock = _engine()
+    assert ticket_master.cancel(1, 7) == "User 7 canceled their reservation"
+    assert ticket_master.hold_seats == {7: 4}
+    assert check_invariants(ticket_master) is None
+    clock.now = 6
+    assert ticket_master.available() == "User 7 hold on seat 4 expired\nTotal Seats Available : 8, Waitlist : 0"
+    assert _seats(ticket_master) == [(2, 7), (3, 7)]
+
+def test_cancelling_the_held_seat_drops_the_hold():
+    ticket_master, clock = _engine()
+    assert ticket_master.cancel(4, 7) == "User 7 canceled their reservation"
+    assert ticket_master.hold_seats == {}
+    clock.now = 6
+    assert ticket_master.available() == "Total Seats Available : 7, Waitlist : 0"
+    assert check_invariants(ticket_master) is None
+
+def test_cancel_many_of_another_seat_keeps_the_hold():
+    ticket_master, clock = _engine()
+    assert ticket_master.cancel_many([(2, 7)]) == "User 7 canceled their reservation"
+    assert ticket_master.hold_seats == {7: 4}
+    clock.now = 6
+    assert ticket_master.available() == "User 7 hold on seat 4 expired\nTotal Seats Available : 8, Waitlist : 0"
+    assert _seats(ticket_master) == [(1, 7), (3, 7)]
+
+def test_release_seats_drops_the_hold_with_the_held_seat():
+    ticket_master, clock = _engine()
+    assert ticket_master.release_seats(7, 7) == "Reservations of the Users in the range [7, 7] are released"
+    assert ticket_master.hold_seats == {}
+    clock.now = 6
+    assert ticket_master.available() == "Total Seats Available : 10, Waitlist : 0"
+    assert check_invariants(ticket_master) is None
+
+def test_confirmed_hold_never_expires():
+    ticket_master, clock = _engine()
+    assert ticket_master.confirm(7) == "User 7 confirmed seat 4"
+    clock.now = 100
+    assert ticket_master.available() == "Total Seats Available : 6, Waitlist : 0"
+    assert (4, 7) in _seats(ticket_master)
+
+def test_second_hold_is_turned_down_and_the_first_still_expires():
+    clock = StepClock()
+    ticket_master = GatorTicketMaster(clock=clock)
+    ticket_master.initialize(5)
+    assert ticket_master.hold(1, 1, 10) == "User 1 is holding seat 1 for 10 seconds"
+    assert ticket_master.hold(1, 1, 10) == "User 1 already holds seat 1"
+    assert _seats(ticket_master) == [(1, 1)]
+    clock.now = 11
+    assert ticket_master.available() == "User 1 hold on seat 1 expired\nTotal Seats Available : 5, Waitlist : 0"
+    assert ticket_master.confirm(1) == "User 1 has no seat on hold"
+    assert check_invariants(ticket_master) is None
+
+def test_check_invariants_catches_a_hold_on_a_seat_the_user_does_not_hold():
+    ticket_master, clock = _engine()
+    ticket_master.hold_seats[7] = 5
+    assert check_invariants(ticket_master) == "user 7 holds seat 5, but the seat index says None"
+
+def test_timer_cascaded_down_on_its_deadline_fires_on_time():
+    #the wheel sat idle at tick 135, so the deadline 256 goes to level 1 and only comes down when tick 256 cascades
+    wheel = TimerWheel(135)
+    wheel.schedule(139, 256)
+    assert wheel.advance(253) == []
+    assert wheel.advance(256) == [139]
+    assert len(wheel) == 0
+
+def test_snapshot_expires_the_holds_that_ran_out_first():
+    ticket_master, clock = _engine()
+    assert ticket_master.snapshot().expired == ""
+    clock.now = 6
+    snapshot = ticket_master.snapshot()
+    assert snapshot.expired == "User 7 hold on seat 4 expired"
+    assert list(snapshot.reservations()) == [(1, 7), (2, 7), (3, 7)]
+    assert snapshot.available() == "Total Seats Available : 7, Waitlist : 0"
+    assert ticket_master.hold_seats == {}
+    assert check_invariants(ticket_master) is None
+
+@pytest.mark.parametrize('seed', range(30))
+def test_timer_wheel_fires_every_timer_at_its_deadline(seed):
+    rng = random.Random(seed)
+    now = rng.choice([0, 63, 4095, rng.randint(0, 10 ** 6)])
+    wheel, model = TimerWheel(now), {}
+    for step in range(300):
+        operation = rng.random()
+        if operation < 0.5:
+            key = rng.randint(1, 40)
+            deadline = now + rng.choice([rng.randint(-2, 70), rng.randint(0, 5000), rng.randint(0, 64 ** 4 * 2)])
+            wheel.schedule(key, deadline)
+            model[key] = max(deadline, now + 1)
+        elif operation < 0.65:
+            key = rng.randint(1, 40)
+            assert wheel.cancel(key) == (model.pop(key, None) is not None)
+        else:
+            #small steps land on the deadlines themselves, big ones jump over whole levels
+            now += rng.choice([1, rng.randint(0, 70), rng.randint(0, 6000), rng.randint(0, 64 ** 4 * 3)])
+            due = sorted((deadline, key) for key, deadline in model.items() if deadline <= now)
+            fired = wheel.advance(now)
+            assert sorted(fired) == sorted(key for deadline, key in due), step
+            assert [model[key] for key in fired] == sorted(model[key] for key in fired)
+            for deadline, key in due:
+                del model[key]
+        assert len(wheel) == len(model)
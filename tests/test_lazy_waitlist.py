@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from gatorTicketMaster import LazyWaitlist, MinHeap
+
+#_order() returns [priority, stamp, user_id] entries as (user_id, priority) pairs in the order the users get a seat
+def _order(entries):
+    return [(entry[2], entry[0]) for entry in sorted(entries, key=lambda entry: (-entry[0], entry[1]))]
+
+@pytest.mark.parametrize('seed', range(15))
+def test_lazy_waitlist_answers_like_the_heap(seed):
+    rng = random.Random(seed)
+    heap, lazy = MinHeap(), LazyWaitlist()
+    users = rng.randint(5, 200)
+    for step in range(600):
+        user_id = rng.randint(1, users)
+        operation = rng.random()
+        if operation < 0.35:
+            if user_id not in heap:
+                priority = rng.randint(1, 5)
+                heap.insert(priority, user_id)
+                lazy.insert(priority, user_id)
+        elif operation < 0.5:
+            assert heap.remove(user_id) == lazy.remove(user_id)
+        elif operation < 0.65:
+            priority = rng.randint(1, 5)
+            assert heap.update_priority(user_id, priority) == lazy.update_priority(user_id, priority)
+        elif operation < 0.75:
+            assert heap.extract_min() == lazy.extract_min()
+        elif operation < 0.8:
+            count = rng.randint(0, 30)
+            assert heap.extract_many(count) == lazy.extract_many(count)
+        elif operation < 0.85:
+            assert sorted(heap.remove_range(user_id, user_id + 20)) == sorted(lazy.remove_range(user_id, user_id + 20))
+        elif operation < 0.9:
+            pairs = [(rng.randint(1, 5), users + step * 20 + i) for i in range(rng.randint(0, 12))]
+            heap.insert_many(pairs)
+            lazy.insert_many(pairs)
+        elif operation < 0.95:
+            assert heap.rank(user_id) == lazy.rank(user_id)
+        else:
+            assert heap.top(10) == lazy.top(10)
+        assert len(heap) == len(lazy)
+        assert _order(heap.entries()) == _order(lazy.entries())
@@ -0,0 +1,91 @@
+import os
+import random
+import time
+
+import pytest
+
+from gatorBenchmark import WorkloadSpec, generate_workload
+from gatorPersistence import OPCODES, RECORD_SIZE, DurableTicketMaster, log_generations, log_path, read_log
+from gatorTicketMaster import GatorTicketMaster, LazyWaitlist, MinHeap, dispatch_table, parse_command, run_command
+
+WAITLISTS = {'heap': MinHeap, 'lazy': LazyWaitlist}
+
+#_stream() returns the parsed commands of a small benchmark workload with a crowded waitlist, with some ReserveBlock lines mixed in
+def _stream(seed):
+    rng = random.Random(seed)
+    spec = WorkloadSpec(seats=rng.randint(1, 40), users=rng.randint(20, 120), commands=300, seed=seed, add_seats_size=5, release_width=15)
+    lines = []
+    for line in generate_workload(spec)[:-1]:
+        lines.append(line)
+        if rng.random() < 0.05:
+            lines.append(f"ReserveBlock({rng.randint(1, 120)}, {rng.randint(1, 4)})")
+    return [parse_command(line) for line in lines]
+
+#_state() is everything a client can read from an engine, and the waitlist entries with their stamps
+def _state(ticket_master):
+    return (ticket_master.print_reservations(), ticket_master.available(),
+            sorted(map(tuple, ticket_master.waitlist.entries())), ticket_master.waitlist.entry_count)
+
+@pytest.mark.parametrize('waitlist', ['heap', 'lazy'])
+@pytest.mark.parametrize('snapshot_every', [0, 37])
+def test_recovery_ends_in_the_state_of_the_engine(tmp_path, waitlist, snapshot_every):
+    for seed in range(4):
+        directory = str(tmp_path / f"state{seed}")
+        durable = DurableTicketMaster(directory, snapshot_every=snapshot_every, waitlist_type=WAITLISTS[waitlist])
+        engine = GatorTicketMaster(waitlist_type=WAITLISTS[waitlist])
+        durable_table, engine_table = dispatch_table(durable), dispatch_table(engine)
+        for command, args in _stream(seed):
+            assert run_command(durable_table, command, args) == run_command(engine_table, command, args)
+        durable.close()
+
+        recovered = DurableTicketMaster(directory, snapshot_every=snapshot_every, waitlist_type=WAITLISTS[waitlist])
+        assert type(recovered.waitlist) is WAITLISTS[waitlist]
+        assert _state(recovered) == _state(engine)
+        if snapshot_every:
+            assert len(log_generations(directory)) == 1  #the logs a snapshot covers are gone
+        recovered.close()
+
+def test_torn_tail_is_cut_off(tmp_path):
+    directory = str(tmp_path)
+    durable = DurableTicketMaster(directory, snapshot_every=0)
+    durable.initialize(3)
+    durable.reserve(1, 1)
+    durable.reserve(2, 1)
+    durable.close()
+    path = log_path(directory, 0)
+    with open(path, 'ab') as logfile:
+        logfile.write(b'\x02' + b'\x00' * (RECORD_SIZE // 2))  #a record that was only half written when the process died
+
+    recovered = DurableTicketMaster(directory, snapshot_every=0)
+    assert recovered.replayed == 3
+    assert os.path.getsize(path) == 3 * RECORD_SIZE
+    assert recovered.print_reservations() == "Seat 1, User 1\nSeat 2, User 2"
+    recovered.close()
+
+def test_reserve_block_logs_its_default_priority(tmp_path):
+    durable = DurableTicketMaster(str(tmp_path), snapshot_every=0)
+    durable.initialize(10)
+    assert durable.reserve_block(4, 3) == "User 4 reserved seats 1-3"
+    assert durable.reserve_block(5, 2, 7) == "User 5 reserved seats 4-5"
+    durable.close()
+    records, valid = read_log(log_path(str(tmp_path), 0))
+    assert records[1:] == [(OPCODES['ReserveBlock'], (4, 3, 0)), (OPCODES['ReserveBlock'], (5, 2, 7))]
+
+def test_holds_are_not_logged(tmp_path):
+    durable = DurableTicketMaster(str(tmp_path), snapshot_every=0)
+    durable.initialize(2)
+    assert durable.hold(1, 1, 5) == "Unrecognized command: Hold"
+    assert durable.confirm(1) == "Unrecognized command: Confirm"
+    durable.close()
+    assert len(read_log(log_path(str(tmp_path), 0))[0]) == 1
+
+def test_idle_log_is_flushed_after_max_delay(tmp_path):
+    durable = DurableTicketMaster(str(tmp_path), snapshot_every=0, group_size=1000, max_delay=0.01)
+    durable.initialize(3)
+    durable.reserve(1, 1)
+    path = log_path(str(tmp_path), 0)
+    deadline = time.monotonic() + 5
+    while os.path.getsize(path) < 2 * RECORD_SIZE and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert len(read_log(path)[0]) == 2  #no further command and no sync(), the flusher wrote them
+    durable.close()
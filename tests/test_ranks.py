@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from gatorTicketMaster import WaitlistRanks
+
+#_order() returns [priority, stamp, user_id] entries as (user_id, priority) pairs in the order the users get a seat
+def _order(entries):
+    return [(entry[2], entry[0]) for entry in sorted(entries, key=lambda entry: (-entry[0], entry[1]))]
+
+@pytest.mark.parametrize('seed', range(10))
+def test_waitlist_ranks_match_the_sorted_waitlist(seed):
+    rng = random.Random(seed)
+    #priorities from a handful of small values up to a wide range with negatives, which makes the priority tree grow
+    spread = [5, 40, 10 ** 6][seed % 3]
+    ranks, entries = WaitlistRanks(), {}
+    stamp = 0
+    for user_id in range(600):
+        operation = rng.random()
+        if operation < 0.5 or not entries:
+            stamp += rng.choice([1, 1, 1, 500])  #stamps are unique but not dense, and now and then past the stamp trees
+            entry = [rng.randint(-spread, spread), stamp, user_id]
+            entries[user_id] = entry
+            ranks.add(entry)
+        elif operation < 0.75:
+            entry = entries.pop(rng.choice(list(entries)))
+            ranks.discard(entry)
+        else:
+            entry = entries[rng.choice(list(entries))]
+            old_priority, entry[0] = entry[0], rng.randint(-spread, spread)
+            ranks.move(entry, old_priority)
+        order = _order(entries.values())
+        count = rng.randint(1, len(order) + 2)
+        assert ranks.top(count) == order[:count]
+        probe = entries[rng.choice(list(entries))] if entries else None
+        if probe is not None:
+            assert ranks.rank(probe) == order.index((probe[2], probe[0]))
@@ -0,0 +1,277 @@
+import math
+
+import pytest
+
+from gatorReplay import check_invariants, generate_stream, load_engine, replay
+from gatorTicketMaster import GatorTicketMaster
+
+#ModelTicketMaster answers every command like GatorTicketMaster, from a plain dict of reserved seats, a set of free seats and an unsorted
+#waitlist that is searched on every use. It shares no code with the engine, so replaying a stream through both catches the bugs that a
+#replay of the engine against itself can't see
+class ModelTicketMaster:
+    def __init__(self, clock):
+        self.clock = clock
+        self.seat_user = {} #seat_id -> user_id of every reserved seat
+        self.free = set()
+        self.seat_count = 0
+        self.waiting = [] #[priority, stamp, user_id] in arrival order
+        self.stamp = 0
+        self.holds = {} #user_id -> (deadline, order, seat_id), order breaks deadline ties in the order the holds were made
+        self.hold_order = 0
+
+    def _next_user(self):
+        entry = min(self.waiting, key=lambda entry: (-entry[0], entry[1]))
+        self.waiting.remove(entry)
+        return entry[2]
+
+    def _waiting_entry(self, user_id):
+        return next((entry for entry in self.waiting if entry[2] == user_id), None)
+
+    def _release(self, seat_id):
+        del self.seat_user[seat_id]
+        if self.waiting:
+            user_id = self._next_user()
+            self.seat_user[seat_id] = user_id
+            return [f"User {user_id} reserved seat {seat_id}"]
+        self.free.add(seat_id)
+        return []
+
+    def _expire(self):
+        now = math.floor(self.clock())
+        lines = []
+        for user_id, (deadline, order, seat_id) in sorted(self.holds.items(), key=lambda item: item[1]):
+            if deadline <= now:
+                del self.holds[user_id]
+                lines.append(f"User {user_id} hold on seat {seat_id} expired")
+                lines.extend(self._release(seat_id))
+        return lines
+
+    #_command() runs one command after the due holds expired, like the _expiring decorator of the engine
+    def _command(self, answer, *args):
+        lines = self._expire()
+        result = answer(*args)
+        if result:
+            lines.append(result)
+        return "\n".join(lines)
+
+    def initialize(self, seat_count):
+        return self._command(self._initialize, seat_count)
+
+    def _initialize(self, seat_count):
+        if seat_count <= 0:
+            return "Invalid input. Please provide a valid number of seats."
+        self.seat_count = seat_count
+        self.free = set(range(1, seat_count + 1))
+        return f"{seat_count} Seats are made available for reservation"
+
+    def reserve(self, user_id, priority):
+        return self._command(self._reserve, user_id, priority)
+
+    def _reserve(self, user_id, priority):
+        if self.free:
+            seat_id = min(self.free)
+            self.free.remove(seat_id)
+            self.seat_user[seat_id] = user_id
+            return f"User {user_id} reserved seat {seat_id}"
+        self.waiting.append([priority, self.stamp, user_id])
+        self.stamp += 1
+        return f"User {user_id} is added to the waiting list"
+
+    def available(self, *ignored):
+        return self._command(lambda: f"Total Seats Available : {len(self.free)}, Waitlist : {len(self.waiting)}")
+
+    def add_seats(self, count):
+        return self._command(self._add_seats, count)
+
+    def _add_seats(self, count):
+        if count <= 0:
+            return "Invalid input. Please provide a valid number of seats."
+        lines = [f"Additional {count} Seats are made available for reservation"]
+        for seat_id in range(self.seat_count + 1, self.seat_count + count + 1):
+            if self.waiting:
+                user_id = self._next_user()
+                self.seat_user[seat_id] = user_id
+                lines.append(f"User {user_id} reserved seat {seat_id}")
+            else:
+                self.free.add(seat_id)
+        self.seat_count += count
+        return "\n".join(lines)
+
+    def cancel(self, seat_id, user_id):
+        return self._command(self._cancel, seat_id, user_id)
+
+    def _cancel(self, seat_id, user_id):
+        if self.seat_user.get(seat_id) != user_id:
+            return f"User {user_id} has no reservation for seat {seat_id} to cancel"
+        if user_id in self.holds and self.holds[user_id][2] == seat_id:
+            del self.holds[user_id]
+        return "\n".join([f"User {user_id} canceled their reservation"] + self._release(seat_id))
+
+    def update_priority(self, user_id, priority):
+        return self._command(self._update_priority, user_id, priority)
+
+    def _update_priority(self, user_id, priority):
+        entry = self._waiting_entry(user_id)
+        if entry is not None:
+            entry[0] = priority
+            return f"User {user_id} priority has been updated to {priority}"
+        if user_id in self.seat_user.values():
+            return f"User {user_id} priority is not updated"
+        return f"User {user_id} is not in the system"
+
+    def print_reservations(self, *page):
+        return self._command(self._print_reservations, *page)
+
+    def _print_reservations(self, *page):
+        lines = [f"Seat {seat_id}, User {self.seat_user[seat_id]}" for seat_id in sorted(self.seat_user)]
+        if len(page) != 2:
+            return "\n".join(lines)
+        offset, limit = page
+        if offset < 0 or limit <= 0:
+            return "Invalid input. Please provide a valid page."
+        return "\n".join(lines[offset:offset + limit])
+
+    def release_seats(self, low, high):
+        return self._command(self._release_seats, low, high)
+
+    def _release_seats(self, low, high):
+        if low > high:
+            return "Invalid input. Please provide a valid range of users."
+        released = [seat_id for seat_id, user_id in self.seat_user.items() if low <= user_id <= high]
+        removed = [entry for entry in self.waiting if low <= entry[2] <= high]
+        if not released and not removed:
+            return f"No reservations or waitlist entries found in the range [{low}, {high}]"
+        for seat_id in released:
+            user_id = self.seat_user.pop(seat_id)
+            if user_id in self.holds and self.holds[user_id][2] == seat_id:
+                del self.holds[user_id]
+            self.free.add(seat_id)
+        self.waiting = [entry for entry in self.waiting if not low <= entry[2] <= high]
+        lines = [f"Reservations of the Users in the range [{low}, {high}] are released"]
+        while self.free and self.waiting:
+            seat_id = min(self.free)
+            self.free.remove(seat_id)
+            user_id = self._next_user()
+            self.seat_user[seat_id] = user_id
+            lines.append(f"User {user_id} reserved seat {seat_id}")
+        return "\n".join(lines)
+
+    def exit_waitlist(self, user_id):
+        return self._command(self._exit_waitlist, user_id)
+
+    def _exit_waitlist(self, user_id):
+        entry = self._waiting_entry(user_id)
+        if entry is None:
+            return f"User {user_id} is not in waitlist"
+        self.waiting.remove(entry)
+        return f"User {user_id} is removed from the waiting list"
+
+    def _order(self):
+        return sorted(self.waiting, key=lambda entry: (-entry[0], entry[1]))
+
+    def waitlist_position(self, user_id):
+        return self._command(self._waitlist_position, user_id)
+
+    def _waitlist_position(self, user_id):
+        users = [entry[2] for entry in self._order()]
+        if user_id not in users:
+            return f"User {user_id} is not in waitlist"
+        return f"User {user_id} is at position {users.index(user_id) + 1} of {len(users)} in the waiting list"
+
+    def waitlist_top(self, count):
+        return self._command(self._waitlist_top, count)
+
+    def _waitlist_top(self, count):
+        if count <= 0:
+            return "Invalid input. Please provide a valid number of users."
+        return "\n".join(f"Position {position}, User {entry[2]}, Priority {entry[0]}"
+                         for position, entry in enumerate(self._order()[:count], 1))
+
+    def reserve_block(self, user_id, count, priority=0):
+        return self._command(self._reserve_block, user_id, count)
+
+    def _reserve_block(self, user_id, count):
+        if count <= 0:
+            return "Invalid input. Please provide a valid number of seats."
+        start = next((seat_id for seat_id in sorted(self.free)
+                      if all(seat in self.free for seat in range(seat_id, seat_id + count))), None)
+        if start is None:
+            return f"No block of {count} seats together is available for User {user_id}"
+        for seat_id in range(start, start + count):
+            self.free.remove(seat_id)
+            self.seat_user[seat_id] = user_id
+        if count == 1:
+            return f"User {user_id} reserved seat {start}"
+        return f"User {user_id} reserved seats {start}-{start + count - 1}"
+
+    def hold(self, user_id, priority, ttl):
+        return self._command(self._hold, user_id, priority, ttl)
+
+    def _hold(self, user_id, priority, ttl):
+        if ttl <= 0:
+            return "Invalid input. Please provide a valid hold time."
+        if user_id in self.holds:
+            return f"User {user_id} already holds seat {self.holds[user_id][2]}"
+        if not self.free:
+            return self._reserve(user_id, priority)
+        seat_id = min(self.free)
+        self._reserve(user_id, priority)
+        self.holds[user_id] = (math.ceil(self.clock() + ttl), self.hold_order, seat_id)
+        self.hold_order += 1
+        return f"User {user_id} is holding seat {seat_id} for {ttl} seconds"
+
+    def confirm(self, user_id):
+        return self._command(self._confirm, user_id)
+
+    def _confirm(self, user_id):
+        if user_id not in self.holds:
+            return f"User {user_id} has no seat on hold"
+        return f"User {user_id} confirmed seat {self.holds.pop(user_id)[2]}"
+
+@pytest.mark.parametrize('waitlist', ['heap', 'lazy'])
+def test_fuzz_streams_match_the_model(waitlist):
+    engine = load_engine(waitlist=waitlist)
+    for seed in range(40):
+        divergence = replay(generate_stream(seed, commands=400), ModelTicketMaster, engine, check_every=1)
+        assert divergence is None, f"seed {seed}: {divergence}"
+
+def test_crowded_streams_match_the_model():
+    #few seats and many users keep the waitlist long, so holds expire into it and blocks rarely fit
+    for seed in range(20):
+        divergence = replay(generate_stream(seed, commands=600, seats=6, users=40), ModelTicketMaster, load_engine(), check_every=5)
+        assert divergence is None, f"seed {seed}: {divergence}"
+
+def test_lazy_waitlist_matches_the_heap():
+    for seed in range(100, 130):
+        divergence = replay(generate_stream(seed), load_engine(waitlist='heap'), load_engine(waitlist='lazy'), check_every=10)
+        assert divergence is None, f"seed {seed}: {divergence}"
+
+def test_basic_streams_match_the_model():
+    for seed in range(20):
+        divergence = replay(generate_stream(seed, basic=True), ModelTicketMaster, load_engine(), check_every=1)
+        assert divergence is None, f"seed {seed}: {divergence}"
+
+def test_replay_reports_the_first_diverging_line():
+    lines = ["Initialize(2)", "Reserve(1, 1)", "Reserve(2, 1)", "Reserve(3, 1)", "Cancel(1, 1)", "Quit()"]
+
+    class FirstInFirstOut(GatorTicketMaster):
+        def cancel(self, seat_id, user_id):
+            return f"User {user_id} canceled their reservation"
+
+    divergence = replay(lines, ModelTicketMaster, lambda clock: FirstInFirstOut(clock=clock))
+    assert (divergence.kind, divergence.command, divergence.output_line) == ('output', 4, 6)
+    assert divergence.expected == "User 3 reserved seat 1" and divergence.got is None
+
+def test_check_invariants_reports_corruption():
+    ticket_master = GatorTicketMaster()
+    ticket_master.initialize(5)
+    for user_id in range(1, 5):
+        ticket_master.reserve(user_id, 1)
+    assert check_invariants(ticket_master) is None
+
+    ticket_master.reserved_seats.root.color = 1
+    assert check_invariants(ticket_master) == "the reservation tree root is red or has a parent"
+    ticket_master.reserved_seats.root.color = 0
+
+    ticket_master.available_seats.free(2)
+    assert check_invariants(ticket_master) == "seat 2 is both reserved by user 2 and free"
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from gatorServer import TicketClient, TicketServer, encode_binary
+
+LINES = ["Initialize(6)", "Reserve(1, 2)", "ReserveBlock(2, 3, 1)", "ReserveBlock(3, 4, 2)", "Hold(4, 1, 30)", "Confirm(4)",
+         "WaitlistTop(3)", "PrintReservations()", "Quit()"]
+
+#_serve() runs lines through a fresh server on a Unix socket over one connection and returns the replies
+def _serve(tmp_path, lines, binary):
+    async def run():
+        server = TicketServer()
+        path = str(tmp_path / 'gator.sock')
+        await server.start(unix_path=path)
+        try:
+            client = await TicketClient.connect(unix_path=path, binary=binary)
+            results = await asyncio.wait_for(client.send(lines), 5)
+            await client.close()
+            return results
+        finally:
+            await server.close()
+
+    return asyncio.run(run())
+
+def test_binary_requests_carry_three_arguments(tmp_path):
+    results = _serve(tmp_path, LINES, binary=True)
+    assert results[2] == "User 2 reserved seats 2-4"
+    assert results[3] == "No block of 4 seats together is available for User 3"
+    assert results[4:6] == ["User 4 is holding seat 5 for 30 seconds", "User 4 confirmed seat 5"]
+    assert results == _serve(tmp_path, LINES, binary=False)
+
+def test_encode_binary_rejects_arguments_it_cannot_carry():
+    with pytest.raises(ValueError):
+        encode_binary(["PrintReservations(0, 5)"])
+    with pytest.raises(ValueError):
+        encode_binary(["Reserve(1, 2, 3)"])
+
+#_raw() sends payload over a plain connection to a fresh server and returns everything it answers until it closes the connection
+def _raw(tmp_path, payload):
+    async def run():
+        server = TicketServer()
+        path = str(tmp_path / 'gator.sock')
+        await server.start(unix_path=path)
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(payload)
+            await writer.drain()
+            reply = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return reply
+        finally:
+            await server.close()
+
+    return asyncio.run(run())
+
+def test_text_client_may_start_with_a_blank_line(tmp_path):
+    reply = _raw(tmp_path, b"\r\n\nInitialize(2)\r\nAvailable()\nQuit()\n")
+    assert reply == b"2 Seats are made available for reservation\n\nTotal Seats Available : 2, Waitlist : 0\n\nProgram Terminated!!\n\n"
+
+def test_text_that_is_not_utf8_is_answered(tmp_path):
+    reply = _raw(tmp_path, b"Initialize(2)\nReserve(\xff, 1)\nAvailable()\nQuit()\n")
+    assert reply.decode().split("\n\n")[1:3] == ["Unrecognized command: Reserve", "Total Seats Available : 2, Waitlist : 0"]
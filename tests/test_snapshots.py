@@ -0,0 +1,25 @@
+import random
+
+import pytest
+
+from gatorTicketMaster import PersistentTree, walk_persistent
+
+@pytest.mark.parametrize('seed', range(10))
+def test_persistent_tree_keeps_every_old_version(seed):
+    rng = random.Random(seed)
+    tree = PersistentTree(sorted((key, key * 10) for key in rng.sample(range(200), 40)))
+    model = dict(tree)
+    versions = [(tree.root, sorted(model.items()))]
+    for step in range(400):
+        key = rng.randrange(200)
+        if key in model and rng.random() < 0.5:
+            tree.delete(key)
+            del model[key]
+        else:
+            tree.insert(key, step)
+            model[key] = step
+        assert list(tree) == sorted(model.items()) and len(tree) == len(model)
+        if step % 40 == 0:
+            versions.append((tree.root, sorted(model.items())))
+    for root, pairs in versions:
+        assert list(walk_persistent(root)) == pairs